@@ -0,0 +1,64 @@
+"""
+Benchmark: ending-odds solve time on large generated cyclic stories.
+
+Generated stories with back-jumps collapse into one strongly connected
+component of nearly every page, so this times the sparse solver in
+app.markov on its worst common case. Each story's odds are computed
+uncached, and the run exits non-zero if any solve takes longer than
+--max-seconds or the probabilities do not sum to 1.
+
+    python -m benchmarks.bench_ending_odds
+    python -m benchmarks.bench_ending_odds --stories 20000:4:0.3 --max-seconds 2
+"""
+
+import argparse
+import sys
+import time
+
+from benchmarks.common import make_flask_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stories', default='2000:2:0.1,5000:3:0.1,8000:2:0.2,10000:4:0.1',
+                        help='Comma-separated pages:branching:cycle_ratio of each generated story')
+    parser.add_argument('--max-seconds', type=float, default=1.0, help='Slowest solve allowed')
+    args = parser.parse_args()
+
+    app = make_flask_app()
+    from app import db
+    from app.generator import generate_story
+    from app.graph import StoryGraph, strongly_connected_components
+    from app.markov import ending_odds
+    from app.models import Story
+
+    failures = []
+    print(f"{'pages':>7} {'branch':>6} {'cycles':>6} {'largest scc':>11} {'solve s':>8} {'total p':>8}")
+    with app.app_context():
+        for spec in args.stories.split(','):
+            pages, branching, cycle_ratio = spec.split(':')
+            story_id = generate_story(pages=int(pages), branching=int(branching),
+                                      cycle_ratio=float(cycle_ratio), seed=1)
+            graph = StoryGraph.load(db.session.get(Story, story_id))
+            largest = max(len(component) for component in strongly_connected_components(graph))
+
+            started = time.perf_counter()
+            odds = ending_odds(graph)
+            elapsed = time.perf_counter() - started
+
+            total = sum(ending['probability'] for ending in odds['endings']) + sum(
+                odds[key] for key in ('dead_end_probability', 'blocked_probability', 'trapped_probability')
+            )
+            print(f'{pages:>7} {branching:>6} {cycle_ratio:>6} {largest:>11} {elapsed:>8.3f} {total:>8.6f}')
+            if elapsed > args.max_seconds:
+                failures.append(f'{spec}: {elapsed:.2f}s > {args.max_seconds}s')
+            if abs(total - 1.0) > 1e-9:
+                failures.append(f'{spec}: probabilities sum to {total}')
+
+    if failures:
+        print('\nToo slow or wrong:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: POST /stories/import throughput in pages per second.
+
+Compares the transactional bulk import against building the same story
+with one POST per page and per choice, as create_sample_stories.py does.
+
+    python -m benchmarks.bench_import
+"""
+
+import argparse
+import time
+
+from benchmarks.common import API_HEADERS, make_flask_app
+
+
+def make_story_document(page_count, branching=2):
+    """Build an import document whose pages form a branching chain"""
+    pages = []
+    for index in range(page_count):
+        is_ending = index >= page_count - branching
+        pages.append({
+            'key': f'p{index}',
+            'text': f'Page {index} of the imported story.',
+            'is_ending': is_ending,
+            'ending_label': f'Ending {index}' if is_ending else None,
+            'choices': [] if is_ending else [
+                {'text': f'Option {offset}', 'next_page': f'p{min(index + offset, page_count - 1)}'}
+                for offset in range(1, branching + 1)
+            ],
+        })
+    return {'title': f'Imported {page_count}', 'status': 'published', 'pages': pages}
+
+
+def import_bulk(client, document):
+    response = client.post('/stories/import', json=document, headers=API_HEADERS)
+    assert response.status_code == 201, response.get_json()
+
+
+def import_sequential(client, document):
+    story = client.post('/stories', json={'title': document['title']}, headers=API_HEADERS).get_json()
+    ids = {}
+    for page in document['pages']:
+        created = client.post(f"/stories/{story['id']}/pages", json=page, headers=API_HEADERS).get_json()
+        ids[page['key']] = created['id']
+    for page in document['pages']:
+        for choice in page['choices']:
+            client.post(f"/pages/{ids[page['key']]}/choices", json={
+                'text': choice['text'],
+                'next_page_id': ids[choice['next_page']],
+            }, headers=API_HEADERS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,5000', help='Comma-separated page counts')
+    parser.add_argument('--sequential-max', type=int, default=1000,
+                        help='Skip the sequential baseline above this many pages')
+    parser.add_argument('--database', default='sqlite://', help='Database URL (a file shows commit costs)')
+    args = parser.parse_args()
+
+    app = make_flask_app(args.database)
+    print(f"{'pages':>8} {'mode':>11} {'seconds':>9} {'pages/s':>10}")
+    with app.app_context():
+        client = app.test_client()
+        for size in [int(s) for s in args.sizes.split(',')]:
+            document = make_story_document(size)
+            modes = [('bulk', import_bulk)]
+            if size <= args.sequential_max:
+                modes.append(('sequential', import_sequential))
+            for name, func in modes:
+                started = time.perf_counter()
+                func(client, document)
+                elapsed = time.perf_counter() - started
+                print(f'{size:>8} {name:>11} {elapsed:>9.3f} {size / elapsed:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark: per-request overhead of the Flask metrics hooks.
+
+Two identical apps are built, one with METRICS_ENABLED and one without,
+and the same routes are timed on both in alternating rounds. The overhead
+column is the difference in median latency; at these request times it is
+mostly noise, so the hooks are also timed directly: one request's worth of
+start/finish hooks plus the cursor events for a given statement count.
+
+    python -m benchmarks.bench_metrics
+"""
+
+import argparse
+import os
+
+from benchmarks.common import make_flask_app, percentile, seed_story, time_calls
+
+
+def build_app(enabled, pages):
+    os.environ['METRICS_ENABLED'] = 'true' if enabled else 'false'
+    app = make_flask_app()
+    from app import db
+    with app.app_context():
+        story_id = seed_story(db, pages)
+    return app, story_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200, help='Pages in the seeded story')
+    parser.add_argument('--repeat', type=int, default=300, help='Requests per route, per app and round')
+    parser.add_argument('--rounds', type=int, default=3, help='Alternating rounds per app')
+    args = parser.parse_args()
+
+    apps = {enabled: build_app(enabled, args.pages) for enabled in (False, True)}
+    story_id = apps[True][1]
+    routes = ['/health', f'/stories/{story_id}/start', f'/stories/{story_id}', '/stories?status=published']
+
+    print(f"{'route':<28} {'off p50 ms':>11} {'on p50 ms':>10} {'overhead us':>12} {'overhead %':>11}")
+    for route in routes:
+        samples = {False: [], True: []}
+        for _ in range(args.rounds):
+            for enabled, (app, _) in apps.items():
+                client = app.test_client()
+                with app.app_context():
+                    samples[enabled] += time_calls(lambda: client.get(route), args.repeat)
+        off, on = percentile(samples[False], 0.5), percentile(samples[True], 0.5)
+        print(f'{route:<28} {off:>11.3f} {on:>10.3f} {(on - off) * 1000:>12.1f} {(on - off) / off * 100:>10.1f}%')
+
+    app = apps[True][0]
+    response = app.test_client().get(routes[2])
+    print(f"\nServer-Timing: {response.headers['Server-Timing']}")
+
+    from flask import Response
+    from app import metrics as hooks
+
+    print(f"\n{'statements':>10} {'hook cost us':>13}")
+    for statements in (0, 3, 10):
+        def one_request():
+            hooks.start_request('api')
+            for _ in range(statements):
+                hooks.before_cursor_execute(None, None, None, None, None, False)
+                hooks.after_cursor_execute(None, None, None, None, None, False)
+            hooks.finish_request(Response('{}'))
+
+        with app.test_request_context(f'/stories/{story_id}'):
+            durations = time_calls(one_request, args.repeat * 10)
+        print(f'{statements:>10} {percentile(durations, 0.5) * 1000:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
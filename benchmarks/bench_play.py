@@ -0,0 +1,82 @@
+"""
+Benchmark: click-to-render time of the Django play loop, with and without prefetch.
+
+Each click posts a choice and follows the redirect to the next page, as the
+browser does. Flask runs in process behind a simulated network round trip
+(--latency), and the reader pauses between clicks (--think). With prefetch,
+the pages a click can lead to are fetched during that pause, so p95 should
+drop to the cost of rendering from the cache.
+
+    python -m benchmarks.bench_play
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import make_flask_app, percentile, seed_story, setup_django
+
+
+def play(client, story_id, clicks, think, rng):
+    """Play until an ending (restarting as needed); return per-click durations in ms"""
+    durations = []
+    response = client.get(f'/story/{story_id}/play/')
+    while len(durations) < clicks:
+        choices = response.context.get('available_choices') if response.context else None
+        if not choices:
+            response = client.get(f'/story/{story_id}/play/')
+            continue
+        time.sleep(think)
+        choice = rng.choice(choices)
+        started = time.perf_counter()
+        response = client.post(
+            f"/story/{story_id}/choice/{choice['id']}/",
+            {'current_page_id': choice['page_id']},
+            follow=True,
+        )
+        durations.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=300, help='Pages in the seeded story')
+    parser.add_argument('--clicks', type=int, default=200, help='Clicks measured per mode')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated Django->Flask round trip (s)')
+    parser.add_argument('--think', type=float, default=0.05, help='Reader pause between clicks (s)')
+    parser.add_argument('--depth', type=int, default=1, help='Prefetch depth (1 or 2)')
+    args = parser.parse_args()
+
+    # A file database, since prefetch threads query Flask concurrently
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        with app.app_context():
+            from app import db
+            story_id = seed_story(db, args.pages, branching=3)
+
+        adapter = setup_django(app, latency=args.latency)
+        from django.core.cache import caches
+        from django.test import Client
+        from gameplay.flask_client import flask_api
+
+        print(f"{'mode':>10} {'p50 ms':>9} {'p95 ms':>9} {'calls/click':>12} {'local steps':>12}")
+        for mode, enabled in (('no prefetch', False), ('prefetch', True)):
+            caches[flask_api.cache_settings['ALIAS']].clear()
+            flask_api.prefetch_settings = dict(flask_api.prefetch_settings, ENABLED=enabled, DEPTH=args.depth)
+            flask_api._stats['local_steps'] = 0
+            calls_before = adapter.calls
+            durations = play(Client(), story_id, args.clicks, args.think, random.Random(42))
+            calls = (adapter.calls - calls_before) / args.clicks
+            print(f'{mode:>10} {percentile(durations, 0.5):>9.2f} {percentile(durations, 0.95):>9.2f} '
+                  f"{calls:>12.2f} {flask_api.cache_stats()['local_steps']:>12}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Load test: django_session writes and session size per gameplay session mode.
+
+Simulated readers browse the home page, open a story, play it to an ending
+and look around again. Every statement that writes django_session is
+counted. 'legacy' is the old configuration (database sessions saved on
+every request); the other rows are the GAMEPLAY_SESSION_MODE values, which
+only save a session when a view changes it.
+
+    python -m benchmarks.bench_sessions
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import tempfile
+
+from benchmarks.common import make_flask_app, seed_story, setup_django
+
+SESSION_WRITE = re.compile(r'^\s*(INSERT INTO|UPDATE|DELETE FROM)\s+"django_session"', re.IGNORECASE)
+
+MODES = {
+    'legacy': ('django.contrib.sessions.backends.db', True),
+    'db': ('django.contrib.sessions.backends.db', False),
+    'cache': ('django.contrib.sessions.backends.cache', False),
+    'cookie': ('django.contrib.sessions.backends.signed_cookies', False),
+}
+
+
+class SessionWriteCounter:
+    """Database execute wrapper counting statements that write django_session"""
+
+    def __init__(self):
+        self.writes = 0
+        self.statements = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements += 1
+        if SESSION_WRITE.match(sql):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+def read_story(client, story_id, rng):
+    """One reader visit; returns the number of requests made"""
+    requests = 0
+    for path in ('/', f'/story/{story_id}/'):
+        client.get(path)
+        requests += 1
+    response = client.get(f'/story/{story_id}/play/')
+    requests += 1
+    while response.context and response.context.get('available_choices'):
+        choice = rng.choice(response.context['available_choices'])
+        response = client.post(
+            f"/story/{story_id}/choice/{choice['id']}/",
+            {'current_page_id': choice['page_id']},
+            follow=True,
+        )
+        requests += 2
+    for path in (f'/story/{story_id}/', '/'):
+        client.get(path)
+        requests += 1
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=50, help='Simulated readers per mode')
+    parser.add_argument('--pages', type=int, default=40, help='Pages in the seeded story')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        with app.app_context():
+            from app import db
+            story_id = seed_story(db, args.pages, branching=2)
+
+        setup_django(app)
+        from django.db import connection
+        from django.test import Client, override_settings
+        from gameplay.telemetry import telemetry_queue
+        # Write telemetry inline: only session writes are being measured
+        telemetry_queue.enabled = False
+        # The legacy backend's session writes go over make_choice's query budget; only the table
+        logging.getLogger('gameplay.requests').setLevel(logging.WARNING)
+
+        print(f"{'mode':>8} {'requests':>9} {'session writes':>15} {'writes/request':>15} {'max cookie bytes':>17}")
+        for mode, (engine, save_every_request) in MODES.items():
+            with override_settings(SESSION_ENGINE=engine, SESSION_SAVE_EVERY_REQUEST=save_every_request):
+                rng = random.Random(7)
+                counter = SessionWriteCounter()
+                requests = 0
+                max_cookie = 0
+                with connection.execute_wrapper(counter):
+                    for _ in range(args.readers):
+                        client = Client()
+                        requests += read_story(client, story_id, rng)
+                        cookie = client.cookies.get('sessionid')
+                        if cookie is not None:
+                            max_cookie = max(max_cookie, len(cookie.value))
+            print(f'{mode:>8} {requests:>9} {counter.writes:>15} {counter.writes / requests:>15.3f} '
+                  f"{max_cookie if mode == 'cookie' else '-':>17}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
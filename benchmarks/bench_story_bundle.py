@@ -0,0 +1,41 @@
+"""
+Benchmark: GET /stories/<id> query count and latency as page count grows.
+
+The story bundle is loaded with a fixed number of queries, so the SQL
+column should stay flat while the page count increases.
+
+    python -m benchmarks.bench_story_bundle
+"""
+
+import argparse
+
+from benchmarks.common import count_queries, make_flask_app, percentile, seed_story, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,500,2000', help='Comma-separated page counts')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per story size')
+    args = parser.parse_args()
+
+    app = make_flask_app()
+    from app import db
+
+    print(f"{'pages':>8} {'sql':>6} {'p50 ms':>9} {'p95 ms':>9} {'bytes':>10}")
+    with app.app_context():
+        client = app.test_client()
+        for size in [int(s) for s in args.sizes.split(',')]:
+            story_id = seed_story(db, size, title=f'Bundle {size}')
+
+            with count_queries(db.engine) as counter:
+                response = client.get(f'/stories/{story_id}')
+            assert response.status_code == 200
+            assert len(response.get_json()['pages']) == size
+
+            durations = time_calls(lambda: client.get(f'/stories/{story_id}'), args.repeat)
+            print(f'{size:>8} {counter.count:>6} {percentile(durations, 0.5):>9.2f} '
+                  f'{percentile(durations, 0.95):>9.2f} {len(response.data):>10}')
+
+
+if __name__ == '__main__':
+    main()
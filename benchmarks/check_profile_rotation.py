@@ -0,0 +1,87 @@
+"""
+Profile-dump rotation check for both services.
+
+Sends profiled requests through the Flask ProfilingMiddleware and the Django
+one with a range of KEEP values (0 included) and exits non-zero if either
+service leaves a different number of its own dumps than KEEP allows, or
+touches the other service's dumps.
+
+    python -m benchmarks.check_profile_rotation
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.common import API_HEADERS, make_flask_app, seed_story, setup_django
+
+SECRET = 'rotation-check'
+REQUESTS = 4
+
+
+def own_dumps(directory, service):
+    return [name for name in os.listdir(directory) if name.startswith(f'{service}-')]
+
+
+def main():
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    directory = tempfile.mkdtemp(prefix='nahb-profiles-')
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        with app.app_context():
+            from app import db
+            story_id = seed_story(db, 10)
+
+        setup_django(app)
+        from django.conf import settings
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from app.profiling import ProfilingMiddleware as FlaskProfilingMiddleware
+        from gameplay.profiling import ProfilingMiddleware as DjangoProfilingMiddleware
+
+        settings.GAMEPLAY_PROFILING.update(ENABLED=True, SECRET=SECRET, DIR=directory)
+        flask_app = app.wsgi_app
+        failures = []
+        print(f"{'keep':>4} {'flask dumps':>12} {'django dumps':>13}")
+        for keep in (0, 1, 2, REQUESTS + 1):
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            # A dump of the other service that rotation must leave alone
+            other = os.path.join(directory, 'other-20000101-000000-000000-cpu-GET-root.pstats')
+            open(other, 'w').close()
+
+            app.wsgi_app = FlaskProfilingMiddleware(flask_app, SECRET, directory, keep=keep)
+            client = app.test_client()
+            for _ in range(REQUESTS):
+                client.get(f'/stories/{story_id}', headers=dict(API_HEADERS, **{
+                    'X-Profile': 'cpu', 'X-Profile-Key': SECRET,
+                }))
+
+            settings.GAMEPLAY_PROFILING['KEEP'] = keep
+            middleware = DjangoProfilingMiddleware(lambda request: HttpResponse('ok'))
+            for _ in range(REQUESTS):
+                middleware(RequestFactory().get('/', HTTP_X_PROFILE='cpu', HTTP_X_PROFILE_KEY=SECRET))
+
+            expected = min(keep, REQUESTS)
+            flask_count = len(own_dumps(directory, 'flask'))
+            django_count = len(own_dumps(directory, 'django'))
+            print(f'{keep:>4} {flask_count:>12} {django_count:>13}')
+            if flask_count != expected or django_count != expected:
+                failures.append(f'keep {keep}: expected {expected} dumps per service, '
+                                f'got flask {flask_count}, django {django_count}')
+            if not os.path.exists(other):
+                failures.append(f"keep {keep}: another service's dump was deleted")
+
+        if failures:
+            print('\nRotation failed:\n  ' + '\n  '.join(failures))
+            sys.exit(1)
+        print('\nRotation keeps the newest KEEP dumps on both services.')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Query-plan regression check for the Flask API.
+
+Seeds a large in-memory dataset, drives every hot read and write route
+through the test client, captures each SQL statement it runs and checks
+its EXPLAIN QUERY PLAN. Exits non-zero if any statement falls back to a
+full table scan that the route is not expected to make.
+
+    python -m benchmarks.check_query_plans
+"""
+
+import argparse
+import re
+import sys
+
+from sqlalchemy import event, text
+
+from benchmarks.common import API_HEADERS, make_flask_app, seed_story
+
+# "SCAN pages" is a full table scan; "SCAN pages USING INDEX ..." walks an index
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# Routes that legitimately read a whole table
+ALLOWED_FULL_SCANS = {
+    'GET /stories': {'stories'},
+    # The materialized FTS match set, already narrowed by MATCH
+    'GET /stories/search': {'hits'},
+}
+
+
+def hot_requests(story_id, page_id, other_page_id, choice_id):
+    """(label, method, url, json) for each route whose queries are checked"""
+    return [
+        ('GET /stories', 'GET', '/stories', None),
+        ('GET /stories?status', 'GET', '/stories?status=published', None),
+        ('GET /stories?ids', 'GET', f'/stories?ids={story_id},{story_id + 1}', None),
+        ('GET /stories?limit', 'GET', '/stories?limit=50&status=published&fields=id,title', None),
+        ('GET /stories?author_id', 'GET', '/stories?limit=50&author_id=1', None),
+        ('GET /stories?count', 'GET', '/stories?count=1&status=published', None),
+        ('GET /stories/search', 'GET', '/stories/search?q=bench&pages=1', None),
+        ('GET /stories/<id>', 'GET', f'/stories/{story_id}', None),
+        ('GET /stories/<id>/start', 'GET', f'/stories/{story_id}/start', None),
+        ('GET /stories/<id>/tree', 'GET', f'/stories/{story_id}/tree', None),
+        ('GET /pages/<id>', 'GET', f'/pages/{page_id}', None),
+        ('GET /pages?ids', 'GET', f'/pages?ids={page_id},{other_page_id}', None),
+        ('PUT /pages/<id>', 'PUT', f'/pages/{page_id}', {'text': 'Edited'}),
+        ('PUT /choices/<id>', 'PUT', f'/choices/{choice_id}', {'text': 'Edited'}),
+        ('POST /pages/<id>/choices', 'POST', f'/pages/{page_id}/choices',
+         {'text': 'New', 'next_page_id': other_page_id}),
+        ('DELETE /choices/<id>', 'DELETE', f'/choices/{choice_id}', None),
+        ('DELETE /pages/<id>', 'DELETE', f'/pages/{other_page_id}', None),
+        ('DELETE /stories/<id>', 'DELETE', f'/stories/{story_id}', None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stories', type=int, default=20, help='Large stories to seed')
+    parser.add_argument('--pages', type=int, default=2000, help='Pages per large story')
+    parser.add_argument('--small-stories', type=int, default=500,
+                        help='Small stories in mixed statuses, so status filters are selective')
+    args = parser.parse_args()
+
+    app = make_flask_app()
+    app.config['PURGE_IN_BACKGROUND'] = False
+    from app import db
+    from app.models import Choice, Page
+
+    failures = []
+    with app.app_context():
+        story_ids = [seed_story(db, args.pages, title=f'Plan {i}') for i in range(args.stories)]
+        for i in range(args.small_stories):
+            seed_story(db, 3, title=f'Small {i}', status=('draft', 'suspended', 'draft', 'published')[i % 4])
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        story_id = story_ids[len(story_ids) // 2]
+        pages = Page.query.filter_by(story_id=story_id).order_by(Page.id).limit(2).all()
+        choice = Choice.query.filter_by(page_id=pages[0].id).first()
+        requests = hot_requests(story_id, pages[0].id, pages[1].id, choice.id)
+
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().split()[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+                captured.append((statement, parameters))
+
+        client = app.test_client()
+        for label, method, url, body in requests:
+            captured.clear()
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            try:
+                response = client.open(url, method=method, json=body, headers=API_HEADERS)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', capture)
+            if response.status_code >= 400:
+                failures.append(f'{label}: HTTP {response.status_code}')
+                continue
+
+            allowed = ALLOWED_FULL_SCANS.get(label, set())
+            with db.engine.connect() as conn:
+                for statement, parameters in captured:
+                    plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                    for row in plan:
+                        match = FULL_SCAN.match(row[-1])
+                        if match and match.group(1) not in allowed:
+                            failures.append(f'{label}: full scan of {match.group(1)} in: {statement.strip()[:120]}')
+            print(f'{label:<28} {len(captured):>3} statements checked')
+
+    if failures:
+        print('\nQuery plan regressions:')
+        for failure in failures:
+            print(f'  - {failure}')
+        sys.exit(1)
+    print('\nNo unexpected full table scans.')
+
+
+if __name__ == '__main__':
+    main()
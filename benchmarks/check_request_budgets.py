@@ -0,0 +1,124 @@
+"""
+Request-budget check for the Django gameplay views.
+
+Drives every gameplay page through the Django test client against an
+in-process Flask API, first with a cold client cache and then warm, with
+GAMEPLAY_REQUEST_BUDGETS['ACTION'] set to 'raise'. Prints the upstream
+calls and ORM queries of each view (from its Server-Timing header) and
+exits non-zero if any view goes over its budget.
+
+    python -m benchmarks.check_request_budgets
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import tempfile
+
+from benchmarks.common import make_flask_app, seed_story, setup_django
+
+SERVER_TIMING = re.compile(r'(\w+);dur=[\d.]+(?:;desc="(\d+) \w+")?')
+
+
+def usage(response):
+    """(upstream calls, queries) from a response's Server-Timing header"""
+    counts = {name: int(count) for name, count in SERVER_TIMING.findall(response['Server-Timing']) if count}
+    return counts['flask'], counts['db']
+
+
+def visits(story_id, page, ending_page_id, play_id):
+    """(label, method, url, data) for each view checked, in an order that builds up state"""
+    return [
+        ('home', 'GET', '/', None),
+        ('home: search', 'GET', '/?search=bench', None),
+        ('story_detail', 'GET', f'/story/{story_id}/', None),
+        ('play_story', 'GET', f'/story/{story_id}/play/', None),
+        ('make_choice', 'POST', f"/story/{story_id}/choice/{page['choices'][0]['id']}/",
+         {'current_page_id': page['id']}),
+        ('story_ending', 'GET', f'/story/{story_id}/ending/{ending_page_id}/', None),
+        ('rate_story', 'POST', f'/story/{story_id}/rate/', {'stars': '4', 'comment': 'Fine'}),
+        ('profile', 'GET', '/profile/', None),
+        ('statistics', 'GET', '/statistics/', None),
+        ('story_tree', 'GET', f'/story/{story_id}/tree/', None),
+        ('player_path', 'GET', f'/play/{play_id}/path/', None),
+        ('author_dashboard', 'GET', '/author/', None),
+        ('admin_dashboard', 'GET', '/admin-dashboard/', None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200, help='Pages in the seeded story')
+    parser.add_argument('--plays', type=int, default=20, help='Finished plays recorded before checking')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        with app.app_context():
+            from app import db
+            # Plays spread over several stories, so a per-play lookup on the profile shows up
+            story_ids = [seed_story(db, args.pages, title=f'Bench story {number}') for number in range(3)]
+        story_id = story_ids[0]
+
+        setup_django(app)
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from django.core.cache import caches
+        from django.test import Client
+        from gameplay.flask_client import flask_api
+        from gameplay.middleware import BudgetExceeded
+        from gameplay.models import Play
+
+        settings.GAMEPLAY_REQUEST_BUDGETS['ACTION'] = 'raise'
+        logging.getLogger('gameplay.requests').setLevel(logging.WARNING)  # only the table
+        settings.GAMEPLAY_STATISTICS['BACKGROUND'] = False
+        flask_api.prefetch_settings = dict(flask_api.prefetch_settings, ENABLED=False)
+
+        user = User.objects.create_user('budget', 'budget@example.com', 'password', is_staff=True)
+        client = Client()
+        client.force_login(user)
+
+        story = flask_api.get_story(story_id)
+        page = flask_api.get_page(story['start_page_id'])
+        endings = {
+            other_id: flask_api.get_story(other_id)['pages'][-1]['id'] for other_id in story_ids
+        }
+        for number in range(args.plays):
+            other_id = story_ids[number % len(story_ids)]
+            Play.objects.create(story_id=other_id, ending_page_id=endings[other_id], user=user)
+        play_id = Play.objects.filter(user=user).first().id
+
+        failures = []
+        print(f"{'view':<20} {'cold calls':>10} {'cold sql':>9} {'warm calls':>11} {'warm sql':>9}")
+        results = {}
+        for phase in ('cold', 'warm'):
+            if phase == 'cold':
+                caches[flask_api.cache_settings['ALIAS']].clear()
+            for label, method, url, data in visits(story_id, page, endings[story_id], play_id):
+                try:
+                    response = client.get(url) if method == 'GET' else client.post(url, data)
+                except BudgetExceeded as e:
+                    failures.append(f'{phase} {label}: {e}')
+                    results.setdefault(label, {})[phase] = ('over', 'over')
+                    continue
+                results.setdefault(label, {})[phase] = usage(response)
+
+        for label, phases in results.items():
+            cold_calls, cold_sql = phases['cold']
+            warm_calls, warm_sql = phases['warm']
+            print(f'{label:<20} {cold_calls:>10} {cold_sql:>9} {warm_calls:>11} {warm_sql:>9}')
+
+        if failures:
+            print('\nOver budget:\n  ' + '\n  '.join(failures))
+            sys.exit(1)
+        print('\nAll views within budget.')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Telemetry queue checks: readers logging in mid-story, and failing events.
+
+Plays a story through the Django views against an in-process Flask API as
+an anonymous reader who logs in halfway, and checks that their saved
+progress and finished play end up on their account, and that signed-cookie
+sessions get reader keys that fit PlaySession.session_key. Then queues good
+events around one that can never be applied and checks that the good
+ones are written at once, the bad one is retried and then dead-lettered,
+and retry_dead() puts it back. Exits non-zero if any check fails.
+
+    python -m benchmarks.check_telemetry
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+from benchmarks.common import make_flask_app, seed_story, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        with app.app_context():
+            from app import db
+            story_id = seed_story(db, 6, title='Telemetry story')
+        setup_django(app)
+        failures = run_checks(story_id)
+    finally:
+        os.remove(path)
+
+    if failures:
+        sys.exit(1)
+    print('\nTelemetry queue checks passed.')
+
+
+def run_checks(story_id):
+    from django.contrib.auth.models import User
+    from django.test import Client, override_settings
+    from gameplay.flask_client import flask_api
+    from gameplay.models import Play, PlaySession
+    from gameplay.telemetry import READER_SESSION_KEY, telemetry_queue
+
+    # Flushed by hand below, not by the worker thread; failed events wait
+    telemetry_queue.flush_interval = 3600
+    telemetry_queue.retry_delay = 3600
+    logging.getLogger('gameplay.telemetry').setLevel(logging.CRITICAL)  # only the checks
+    failures = []
+
+    def check(label, ok):
+        print(f"{'ok' if ok else 'FAIL':<5} {label}")
+        if not ok:
+            failures.append(label)
+
+    # An anonymous reader starts the story, logs in, then plays on to an ending
+    client = Client()
+    client.get(f'/story/{story_id}/play/')
+    telemetry_queue.flush()
+    reader_key = client.session[READER_SESSION_KEY]
+    check('anonymous progress is saved under the reader key',
+          PlaySession.objects.filter(story_id=story_id, session_key=reader_key, user=None).exists())
+
+    user = User.objects.create_user('telemetry', 'telemetry@example.com', 'password')
+    client.post('/login/', {'username': 'telemetry', 'password': 'password'})
+    page = flask_api.get_page(flask_api.get_story(story_id)['start_page_id'])
+    choice = page['choices'][0]
+    client.post(f"/story/{story_id}/choice/{choice['id']}/", {'current_page_id': page['id']})
+    telemetry_queue.flush()
+    check('progress made after logging in is applied', telemetry_queue.depth() == 0)
+    check("the reader's saved progress moves to their account",
+          list(PlaySession.objects.filter(story_id=story_id).values_list('user_id', 'current_page_id'))
+          == [(user.id, choice['next_page_id'])])
+
+    page = flask_api.get_page(choice['next_page_id'])
+    while not page['is_ending']:
+        choice = page['choices'][0]
+        client.post(f"/story/{story_id}/choice/{choice['id']}/", {'current_page_id': page['id']})
+        page = flask_api.get_page(choice['next_page_id'])
+    telemetry_queue.flush()
+    check('the finished play is recorded on their account',
+          telemetry_queue.depth() == 0 and Play.objects.filter(story_id=story_id, user=user).count() == 1)
+    check('no saved progress is left behind', not PlaySession.objects.filter(story_id=story_id).exists())
+
+    # Signed-cookie sessions have no server-side key to fall back on: their
+    # session_key is the whole signed payload
+    max_length = PlaySession._meta.get_field('session_key').max_length
+    with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+        for logged_in in (False, True):
+            client = Client()
+            if logged_in:
+                client.force_login(user)
+            client.get(f'/story/{story_id}/play/')
+            page = flask_api.get_page(flask_api.get_story(story_id)['start_page_id'])
+            choice = page['choices'][0]
+            client.post(f"/story/{story_id}/choice/{choice['id']}/", {'current_page_id': page['id']})
+    telemetry_queue.flush()
+    longest = max(len(key) for key in PlaySession.objects.values_list('session_key', flat=True))
+    check(f'signed-cookie reader keys fit session_key ({longest} <= {max_length})', longest <= max_length)
+    PlaySession.objects.all().delete()
+
+    def progress(reader_key, story_id):
+        return {'user_id': None, 'session_key': reader_key, 'story_id': story_id, 'page_id': 1}
+
+    telemetry_queue.enqueue('progress', progress('reader-a', 1))
+    # story_id is NOT NULL on PlaySession, so this event fails every time
+    telemetry_queue.enqueue('progress', progress('reader-bad', None))
+    telemetry_queue.enqueue('progress', progress('reader-b', 2))
+
+    applied = telemetry_queue.flush()
+    check('good events around a bad one are applied', applied == 2 and PlaySession.objects.count() == 2)
+    check('the bad event stays queued for a retry', telemetry_queue.depth() == 1)
+    check('its failure is counted', telemetry_queue.stats()['failures'] == 1)
+
+    # Make the pending retry due now, and every later one immediately
+    telemetry_queue.connection.execute('UPDATE events SET claimed_until = NULL')
+    telemetry_queue.retry_delay = 0
+    telemetry_queue.flush()
+    check(f'it is dead-lettered after {telemetry_queue.max_attempts} attempts',
+          telemetry_queue.depth() == 0 and telemetry_queue.dead_depth() == 1
+          and telemetry_queue.stats()['failures'] == telemetry_queue.max_attempts)
+
+    telemetry_queue.enqueue('progress', progress('reader-c', 3))
+    check('later events are not blocked', telemetry_queue.flush() == 1 and PlaySession.objects.count() == 3)
+
+    check('retry_dead requeues it', telemetry_queue.retry_dead() == 1
+          and telemetry_queue.depth() == 1 and telemetry_queue.dead_depth() == 0)
+    return failures
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Shared helpers for the NAHB benchmarks.
+
+Benchmarks run fully offline against an in-memory SQLite database and the
+Flask test client. Run them from the repository root, e.g.:
+
+    python -m benchmarks.bench_story_bundle
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+FLASK_DIR = ROOT_DIR / 'flask-api'
+DJANGO_DIR = ROOT_DIR / 'django-app'
+
+# Matches the default API_KEY of the Flask app
+API_HEADERS = {'X-API-KEY': 'your-secret-api-key-2024'}
+
+
+def make_flask_app(database_url='sqlite://'):
+    """Create a fresh Flask API app bound to the given database"""
+    if str(FLASK_DIR) not in sys.path:
+        sys.path.insert(0, str(FLASK_DIR))
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+class FlaskTestAdapter(BaseAdapter):
+    """requests transport that answers from a Flask app's test client
+
+    Lets the Django FlaskAPIClient talk to an in-process Flask app. `latency`
+    seconds are slept per request to stand in for the network round trip.
+    """
+
+    def __init__(self, app, latency=0.0):
+        super().__init__()
+        self.app = app
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(request.url)
+        result = self.app.test_client().open(
+            url.path,
+            method=request.method,
+            query_string=url.query,
+            headers=dict(request.headers),
+            data=request.body,
+        )
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.reason = result.status.partition(' ')[2]
+        response.headers = CaseInsensitiveDict(result.headers)
+        response._content = result.get_data()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def setup_django(flask_app=None, latency=0.0):
+    """Set up Django on a fresh test database, optionally wired to an in-process Flask app
+
+    Returns the FlaskTestAdapter in use (or None) so callers can count calls.
+    """
+    if str(DJANGO_DIR) not in sys.path:
+        sys.path.insert(0, str(DJANGO_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nahb_project.settings')
+    # Keep benchmark telemetry out of the real queue file
+    scratch = tempfile.mkdtemp(prefix='nahb-bench-')
+    os.environ.setdefault('GAMEPLAY_TELEMETRY_QUEUE_PATH', os.path.join(scratch, 'queue.sqlite3'))
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['*']
+    # A file rather than shared-cache memory, so the telemetry worker thread
+    # can write while requests are being served
+    connection.settings_dict['TEST']['NAME'] = os.path.join(scratch, 'django.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+
+    from gameplay.flask_client import flask_api
+    caches[flask_api.cache_settings['ALIAS']].clear()
+    if flask_app is None:
+        return None
+    adapter = FlaskTestAdapter(flask_app, latency)
+    flask_api.adapter = adapter
+    flask_api._local = threading.local()
+    return adapter
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """Context manager yielding a QueryCounter for every statement run inside it"""
+    from sqlalchemy import event
+
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+def seed_story(db, page_count, branching=2, title='Benchmark Story', status='published'):
+    """Insert a story whose pages form a simple branching chain"""
+    from app.models import Story, Page, Choice
+
+    story = Story(title=title, description='Seeded for benchmarks', status=status)
+    db.session.add(story)
+    db.session.flush()
+
+    pages = [
+        Page(
+            story_id=story.id,
+            text=f'Page {index} of the benchmark story.',
+            is_ending=index >= page_count - branching,
+            ending_label=f'Ending {index}' if index >= page_count - branching else None,
+        )
+        for index in range(page_count)
+    ]
+    db.session.add_all(pages)
+    db.session.flush()
+
+    choices = []
+    for index, page in enumerate(pages):
+        if page.is_ending:
+            continue
+        for offset in range(1, branching + 1):
+            target = pages[min(index + offset, page_count - 1)]
+            choices.append(Choice(page_id=page.id, text=f'Go to {target.id}', next_page_id=target.id))
+    db.session.add_all(choices)
+
+    story.start_page_id = pages[0].id
+    db.session.commit()
+    return story.id
+
+
+def percentile(samples, fraction):
+    """Return the given percentile (0..1) of a list of samples"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(func, repeat):
+    """Call func repeat times and return the list of durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
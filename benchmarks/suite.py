@@ -0,0 +1,290 @@
+"""
+Benchmark suite: every Flask API route against generated large stories.
+
+Generates a large synthetic story (app.generator) in a temporary SQLite file,
+then drives each route in app/routes.py through the Flask test client and
+reports throughput, p50/p99 latency and SQL statements per request. Routes
+that change data get fresh rows for every request, created outside the
+timed section. A route without a scenario here fails the run, so new
+endpoints cannot slip past the suite.
+
+Results can be stored as a named baseline in benchmarks/baselines/ and
+later runs compared against it: a route regresses when it runs more SQL
+statements than the baseline, or when its p50 is slower by more than
+--tolerance and by at least --min-delta milliseconds. Latency depends on
+the machine, so compare against a baseline recorded on the same one; SQL
+counts are exact everywhere. baselines/default.json holds the default
+settings' results from a reference run.
+
+    python -m benchmarks.suite --save local
+    python -m benchmarks.suite --compare local
+    python -m benchmarks.suite --pages 10000 --branching 4 --only story
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import API_HEADERS, count_queries, make_flask_app, percentile
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+
+class Scenario:
+    """One timed request shape; prepare(ctx) runs untimed and returns (url, json body)"""
+
+    def __init__(self, label, endpoint, method, prepare):
+        self.label = label
+        self.endpoint = endpoint
+        self.method = method
+        self.prepare = prepare
+
+
+def build_context(db, args):
+    """Generate the stories the scenarios read from and write to"""
+    from app.generator import generate_story
+    from app.models import Choice, Page, Story
+
+    big_id = generate_story(
+        pages=args.pages, branching=args.branching, cycle_ratio=args.cycle_ratio,
+        dice_fraction=args.dice_fraction, text_length=args.text_length, seed=1,
+        title='Suite dragon castle story',
+    )
+    for number in range(args.stories - 1):
+        generate_story(pages=50, seed=100 + number, title=f'Suite filler {number}')
+    small_id = generate_story(pages=20, branching=2, seed=2, title='Suite writable story', status='draft')
+
+    big = db.session.get(Story, big_id)
+    page_ids = [row.id for row in db.session.query(Page.id).filter_by(story_id=big_id).order_by(Page.id)]
+    start_choice = Choice.query.filter_by(page_id=big.start_page_id).order_by(Choice.id).first()
+    small_pages = [row.id for row in db.session.query(Page.id).filter_by(story_id=small_id).order_by(Page.id)]
+    return {
+        'db': db,
+        'big': big_id,
+        'start_page': big.start_page_id,
+        'start_choice': start_choice.id,
+        'middle_page': page_ids[len(page_ids) // 2],
+        'batch_ids': ','.join(str(page_id) for page_id in page_ids[:50]),
+        'small': small_id,
+        'small_pages': small_pages,
+        'import_document': import_document(200),
+    }
+
+
+def import_document(pages):
+    """An import body: a chain of pages, each with a choice back to the start"""
+    return {
+        'title': 'Suite import',
+        'status': 'draft',
+        'pages': [
+            {
+                'key': f'p{index}',
+                'text': f'Imported page {index}.',
+                'is_ending': index == pages - 1,
+                'choices': [] if index == pages - 1 else [
+                    {'text': 'Onward', 'next_page': f'p{index + 1}'},
+                    {'text': 'Back to the start', 'next_page': 'p0', 'dice_requirement': 3},
+                ],
+            }
+            for index in range(pages)
+        ],
+    }
+
+
+def fresh_story(ctx):
+    from app.generator import generate_story
+    return generate_story(pages=20, seed=3, title='Suite doomed story', status='draft')
+
+
+def fresh_page(ctx):
+    from app.models import Page
+    page = Page(story_id=ctx['small'], text='Doomed page')
+    ctx['db'].session.add(page)
+    ctx['db'].session.commit()
+    return page.id
+
+
+def fresh_choice(ctx):
+    from app.models import Choice
+    choice = Choice(page_id=ctx['small_pages'][0], text='Doomed choice', next_page_id=ctx['small_pages'][1])
+    ctx['db'].session.add(choice)
+    ctx['db'].session.commit()
+    return choice.id
+
+
+def first_choice(ctx):
+    from app.models import Choice
+    return Choice.query.filter_by(page_id=ctx['small_pages'][0]).order_by(Choice.id).first().id
+
+
+SCENARIOS = [
+    Scenario('health', 'api.health_check', 'GET', lambda ctx: ('/health', None)),
+    Scenario('stories list', 'api.get_stories', 'GET', lambda ctx: ('/stories', None)),
+    Scenario('stories page', 'api.get_stories', 'GET',
+             lambda ctx: ('/stories?limit=50&fields=title,status', None)),
+    Scenario('stories count', 'api.get_stories', 'GET', lambda ctx: ('/stories?count=1', None)),
+    Scenario('search', 'api.search_stories', 'GET',
+             lambda ctx: ('/stories/search?q=dragon+castle&pages=1', None)),
+    Scenario('story bundle', 'api.get_story', 'GET', lambda ctx: (f"/stories/{ctx['big']}", None)),
+    Scenario('story start', 'api.get_story_start', 'GET', lambda ctx: (f"/stories/{ctx['big']}/start", None)),
+    Scenario('story tree', 'api.get_story_tree', 'GET', lambda ctx: (f"/stories/{ctx['big']}/tree", None)),
+    Scenario('story analysis', 'api.get_story_analysis', 'GET',
+             lambda ctx: (f"/stories/{ctx['big']}/analysis", None)),
+    Scenario('story odds', 'api.get_story_odds', 'GET', lambda ctx: (f"/stories/{ctx['big']}/odds", None)),
+    Scenario('story endings', 'api.get_story_endings', 'GET',
+             lambda ctx: (f"/stories/{ctx['big']}/endings", None)),
+    Scenario('page batch', 'api.get_pages', 'GET', lambda ctx: (f"/pages?ids={ctx['batch_ids']}", None)),
+    Scenario('page', 'api.get_page', 'GET', lambda ctx: (f"/pages/{ctx['middle_page']}", None)),
+    Scenario('page expand', 'api.get_page', 'GET',
+             lambda ctx: (f"/pages/{ctx['middle_page']}?expand=next&depth=2", None)),
+    Scenario('step', 'api.story_step', 'POST', lambda ctx: (
+        f"/stories/{ctx['big']}/step",
+        {'page_id': ctx['start_page'], 'choice_id': ctx['start_choice'], 'dice_roll': 6},
+    )),
+    Scenario('create story', 'api.create_story', 'POST',
+             lambda ctx: ('/stories', {'title': 'Suite story', 'description': 'Created by the suite'})),
+    Scenario('import story', 'api.import_story', 'POST',
+             lambda ctx: ('/stories/import', ctx['import_document'])),
+    Scenario('update story', 'api.update_story', 'PUT',
+             lambda ctx: (f"/stories/{ctx['small']}", {'description': 'Updated by the suite'})),
+    Scenario('delete story', 'api.delete_story', 'DELETE', lambda ctx: (f'/stories/{fresh_story(ctx)}', None)),
+    Scenario('create page', 'api.create_page', 'POST',
+             lambda ctx: (f"/stories/{ctx['small']}/pages", {'text': 'A page added by the suite'})),
+    Scenario('update page', 'api.update_page', 'PUT',
+             lambda ctx: (f"/pages/{ctx['small_pages'][1]}", {'text': 'Rewritten by the suite'})),
+    Scenario('delete page', 'api.delete_page', 'DELETE', lambda ctx: (f'/pages/{fresh_page(ctx)}', None)),
+    Scenario('create choice', 'api.create_choice', 'POST', lambda ctx: (
+        f"/pages/{ctx['small_pages'][0]}/choices",
+        {'text': 'Added by the suite', 'next_page_id': ctx['small_pages'][2]},
+    )),
+    Scenario('update choice', 'api.update_choice', 'PUT',
+             lambda ctx: (f'/choices/{first_choice(ctx)}', {'text': 'Renamed by the suite'})),
+    Scenario('delete choice', 'api.delete_choice', 'DELETE',
+             lambda ctx: (f'/choices/{fresh_choice(ctx)}', None)),
+]
+
+
+def missing_routes(app):
+    """api blueprint endpoints that no scenario exercises"""
+    covered = {scenario.endpoint for scenario in SCENARIOS}
+    return sorted(
+        rule.endpoint for rule in app.url_map.iter_rules()
+        if rule.endpoint.startswith('api.') and rule.endpoint not in covered
+    )
+
+
+def run_scenario(client, engine, ctx, scenario, repeat):
+    durations = []
+    statements = []
+    with count_queries(engine) as counter:
+        for _ in range(repeat):
+            url, body = scenario.prepare(ctx)
+            before = counter.count
+            started = time.perf_counter()
+            response = client.open(url, method=scenario.method, json=body, headers=API_HEADERS)
+            durations.append((time.perf_counter() - started) * 1000)
+            statements.append(counter.count - before)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{scenario.label}: {scenario.method} {url} -> {response.status_code}')
+    return {
+        'endpoint': scenario.endpoint,
+        'method': scenario.method,
+        'rps': round(1000 * len(durations) / sum(durations), 1),
+        'p50_ms': round(percentile(durations, 0.5), 3),
+        'p99_ms': round(percentile(durations, 0.99), 3),
+        'sql': statistics.median(statements),
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Regression messages for results against a stored baseline"""
+    regressions = []
+    for label, result in results.items():
+        before = baseline['results'].get(label)
+        if before is None:
+            continue
+        if result['sql'] > before['sql']:
+            regressions.append(f"{label}: {result['sql']} SQL statements, baseline {before['sql']}")
+        slower = result['p50_ms'] - before['p50_ms']
+        if result['p50_ms'] > before['p50_ms'] * (1 + tolerance) and slower >= min_delta:
+            regressions.append(f"{label}: p50 {result['p50_ms']:.2f} ms, baseline {before['p50_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=2000, help='Pages in the large generated story')
+    parser.add_argument('--branching', type=int, default=3, help='Choices per page of the large story')
+    parser.add_argument('--cycle-ratio', type=float, default=0.1)
+    parser.add_argument('--dice-fraction', type=float, default=0.2)
+    parser.add_argument('--text-length', type=int, default=400)
+    parser.add_argument('--stories', type=int, default=50, help='Published stories in the lists')
+    parser.add_argument('--repeat', type=int, default=30, help='Requests per scenario')
+    parser.add_argument('--only', help='Only scenarios whose label contains this')
+    parser.add_argument('--save', metavar='NAME', help='Store the results as baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='Compare against baselines/NAME.json')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Allowed p50 slowdown, 0.5 = 50%%')
+    parser.add_argument('--min-delta', type=float, default=1.0,
+                        help='Ignore p50 slowdowns smaller than this many ms (timer noise)')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        app = make_flask_app(f'sqlite:///{path}')
+        missing = missing_routes(app)
+        if missing:
+            print(f"No scenario for: {', '.join(missing)}")
+            sys.exit(1)
+
+        from app import db
+        results = {}
+        with app.app_context():
+            started = time.perf_counter()
+            ctx = build_context(db, args)
+            print(f'Generated {args.pages} pages (+ {args.stories} stories) in {time.perf_counter() - started:.1f}s\n')
+
+            client = app.test_client()
+            print(f"{'scenario':<16} {'method':<7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'sql':>6}")
+            for scenario in SCENARIOS:
+                if args.only and args.only not in scenario.label:
+                    continue
+                result = run_scenario(client, db.engine, ctx, scenario, args.repeat)
+                results[scenario.label] = result
+                print(f"{scenario.label:<16} {scenario.method:<7} {result['rps']:>9.1f} "
+                      f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['sql']:>6g}")
+    finally:
+        os.remove(path)
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline = {
+            'settings': {key: getattr(args, key) for key in
+                         ('pages', 'branching', 'cycle_ratio', 'dice_fraction', 'text_length', 'stories', 'repeat')},
+            'machine': {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                        'platform': platform.platform()},
+            'results': results,
+        }
+        (BASELINE_DIR / f'{args.save}.json').write_text(json.dumps(baseline, indent=2) + '\n')
+        print(f'\nSaved baseline {args.save}')
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f'{args.compare}.json').read_text())
+        if baseline['settings']['pages'] != args.pages or baseline['settings']['branching'] != args.branching:
+            print(f"\nBaseline {args.compare} was recorded with different story settings: {baseline['settings']}")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f'\nRegressions against {args.compare}:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print(f'\nNo regressions against {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
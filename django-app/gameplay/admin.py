@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Play, PlaySession, UserProfile, Rating, Report, PlayerPath
+from .models import Play, PlaySession, UserProfile, Rating, Report, PlayerPath, StoryStats, EndingStats, StatisticsSnapshot
 
 
 @admin.register(UserProfile)
@@ -52,3 +52,22 @@ class PlayerPathAdmin(admin.ModelAdmin):
     list_display = ['id', 'play', 'page_id', 'sequence', 'timestamp']
     list_filter = ['timestamp']
     search_fields = ['play__id']
+
+
+@admin.register(StoryStats)
+class StoryStatsAdmin(admin.ModelAdmin):
+    list_display = ['story_id', 'play_count', 'rating_count', 'avg_rating', 'last_played_at']
+    readonly_fields = ['story_id', 'play_count', 'rating_count', 'rating_sum', 'last_played_at']
+
+
+@admin.register(EndingStats)
+class EndingStatsAdmin(admin.ModelAdmin):
+    list_display = ['story_id', 'ending_page_id', 'play_count']
+    list_filter = ['story_id']
+    readonly_fields = ['story_id', 'ending_page_id', 'play_count']
+
+
+@admin.register(StatisticsSnapshot)
+class StatisticsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created_at', 'build_ms']
+    readonly_fields = ['created_at', 'build_ms', 'data']
@@ -1,84 +1,525 @@
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.cache import caches
+
+
+# Must not exceed MAX_BATCH_IDS in the Flask API
+BATCH_SIZE = 500
+
+# Stories per GET /stories?limit= page in iter_stories(); at most MAX_LIST_LIMIT
+STORY_PAGE_SIZE = 100
+
+# Upstream statuses worth retrying for idempotent requests
+RETRY_STATUSES = {502, 503, 504}
 
 
 class FlaskAPIClient:
-    """Client for communicating with the Flask Story API"""
-    
-    def __init__(self):
-        self.base_url = settings.FLASK_API_URL
-        self.api_key = settings.FLASK_API_KEY
-    
+    """Client for communicating with the Flask Story API
+
+    All calls share one pooled keep-alive transport. Each thread gets its own
+    requests.Session (sessions are not thread-safe) mounted on that shared
+    adapter, so multi-threaded WSGI workers reuse connections safely.
+    """
+
+    def __init__(self, base_url=None, api_key=None):
+        self.base_url = base_url or settings.FLASK_API_URL
+        self.api_key = api_key or settings.FLASK_API_KEY
+        self.timeouts = settings.FLASK_API_TIMEOUTS
+        self.max_retries = settings.FLASK_API_MAX_RETRIES
+        self.retry_backoff = settings.FLASK_API_RETRY_BACKOFF
+        self.retry_backoff_max = settings.FLASK_API_RETRY_BACKOFF_MAX
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.FLASK_API_POOL_SIZE,
+            max_retries=0,
+        )
+        self._local = threading.local()
+        self.cache_settings = settings.FLASK_API_CACHE
+        self.prefetch_settings = settings.FLASK_API_PREFETCH
+        self._stats = {
+            'hits': 0, 'misses': 0, 'stale_hits': 0, 'refreshes': 0, 'not_modified': 0, 'invalidations': 0,
+            'local_steps': 0, 'prefetched': 0,
+        }
+        self._stats_lock = threading.Lock()
+        # Called as hook(method, path, seconds, status) after every _request(),
+        # status being None when no response arrived; see gameplay.middleware
+        self.request_hooks = []
+        # Called with no arguments before every request; each returns a dict of
+        # extra headers (e.g. X-Request-ID) or None
+        self.header_hooks = []
+
+    @property
+    def session(self):
+        """The calling thread's session, bound to the shared connection pool"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+
     def _get_headers(self, authenticated=False):
         """Get request headers, optionally with API key"""
         headers = {'Content-Type': 'application/json'}
         if authenticated:
             headers['X-API-KEY'] = self.api_key
         return headers
-    
+
+    def _get_timeout(self, endpoint):
+        """Timeout in seconds for a named endpoint group, see FLASK_API_TIMEOUTS"""
+        return self.timeouts.get(endpoint, self.timeouts['default'])
+
+    def _backoff(self, attempt):
+        """Exponential backoff with full jitter, capped at retry_backoff_max"""
+        ceiling = min(self.retry_backoff_max, self.retry_backoff * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _request(self, method, path, endpoint='default', authenticated=False, headers=None, **kwargs):
+        """Send a request and return the response, raising requests.RequestException on failure
+
+        Only GET requests are retried: on connection errors, timeouts and
+        RETRY_STATUSES, up to max_retries times. request_hooks see the whole
+        call, retries included.
+        """
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self._send(method, path, endpoint, authenticated, headers, **kwargs)
+            return response
+        except requests.HTTPError as e:
+            response = e.response
+            raise
+        finally:
+            if self.request_hooks:
+                elapsed = time.perf_counter() - started
+                status = response.status_code if response is not None else None
+                for hook in self.request_hooks:
+                    hook(method, path, elapsed, status)
+
+    def _send(self, method, path, endpoint, authenticated, headers, **kwargs):
+        """The HTTP exchange behind _request(), including retries"""
+        url = f"{self.base_url}{path}"
+        request_headers = self._get_headers(authenticated=authenticated)
+        for hook in self.header_hooks:
+            request_headers.update(hook() or {})
+        request_headers.update(headers or {})
+        attempts = 1 + (self.max_retries if method == 'GET' else 0)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    headers=request_headers,
+                    timeout=self._get_timeout(endpoint),
+                    **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+            else:
+                if last_attempt or response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+            time.sleep(self._backoff(attempt))
+
+    # ========== READ-THROUGH CACHE ==========
+    #
+    # Entries are stored as {'data': ..., 'etag': ..., 'expires': <unix time>}
+    # and kept in the Django cache for TTL + STALE_TTL seconds. Past 'expires'
+    # an entry is stale: it is still served (and revalidated in the background
+    # with If-None-Match) so readers can keep playing while Flask is slow or down.
+
+    @property
+    def cache(self):
+        return caches[self.cache_settings['ALIAS']]
+
+    @staticmethod
+    def _cache_key(kind, key):
+        return f'flaskapi:{kind}:{key}'
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def cache_stats(self):
+        """Hit/miss counters for this process, with the resulting hit ratio"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else None
+        return stats
+
+    def _cache_set(self, kind, key, data, etag=None):
+        ttl = self.cache_settings['TTL'][kind]
+        entry = {'data': data, 'etag': etag, 'expires': time.time() + ttl}
+        self.cache.set(self._cache_key(kind, key), entry, ttl + self.cache_settings['STALE_TTL'])
+
+    def _fetch(self, kind, key, path, endpoint, entry=None, params=None):
+        """GET a resource into the cache, sending If-None-Match when entry has an ETag"""
+        headers = {'If-None-Match': entry['etag']} if entry and entry.get('etag') else None
+        response = self._request('GET', path, endpoint=endpoint, headers=headers, params=params)
+        if response.status_code == 304:
+            self._count('not_modified')
+            data = entry['data']
+        else:
+            data = response.json()
+        self._cache_set(kind, key, data, response.headers.get('ETag'))
+        return data
+
+    def _fresh_many(self, kind, keys):
+        """Unexpired cached data for the given keys, without ever fetching"""
+        cache_keys = {self._cache_key(kind, key): key for key in keys}
+        now = time.time()
+        return {
+            cache_keys[cache_key]: entry['data']
+            for cache_key, entry in self.cache.get_many(list(cache_keys)).items()
+            if entry['expires'] > now
+        }
+
+    def _cached_get(self, kind, key, path, endpoint='default'):
+        """Read-through lookup of a single resource, raising RequestException on a cold miss"""
+        entry = self.cache.get(self._cache_key(kind, key))
+        if entry is not None:
+            if entry['expires'] > time.time():
+                self._count('hits')
+                return entry['data']
+            self._count('stale_hits')
+            self._refresh(kind, key, path, endpoint, entry)
+            return entry['data']
+
+        self._count('misses')
+        return self._fetch(kind, key, path, endpoint)
+
+    def _refresh(self, kind, key, path, endpoint, entry):
+        """Revalidate a stale entry, in a background thread unless disabled"""
+        lock_key = self._cache_key(kind, key) + ':refreshing'
+        if not self.cache.add(lock_key, True, self._get_timeout(endpoint) * (1 + self.max_retries)):
+            return  # another worker is already refreshing this entry
+
+        def refresh():
+            try:
+                self._fetch(kind, key, path, endpoint, entry)
+            except requests.RequestException as e:
+                print(f"Error refreshing {kind} {key}, serving stale copy: {e}")
+            else:
+                self._count('refreshes')
+            finally:
+                self.cache.delete(lock_key)
+
+        if self.cache_settings['BACKGROUND_REFRESH']:
+            threading.Thread(target=refresh, daemon=True).start()
+        else:
+            refresh()
+
+    def invalidate(self, kind, *keys):
+        """Drop cached entries of one kind"""
+        if keys:
+            self.cache.delete_many([self._cache_key(kind, key) for key in keys])
+            self._count('invalidations', len(keys))
+
+    def invalidate_story(self, story_id, page_ids=()):
+        """Drop a story's own entries plus the given page entries"""
+        for kind in ('story', 'summary', 'start', 'tree', 'analysis', 'odds'):
+            self.invalidate(kind, story_id)
+        self.invalidate('page', *page_ids)
+
     # ========== READ OPERATIONS (Public) ==========
-    
+
     def get_stories(self, status=None):
-        """Get all stories, optionally filtered by status"""
-        url = f"{self.base_url}/stories"
+        """Get all stories, optionally filtered by status
+
+        Always revalidated with Flask, but an unchanged list comes back as an
+        empty 304 and is served from the cached copy.
+        """
         params = {'status': status} if status else {}
+        key = status or 'all'
         try:
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            entry = self.cache.get(self._cache_key('stories', key))
+            return self._fetch('stories', key, '/stories', 'list', entry, params=params)
         except requests.RequestException as e:
             print(f"Error fetching stories: {e}")
             return []
-    
+
+    def iter_stories(self, status=None, author_id=None, fields=None, page_size=STORY_PAGE_SIZE):
+        """Yield stories newest first, fetching one cursor page at a time as the caller consumes them
+
+        fields limits each story dict to those keys (plus 'id'). A failed page
+        request ends the iteration early.
+        """
+        params = {'limit': page_size}
+        if status:
+            params['status'] = status
+        if author_id is not None:
+            params['author_id'] = author_id
+        if fields:
+            params['fields'] = ','.join(fields)
+        while True:
+            try:
+                data = self._request('GET', '/stories', endpoint='list', params=params).json()
+            except requests.RequestException as e:
+                print(f"Error fetching stories page: {e}")
+                return
+            yield from data['stories']
+            if not data['next_cursor']:
+                return
+            params['cursor'] = data['next_cursor']
+
+    def count_stories(self, status=None, author_id=None):
+        """Number of stories matching the filters, or None if Flask could not be reached"""
+        params = {'count': 1}
+        if status:
+            params['status'] = status
+        if author_id is not None:
+            params['author_id'] = author_id
+        try:
+            return self._request('GET', '/stories', endpoint='list', params=params).json()['count']
+        except requests.RequestException as e:
+            print(f"Error counting stories: {e}")
+            return None
+
+    def search_stories(self, query, include_pages=False, page=1, per_page=20):
+        """Full-text search of published stories, best match first
+
+        Returns Flask's {'results', 'page', 'per_page', 'total', 'has_more'} dict,
+        or None when the search failed.
+        """
+        params = {'q': query, 'page': page, 'per_page': per_page}
+        if include_pages:
+            params['pages'] = 1
+        try:
+            return self._request('GET', '/stories/search', endpoint='list', params=params).json()
+        except requests.RequestException as e:
+            print(f"Error searching stories for {query!r}: {e}")
+            return None
+
     def get_story(self, story_id):
         """Get a single story by ID"""
-        url = f"{self.base_url}/stories/{story_id}"
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._cached_get('story', story_id, f'/stories/{story_id}', endpoint='story')
         except requests.RequestException as e:
             print(f"Error fetching story {story_id}: {e}")
             return None
-    
+
     def get_story_start(self, story_id):
         """Get the starting page of a story"""
-        url = f"{self.base_url}/stories/{story_id}/start"
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._cached_get('start', story_id, f'/stories/{story_id}/start')
         except requests.RequestException as e:
             print(f"Error fetching story start {story_id}: {e}")
             return None
-    
+
     def get_page(self, page_id):
         """Get a page with its choices"""
-        url = f"{self.base_url}/pages/{page_id}"
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._cached_get('page', page_id, f'/pages/{page_id}')
         except requests.RequestException as e:
             print(f"Error fetching page {page_id}: {e}")
             return None
-    
+
+    def get_pages(self, page_ids):
+        """Get several pages with their choices, as a dict keyed by page ID
+
+        Fresh cache entries are used as-is; only the rest are fetched.
+        """
+        page_ids = list(dict.fromkeys(int(i) for i in page_ids if i is not None))
+        keys = {self._cache_key('page', page_id): page_id for page_id in page_ids}
+        entries = self.cache.get_many(list(keys))
+        now = time.time()
+
+        pages = {keys[k]: entry['data'] for k, entry in entries.items() if entry['expires'] > now}
+        missing = [page_id for page_id in page_ids if page_id not in pages]
+        self._count('hits', len(pages))
+        self._count('misses', len(missing))
+
+        fetched = self._get_batch('pages', missing)
+        for page_id, page in fetched.items():
+            self._cache_set('page', page_id, page)
+        pages.update(fetched)
+
+        # Fall back to stale copies for anything Flask did not return
+        for k, entry in entries.items():
+            pages.setdefault(keys[k], entry['data'])
+        return pages
+
+    def get_stories_by_ids(self, story_ids):
+        """Get several stories (without pages), as a dict keyed by story ID"""
+        return self._get_batch('stories', story_ids)
+
+    def _get_batch(self, resource, ids):
+        """Fetch /<resource>?ids=... in as few requests as BATCH_SIZE allows"""
+        unique_ids = list(dict.fromkeys(int(i) for i in ids if i is not None))
+        results = {}
+        for start in range(0, len(unique_ids), BATCH_SIZE):
+            chunk = unique_ids[start:start + BATCH_SIZE]
+            try:
+                response = self._request(
+                    'GET',
+                    f'/{resource}',
+                    endpoint='batch',
+                    params={'ids': ','.join(map(str, chunk))}
+                )
+            except requests.RequestException as e:
+                print(f"Error fetching {resource} {chunk}: {e}")
+                continue
+            for item in response.json():
+                results[item['id']] = item
+        return results
+
     def get_story_tree(self, story_id):
         """Get the story tree for visualization (Level 18)"""
-        url = f"{self.base_url}/stories/{story_id}/tree"
         try:
-            response = requests.get(url, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._cached_get('tree', story_id, f'/stories/{story_id}/tree', endpoint='story')
         except requests.RequestException as e:
             print(f"Error fetching story tree {story_id}: {e}")
             return None
-    
+
+    def get_story_analysis(self, story_id):
+        """Get the structural analysis of a story: unreachable pages, dead ends, cycles, ending depths"""
+        try:
+            return self._cached_get('analysis', story_id, f'/stories/{story_id}/analysis', endpoint='story')
+        except requests.RequestException as e:
+            print(f"Error fetching story analysis {story_id}: {e}")
+            return None
+
+    def get_story_odds(self, story_id):
+        """Get the predicted probability of each ending and the expected path length"""
+        try:
+            return self._cached_get('odds', story_id, f'/stories/{story_id}/odds', endpoint='story')
+        except requests.RequestException as e:
+            print(f"Error fetching story odds {story_id}: {e}")
+            return None
+
+    def get_story_endings(self, story_id, version):
+        """Get a story's endings as a dict keyed by page ID
+
+        Cached under the story version, so an edit (which bumps the version)
+        simply moves readers to a new entry instead of needing invalidation.
+        """
+        try:
+            data = self._cached_get('endings', f'{story_id}:v{version}', f'/stories/{story_id}/endings',
+                                    endpoint='story')
+        except requests.RequestException as e:
+            print(f"Error fetching story endings {story_id}: {e}")
+            return {}
+        return {ending['id']: ending for ending in data['endings']}
+
+    # ========== PLAY ==========
+
+    def step(self, story_id, page_id=None, choice_id=None, dice_roll=None):
+        """Start, resume or advance a play in at most one round trip
+
+        Flask validates the move and returns {'story', 'page', 'choice'}.
+        A rejected move comes back as {'error', 'code', ...}; None means
+        Flask could not be reached or the story does not exist. When the
+        story and both pages are fresh in the cache (see prefetch_next) the
+        move is resolved locally with the same checks.
+        """
+        result = self._step_from_cache(story_id, page_id, choice_id, dice_roll)
+        if result is not None:
+            self._count('local_steps')
+            return result
+
+        payload = {'page_id': page_id, 'choice_id': choice_id, 'dice_roll': dice_roll}
+        try:
+            response = self._request('POST', f'/stories/{story_id}/step', endpoint='story', json=payload)
+        except requests.HTTPError as e:
+            try:
+                body = e.response.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict) and 'code' in body:
+                return body
+            print(f"Error stepping through story {story_id}: {e}")
+            return None
+        except requests.RequestException as e:
+            print(f"Error stepping through story {story_id}: {e}")
+            return None
+
+        result = response.json()
+        self._cache_set('summary', story_id, result['story'])
+        self._cache_set('page', result['page']['id'], result['page'])
+        return result
+
+    def _step_from_cache(self, story_id, page_id, choice_id, dice_roll):
+        """Resolve a valid step from fresh cache entries, or return None to ask Flask
+
+        Rejections are always left to Flask so their codes and messages
+        come from one place.
+        """
+        story = self._fresh_many('summary', [story_id]).get(story_id)
+        if story is None or story.get('status') == 'suspended':
+            return None
+        try:
+            page_id = int(page_id or story.get('start_page_id') or 0)
+            choice_id = int(choice_id) if choice_id is not None else None
+        except (TypeError, ValueError):
+            return None
+
+        page = self._fresh_many('page', [page_id]).get(page_id)
+        if page is None or page.get('story_id') != story['id']:
+            return None
+        if choice_id is None:
+            return {'story': story, 'page': page, 'choice': None}
+
+        choice = next((c for c in page.get('choices', []) if c['id'] == choice_id), None)
+        if choice is None:
+            return None
+        if choice.get('dice_requirement') and (dice_roll or 0) < choice['dice_requirement']:
+            return None
+        next_page = self._fresh_many('page', [choice['next_page_id']]).get(choice['next_page_id'])
+        if next_page is None:
+            return None
+        return {'story': story, 'page': next_page, 'choice': choice}
+
+    def prefetch_next(self, page):
+        """Warm the page cache with the pages a reader can reach from `page`
+
+        Called while the reader is still reading, so the next click can be
+        answered from the cache. One GET /pages/<id>?expand=next fetches all
+        of them, in a background thread unless disabled. Does nothing when
+        they are all fresh already.
+        """
+        if not self.prefetch_settings['ENABLED'] or page.get('is_ending'):
+            return
+        next_ids = {choice['next_page_id'] for choice in page.get('choices', [])}
+        if not next_ids or len(self._fresh_many('page', next_ids)) == len(next_ids):
+            return
+
+        lock_key = self._cache_key('prefetch', page['id'])
+        if not self.cache.add(lock_key, True, self._get_timeout('story')):
+            return  # another request is already prefetching from this page
+
+        def prefetch():
+            try:
+                response = self._request(
+                    'GET', f"/pages/{page['id']}", endpoint='story',
+                    params={'expand': 'next', 'depth': self.prefetch_settings['DEPTH']}
+                )
+                next_pages = response.json().get('next_pages', [])
+                for next_page in next_pages:
+                    self._cache_set('page', next_page['id'], next_page)
+                self._count('prefetched', len(next_pages))
+            except requests.RequestException as e:
+                print(f"Error prefetching pages after {page['id']}: {e}")
+            finally:
+                self.cache.delete(lock_key)
+
+        if self.prefetch_settings['BACKGROUND']:
+            threading.Thread(target=prefetch, daemon=True).start()
+        else:
+            prefetch()
+
     # ========== WRITE OPERATIONS (Authenticated) ==========
-    
+
     def create_story(self, title, description='', status='draft', author_id=None, illustration_url=None):
         """Create a new story"""
-        url = f"{self.base_url}/stories"
         data = {
             'title': title,
             'description': description,
@@ -87,52 +528,51 @@ class FlaskAPIClient:
             'illustration_url': illustration_url
         }
         try:
-            response = requests.post(
-                url, 
-                json=data, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            return self._request('POST', '/stories', endpoint='write', authenticated=True, json=data).json()
         except requests.RequestException as e:
             print(f"Error creating story: {e}")
             return None
-    
+
+    def import_story(self, document):
+        """Create a whole story (pages and choices keyed by temporary keys) in one request
+
+        Returns {'story': ..., 'page_ids': {key: id}, 'choice_count': n} or None.
+        """
+        try:
+            return self._request(
+                'POST', '/stories/import', endpoint='import', authenticated=True, json=document
+            ).json()
+        except requests.RequestException as e:
+            print(f"Error importing story: {e}")
+            return None
+
     def update_story(self, story_id, **kwargs):
         """Update a story"""
-        url = f"{self.base_url}/stories/{story_id}"
         try:
-            response = requests.put(
-                url, 
-                json=kwargs, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            story = self._request(
+                'PUT', f'/stories/{story_id}', endpoint='write', authenticated=True, json=kwargs
+            ).json()
         except requests.RequestException as e:
             print(f"Error updating story {story_id}: {e}")
             return None
-    
-    def delete_story(self, story_id):
-        """Delete a story"""
-        url = f"{self.base_url}/stories/{story_id}"
+        self.invalidate_story(story_id)
+        return story
+
+    def delete_story(self, story_id, soft=False):
+        """Delete a story; a soft delete hides it at once and purges it in the background"""
+        params = {'mode': 'soft'} if soft else None
         try:
-            response = requests.delete(
-                url, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return True
+            result = self._request(
+                'DELETE', f'/stories/{story_id}', endpoint='write', authenticated=True, params=params
+            ).json()
         except requests.RequestException as e:
             print(f"Error deleting story {story_id}: {e}")
             return False
-    
+        self.invalidate_story(story_id, result.get('page_ids', []))
+        return True
+
     def create_page(self, story_id, text, is_ending=False, ending_label=None, illustration_url=None):
         """Create a new page"""
-        url = f"{self.base_url}/stories/{story_id}/pages"
         data = {
             'text': text,
             'is_ending': is_ending,
@@ -140,100 +580,75 @@ class FlaskAPIClient:
             'illustration_url': illustration_url
         }
         try:
-            response = requests.post(
-                url, 
-                json=data, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            page = self._request(
+                'POST', f'/stories/{story_id}/pages', endpoint='write', authenticated=True, json=data
+            ).json()
         except requests.RequestException as e:
             print(f"Error creating page: {e}")
             return None
-    
+        self.invalidate_story(story_id)
+        return page
+
     def update_page(self, page_id, **kwargs):
         """Update a page"""
-        url = f"{self.base_url}/pages/{page_id}"
         try:
-            response = requests.put(
-                url, 
-                json=kwargs, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            page = self._request(
+                'PUT', f'/pages/{page_id}', endpoint='write', authenticated=True, json=kwargs
+            ).json()
         except requests.RequestException as e:
             print(f"Error updating page {page_id}: {e}")
             return None
-    
+        self.invalidate_story(page['story_id'], [page_id])
+        return page
+
     def delete_page(self, page_id):
         """Delete a page"""
-        url = f"{self.base_url}/pages/{page_id}"
         try:
-            response = requests.delete(
-                url, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return True
+            result = self._request('DELETE', f'/pages/{page_id}', endpoint='write', authenticated=True).json()
         except requests.RequestException as e:
             print(f"Error deleting page {page_id}: {e}")
             return False
-    
+        self.invalidate_story(result['story_id'], [page_id] + result.get('affected_page_ids', []))
+        return True
+
     def create_choice(self, page_id, text, next_page_id, dice_requirement=None):
         """Create a new choice"""
-        url = f"{self.base_url}/pages/{page_id}/choices"
         data = {
             'text': text,
             'next_page_id': next_page_id,
             'dice_requirement': dice_requirement
         }
         try:
-            response = requests.post(
-                url, 
-                json=data, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            choice = self._request(
+                'POST', f'/pages/{page_id}/choices', endpoint='write', authenticated=True, json=data
+            ).json()
         except requests.RequestException as e:
             print(f"Error creating choice: {e}")
             return None
-    
+        self.invalidate_story(choice['story_id'], [page_id])
+        return choice
+
     def update_choice(self, choice_id, **kwargs):
         """Update a choice"""
-        url = f"{self.base_url}/choices/{choice_id}"
         try:
-            response = requests.put(
-                url, 
-                json=kwargs, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return response.json()
+            choice = self._request(
+                'PUT', f'/choices/{choice_id}', endpoint='write', authenticated=True, json=kwargs
+            ).json()
         except requests.RequestException as e:
             print(f"Error updating choice {choice_id}: {e}")
             return None
-    
+        self.invalidate_story(choice['story_id'], [choice['page_id']])
+        return choice
+
     def delete_choice(self, choice_id):
         """Delete a choice"""
-        url = f"{self.base_url}/choices/{choice_id}"
         try:
-            response = requests.delete(
-                url, 
-                headers=self._get_headers(authenticated=True),
-                timeout=5
-            )
-            response.raise_for_status()
-            return True
+            result = self._request('DELETE', f'/choices/{choice_id}', endpoint='write', authenticated=True).json()
         except requests.RequestException as e:
             print(f"Error deleting choice {choice_id}: {e}")
             return False
+        self.invalidate_story(result['story_id'], [result['page_id']])
+        return True
 
 
 # Global instance
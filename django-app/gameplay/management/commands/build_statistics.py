@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from gameplay.stats import build_statistics_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the snapshot behind the public /statistics/ page. '
+        'Run from cron to keep it fresh without any work on page views.'
+    )
+
+    def handle(self, *args, **options):
+        snapshot = build_statistics_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Built statistics snapshot {snapshot.id} in {snapshot.build_ms:.0f} ms'
+        ))
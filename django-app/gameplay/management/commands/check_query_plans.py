@@ -0,0 +1,116 @@
+import random
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from gameplay.models import EndingStats, Play, PlaySession, Rating, Report, PlayerPath, StoryStats
+from gameplay.stats import rebuild_story_stats
+
+# "SCAN gameplay_play" is a full table scan; "SCAN ... USING INDEX" walks an index
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def hot_queries(user, story_id, ending_page_id, play):
+    """(label, queryset) for every query the gameplay views run on each request"""
+    return [
+        ('story_detail: story stats', StoryStats.objects.filter(story_id=story_id)),
+        ('story_detail: ending counts', EndingStats.objects.filter(story_id=story_id, play_count__gt=0)),
+        ('story_detail: ratings', Rating.objects.filter(story_id=story_id).select_related('user')),
+        ('story_ending: ending stats',
+         EndingStats.objects.filter(story_id=story_id, ending_page_id=ending_page_id)),
+        ('story_ending: latest play',
+         Play.objects.filter(user=user, story_id=story_id, ending_page_id=ending_page_id).order_by('-created_at')[:1]),
+        ('play_story: anonymous session',
+         PlaySession.objects.filter(session_key=play.id, story_id=story_id, user__isnull=True)),
+        ('play_story: user session', PlaySession.objects.filter(user=user, story_id=story_id)),
+        ('profile: recent plays', Play.objects.filter(user=user).order_by('-created_at')[:10]),
+        ('profile: recent ratings', Rating.objects.filter(user=user).order_by('-created_at')[:5]),
+        ('statistics: top stories',
+         StoryStats.objects.filter(play_count__gt=0).order_by('-play_count').values('story_id', 'play_count')[:10]),
+        ('statistics: recent ratings', Rating.objects.select_related('user').order_by('-created_at')[:10]),
+        ('admin_dashboard: pending reports', Report.objects.filter(status='pending').select_related('user')),
+        ('report_story: existing report',
+         Report.objects.filter(story_id=story_id, user=user, status__in=['pending', 'reviewed'])),
+        ('player_path: path nodes', PlayerPath.objects.filter(play=play).order_by('sequence')),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN QUERY PLAN on every hot gameplay query and fail if one falls back '
+        'to a full table scan. Seeds a large dataset inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plays', type=int, default=50000, help='Plays to seed (0 to use existing data)')
+        parser.add_argument('--stories', type=int, default=500, help='Distinct story IDs to spread plays over')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans understands SQLite query plans only')
+
+        failures = []
+        with transaction.atomic():
+            if options['plays']:
+                self.seed(options['plays'], options['stories'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+            play = Play.objects.filter(user__isnull=False).first()
+            if play is None:
+                raise CommandError('No plays to check against; run with --plays')
+
+            for label, queryset in hot_queries(play.user, play.story_id, play.ending_page_id, play):
+                sql, params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = [row[-1] for row in cursor.fetchall()]
+                scans = [m.group(1) for m in map(FULL_SCAN.match, plan) if m]
+                status = 'FULL SCAN ' + ', '.join(scans) if scans else 'ok'
+                self.stdout.write(f'{label:<36} {status}')
+                if scans:
+                    failures.append(f'{label}: {" / ".join(plan)}')
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Query plan regressions:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('No full table scans in hot queries.'))
+
+    def seed(self, play_count, story_count):
+        """Insert users, plays, paths, sessions, ratings and reports at realistic ratios"""
+        rng = random.Random(42)
+        users = [User.objects.create(username=f'plan-check-{i}') for i in range(50)]
+
+        plays = Play.objects.bulk_create([
+            Play(
+                story_id=rng.randrange(story_count),
+                ending_page_id=rng.randrange(10000),
+                user=rng.choice(users + [None]),
+            )
+            for _ in range(play_count)
+        ])
+        PlayerPath.objects.bulk_create([
+            PlayerPath(play=play, page_id=rng.randrange(10000), sequence=sequence)
+            for play in plays[:play_count // 10]
+            for sequence in range(1, 6)
+        ])
+        # One saved game per user and story, as the app keeps it
+        PlaySession.objects.bulk_create([
+            PlaySession(session_key=f'seed{i}', story_id=rng.randrange(story_count),
+                        current_page_id=1, user=rng.choice(users + [None]))
+            for i in range(play_count // 5)
+        ], ignore_conflicts=True)
+        Rating.objects.bulk_create([
+            Rating(story_id=story_id, user=user, stars=rng.randint(1, 5))
+            for story_id in range(story_count)
+            for user in rng.sample(users, 10)
+        ])
+        Report.objects.bulk_create([
+            Report(story_id=rng.randrange(story_count), user=rng.choice(users), reason='spam',
+                   description='seeded', status=rng.choice(['pending', 'reviewed', 'resolved', 'dismissed']))
+            for _ in range(play_count // 10)
+        ])
+        rebuild_story_stats()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from gameplay.telemetry import telemetry_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Write every queued gameplay telemetry event (saved progress, completed plays) to the '
+        'database now. Safe to run alongside the web workers. Events that are waiting to retry '
+        'after a failure are left queued.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats', action='store_true', help='Only print queue depth and flush counters')
+        parser.add_argument('--retry-dead', action='store_true',
+                            help='Put dead-lettered events back on the queue before flushing')
+
+    def handle(self, *args, **options):
+        if options['retry_dead']:
+            moved = telemetry_queue.retry_dead()
+            self.stdout.write(f'Requeued {moved} dead-lettered events')
+        if not options['stats']:
+            applied = telemetry_queue.flush()
+            self.stdout.write(self.style.SUCCESS(f'Flushed {applied} telemetry events'))
+
+        stats = telemetry_queue.stats()
+        self.stdout.write(
+            f"Queue depth: {stats['depth']} | Oldest event: {stats['oldest_age'] or 0}s | "
+            f"Batches: {stats['batches']} | Avg flush: {stats['avg_flush_ms'] or 0} ms | "
+            f"Max flush: {stats['max_flush_ms'] or 0} ms | Dead-lettered: {stats['dead']}"
+        )
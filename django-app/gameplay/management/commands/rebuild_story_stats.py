@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gameplay.stats import rebuild_story_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute StoryStats and EndingStats from the Play and Rating tables. '
+        'Use after bulk imports or manual edits that bypassed the model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('story_ids', nargs='*', type=int, help='Only rebuild these stories (default: all)')
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_story_stats(options['story_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {rebuilt} stories'))
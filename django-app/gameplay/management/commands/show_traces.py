@@ -0,0 +1,61 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gameplay.tracing import collect
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge the Django and Flask spans in the trace file into one timeline per request and print '
+        'the slowest requests with a per-span breakdown. Works entirely offline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Trace file (default: GAMEPLAY_TRACE_FILE)')
+        parser.add_argument('--slowest', type=int, default=10, help='How many traces to print')
+        parser.add_argument('--trace', help='Print only this request ID')
+        parser.add_argument('--view', help='Only traces of this Django view (or Flask endpoint)')
+        parser.add_argument('--spans', type=int, default=40, help='Spans shown per trace')
+        parser.add_argument('--output', help='Also write every merged timeline to this file as JSON lines')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.GAMEPLAY_TRACE_FILE
+        if not path:
+            raise CommandError('No trace file: pass --file or set NAHB_TRACE_FILE')
+        try:
+            traces = collect(path)
+        except FileNotFoundError:
+            raise CommandError(f'Trace file {path} does not exist')
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                for trace in traces:
+                    f.write(json.dumps(trace) + '\n')
+            self.stdout.write(f"Wrote {len(traces)} timelines to {options['output']}")
+
+        if options['trace']:
+            traces = [trace for trace in traces if trace['trace_id'] == options['trace']]
+        if options['view']:
+            traces = [trace for trace in traces if trace['view'] == options['view']]
+        traces.sort(key=lambda trace: trace['ms'], reverse=True)
+        self.stdout.write(f'{len(traces)} traces in {path}')
+        for trace in traces[:options['slowest']]:
+            self.print_trace(trace, options['spans'])
+
+    def print_trace(self, trace, max_spans):
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{trace['ms']:.2f} ms  {trace['name']} ({trace['view']}) -> {trace['status']}  "
+            f"[{trace['trace_id']}]"
+        ))
+        self.stdout.write('  ' + '  '.join(f'{name} {ms:.2f} ms' for name, ms in trace['breakdown'].items()))
+        for span in trace['spans'][:max_spans]:
+            self.stdout.write(
+                f"  +{span['offset_ms']:>9.2f}  {span['ms']:>9.2f}  {span['service']:<6} "
+                f"{span['name']:<9} {span['detail']}"
+            )
+        hidden = len(trace['spans']) - max_spans
+        if hidden > 0:
+            self.stdout.write(f'  ... {hidden} more spans')
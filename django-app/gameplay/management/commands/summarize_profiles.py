@@ -0,0 +1,59 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gameplay.profiling import find_dumps, summarize_cpu, summarize_memory
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarize the cProfile and tracemalloc dumps captured from Django and Flask requests: '
+        'the top functions across every CPU profile and the largest allocation sites across '
+        'every memory snapshot.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Dump directory (default: GAMEPLAY_PROFILING["DIR"])')
+        parser.add_argument('--service', choices=['django', 'flask'], help='Only this service\'s dumps')
+        parser.add_argument('--mode', choices=['cpu', 'memory'], help='Only CPU or only memory dumps')
+        parser.add_argument('--match', help='Only requests whose path contains this (as in the file name, / -> _)')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'calls'],
+                            help='Order of the CPU summary')
+        parser.add_argument('--limit', type=int, default=25, help='Functions and allocation sites shown')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.GAMEPLAY_PROFILING['DIR']
+        if not os.path.isdir(directory):
+            raise CommandError(f'Profile directory {directory} does not exist')
+        dumps = find_dumps(directory, options['service'], options['mode'], options['match'])
+        if not dumps:
+            self.stdout.write(f'No profile dumps in {directory}')
+            return
+
+        requests = sorted({f"{name['service']} {name['method']} {name['slug']}" for _, name in dumps})
+        self.stdout.write(f'{len(dumps)} dumps in {directory}')
+        for label in requests:
+            self.stdout.write(f'  {label}')
+
+        # Each service is summarized on its own; their call stacks have nothing in common
+        for service in sorted({name['service'] for _, name in dumps}):
+            cpu = [path for path, name in dumps if name['service'] == service and name['mode'] == 'cpu']
+            memory = [path for path, name in dumps if name['service'] == service and name['mode'] == 'memory']
+            if cpu:
+                self.stdout.write('')
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"{service}: top functions by {options['sort']} ({len(cpu)} runs)"
+                ))
+                self.stdout.write(summarize_cpu(cpu, options['sort'], options['limit']))
+            if memory:
+                self.stdout.write('')
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{service}: top allocation sites still held at the end of the request ({len(memory)} runs)'
+                ))
+                self.stdout.write(f"{'KiB':>10} {'KiB/run':>9} {'blocks':>8} {'runs':>5}  site")
+                for site in summarize_memory(memory, options['limit']):
+                    self.stdout.write(
+                        f"{site['size'] / 1024:>10.1f} {site['size'] / 1024 / len(memory):>9.1f} "
+                        f"{site['count']:>8} {site['runs']:>5}  {site['site']}"
+                    )
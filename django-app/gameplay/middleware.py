@@ -0,0 +1,180 @@
+"""
+Per-request accounting of upstream Flask calls and ORM queries.
+
+RequestBudgetMiddleware counts and times every FlaskAPIClient request (via
+its request_hooks) and every database query (via connection execute
+wrappers) made while a Django request is handled. The totals go out in a
+Server-Timing header and one structured log line per request on the
+'gameplay.requests' logger: at DEBUG, or at INFO when the request went over
+its budget.
+
+The middleware also gives each request an ID, sent to Flask on every
+FlaskAPIClient call, and writes the request's spans for cross-service
+traces when GAMEPLAY_TRACE_FILE is set (see gameplay.tracing).
+
+GAMEPLAY_REQUEST_BUDGETS caps the calls and queries each view may make,
+keyed by URL name. Going over budget is logged, or raises
+BudgetExceeded when ACTION is 'raise' so a benchmark or test run fails on an
+N+1 regression instead of quietly getting slower.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from . import tracing
+from .flask_client import flask_api
+
+logger = logging.getLogger('gameplay.requests')
+
+
+class BudgetExceeded(Exception):
+    """A view made more upstream calls or queries than its budget allows"""
+
+
+class RequestStats:
+    __slots__ = ('request_id', 'upstream_calls', 'upstream_seconds', 'queries', 'query_seconds', 'spans')
+
+    def __init__(self, request_id, traced=False):
+        self.request_id = request_id
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.spans = [] if traced else None
+
+    def add_span(self, name, started, seconds, detail):
+        if self.spans is not None and len(self.spans) < tracing.MAX_SPANS:
+            self.spans.append({'name': name, 'start': started, 'ms': round(seconds * 1000, 3), 'detail': detail})
+
+
+_current = ContextVar('gameplay_request_stats', default=None)
+
+
+def count_upstream_call(method, path, seconds, status):
+    """FlaskAPIClient request hook; calls from background threads are not attributed"""
+    stats = _current.get()
+    if stats is not None:
+        stats.upstream_calls += 1
+        stats.upstream_seconds += seconds
+        stats.add_span('flask_api', time.time() - seconds, seconds, f'{method} {path} -> {status}')
+
+
+def request_id_header():
+    """FlaskAPIClient header hook passing the current request's ID on"""
+    stats = _current.get()
+    if stats is not None:
+        return {tracing.REQUEST_ID_HEADER: stats.request_id}
+    return None
+
+
+def count_query(execute, sql, params, many, context):
+    """Database execute wrapper"""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if stats.spans is not None:
+            stats.add_span('db', time.time() - elapsed, elapsed, tracing.preview(sql))
+
+
+flask_api.request_hooks.append(count_upstream_call)
+flask_api.header_hooks.append(request_id_header)
+
+
+def view_budget(view_name):
+    """{'upstream_calls': n, 'queries': n} limits for a view, None meaning unlimited"""
+    budgets = settings.GAMEPLAY_REQUEST_BUDGETS
+    budget = dict(budgets['DEFAULT'])
+    budget.update(budgets['VIEWS'].get(view_name, {}))
+    return budget
+
+
+class RequestBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace_file = settings.GAMEPLAY_TRACE_FILE
+        stats = RequestStats(tracing.new_request_id(), traced=bool(trace_file))
+        token = _current.set(stats)
+        wall_started = time.time()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(count_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view_name = match.url_name if match else None
+        response['Server-Timing'] = (
+            f'flask;dur={stats.upstream_seconds * 1000:.2f};desc="{stats.upstream_calls} calls", '
+            f'db;dur={stats.query_seconds * 1000:.2f};desc="{stats.queries} queries", '
+            f'total;dur={duration * 1000:.2f}'
+        )
+        response[tracing.REQUEST_ID_HEADER] = stats.request_id
+        over = self.over_budget(view_name, stats) if view_name else []
+        # Every request at DEBUG; only the ones over budget show up at the default INFO level
+        logger.log(logging.INFO if over else logging.DEBUG, json.dumps({
+            'request_id': stats.request_id,
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'upstream_calls': stats.upstream_calls,
+            'upstream_ms': round(stats.upstream_seconds * 1000, 2),
+            'queries': stats.queries,
+            'query_ms': round(stats.query_seconds * 1000, 2),
+            'over_budget': over,
+        }))
+        if trace_file:
+            self.write_trace(trace_file, request, response, view_name, stats, wall_started, duration)
+
+        if over and settings.GAMEPLAY_REQUEST_BUDGETS['ACTION'] == 'raise':
+            raise BudgetExceeded(f'View {view_name} went over budget: {", ".join(over)}')
+        return response
+
+    def write_trace(self, trace_file, request, response, view_name, stats, wall_started, duration):
+        try:
+            tracing.write_record(trace_file, {
+                'trace_id': stats.request_id,
+                'service': 'django',
+                'name': f'{request.method} {request.path}',
+                'view': view_name,
+                'status': response.status_code,
+                'start': wall_started,
+                'ms': round(duration * 1000, 3),
+                'upstream_calls': stats.upstream_calls,
+                'upstream_ms': round(stats.upstream_seconds * 1000, 3),
+                'queries': stats.queries,
+                'query_ms': round(stats.query_seconds * 1000, 3),
+                'spans': stats.spans,
+                'dropped_spans': max(0, stats.queries + stats.upstream_calls - len(stats.spans)),
+            })
+        except OSError:
+            logger.exception('Writing trace failed')
+
+    def over_budget(self, view_name, stats):
+        """'name used > limit' for each limit of view_name's budget that stats exceed"""
+        budget = view_budget(view_name)
+        return [
+            f'{name} {used} > {budget[name]}'
+            for name, used in (('upstream_calls', stats.upstream_calls), ('queries', stats.queries))
+            if budget.get(name) is not None and used > budget[name]
+        ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 18:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='play',
+            index=models.Index(fields=['story_id', 'ending_page_id'], name='play_story_ending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='play',
+            index=models.Index(fields=['user', '-created_at'], name='play_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playerpath',
+            index=models.Index(fields=['play', 'sequence'], name='playerpath_play_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playsession',
+            index=models.Index(fields=['user', 'story_id'], name='playsession_user_story_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['-created_at'], name='rating_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', '-created_at'], name='report_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='play',
+            name='packed_path',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
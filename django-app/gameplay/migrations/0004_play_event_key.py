@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-17 18:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0003_play_packed_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='play',
+            name='event_key',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='play',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
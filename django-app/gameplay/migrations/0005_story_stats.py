@@ -0,0 +1,66 @@
+# Generated by Django 5.0 on 2026-10-17 18:56
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def populate_stats(apps, schema_editor):
+    """Seed the running totals from the plays and ratings recorded so far"""
+    Play = apps.get_model('gameplay', 'Play')
+    Rating = apps.get_model('gameplay', 'Rating')
+    StoryStats = apps.get_model('gameplay', 'StoryStats')
+    EndingStats = apps.get_model('gameplay', 'EndingStats')
+
+    stories = {}
+    for row in Play.objects.values('story_id').annotate(count=Count('id'), latest=Max('created_at')):
+        stories[row['story_id']] = StoryStats(
+            story_id=row['story_id'], play_count=row['count'], last_played_at=row['latest']
+        )
+    for row in Rating.objects.values('story_id').annotate(count=Count('id'), total=Sum('stars')):
+        stats = stories.setdefault(row['story_id'], StoryStats(story_id=row['story_id']))
+        stats.rating_count = row['count']
+        stats.rating_sum = row['total']
+    StoryStats.objects.bulk_create(stories.values())
+    EndingStats.objects.bulk_create([
+        EndingStats(story_id=row['story_id'], ending_page_id=row['ending_page_id'], play_count=row['count'])
+        for row in Play.objects.values('story_id', 'ending_page_id').annotate(count=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0004_play_event_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EndingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('story_id', models.IntegerField()),
+                ('ending_page_id', models.IntegerField()),
+                ('play_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'ending stats',
+                'unique_together': {('story_id', 'ending_page_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('story_id', models.IntegerField(unique=True)),
+                ('play_count', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('last_played_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'story stats',
+                'indexes': [models.Index(fields=['-play_count'], name='storystats_play_count_idx')],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
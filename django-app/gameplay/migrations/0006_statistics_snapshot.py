@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-17 19:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0005_story_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('build_ms', models.FloatField(default=0)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0006_statistics_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='play',
+            name='path_steps_dropped',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
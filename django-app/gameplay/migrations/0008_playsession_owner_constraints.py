@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-17 20:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def drop_duplicate_user_sessions(apps, schema_editor):
+    """Keep only the newest saved game per user and story before it becomes unique"""
+    PlaySession = apps.get_model('gameplay', 'PlaySession')
+    seen = set()
+    stale = []
+    for session in PlaySession.objects.filter(user__isnull=False).order_by('-updated_at', '-id'):
+        owner = (session.user_id, session.story_id)
+        if owner in seen:
+            stale.append(session.id)
+        seen.add(owner)
+    PlaySession.objects.filter(id__in=stale).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gameplay', '0007_play_path_steps_dropped'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='playsession',
+            unique_together=set(),
+        ),
+        migrations.RunPython(drop_duplicate_user_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('session_key', 'story_id'), name='playsession_reader_story_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='playsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'story_id'), name='playsession_user_story_uniq'),
+        ),
+    ]
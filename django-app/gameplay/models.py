@@ -1,6 +1,24 @@
+import struct
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+
+# Packed paths hold one (page_id, choice_id, dice_roll) triple of
+# little-endian int32 per step, with 0 standing in for "none"
+PATH_STEP_FORMAT = '<3i'
+PATH_STEP_SIZE = struct.calcsize(PATH_STEP_FORMAT)
+
+
+def pack_path(steps):
+    """Encode a list of {'page_id', 'choice_id', 'dice_roll'} dicts for Play.packed_path"""
+    return b''.join(
+        struct.pack(PATH_STEP_FORMAT, step['page_id'], step.get('choice_id') or 0, step.get('dice_roll') or 0)
+        for step in steps
+    )
+
 
 # Level 10/13: Anonymous and authenticated plays
 class Play(models.Model):
@@ -8,14 +26,48 @@ class Play(models.Model):
     story_id = models.IntegerField()  # Reference to Flask API story
     ending_page_id = models.IntegerField()  # Which ending was reached
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)  # Level 16+
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the play finished, not when the telemetry queue wrote it
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Compact alternative to PlayerPath rows, see pack_path()
+    packed_path = models.BinaryField(null=True, blank=True, editable=False)
+    # Telemetry event that recorded this play; makes queue replays idempotent
+    event_key = models.CharField(max_length=32, null=True, blank=True, unique=True, editable=False)
+    # Middle steps left out by GAMEPLAY_SESSION_PATH_LIMIT; 0 means the path is complete
+    path_steps_dropped = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Ending statistics: filter(story_id=...) and filter(story_id=..., ending_page_id=...)
+            models.Index(fields=['story_id', 'ending_page_id'], name='play_story_ending_idx'),
+            # Profile history: filter(user=...).order_by('-created_at')
+            models.Index(fields=['user', '-created_at'], name='play_user_created_idx'),
+        ]
     
     def __str__(self):
         user_info = f"User {self.user.username}" if self.user else "Anonymous"
         return f"Play of Story {self.story_id} by {user_info}"
+    
+    def path_steps(self):
+        """The steps of this play in order, as PlayerPath objects
+
+        Packed paths are decoded in memory into unsaved PlayerPath objects,
+        so callers get the same shape without a per-node query.
+        """
+        if self.packed_path is None:
+            return list(self.path_nodes.order_by('sequence'))
+        data = bytes(self.packed_path)
+        return [
+            PlayerPath(
+                play=self,
+                page_id=page_id,
+                choice_id=choice_id or None,
+                sequence=index + 1,
+                dice_roll=dice_roll or None,
+                timestamp=self.created_at,
+            )
+            for index, (page_id, choice_id, dice_roll) in enumerate(struct.iter_unpack(PATH_STEP_FORMAT, data))
+        ]
 
 
 # Level 13: Save progression for anonymous users
@@ -29,8 +81,23 @@ class PlaySession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        unique_together = ['session_key', 'story_id']
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'story_id'], name='playsession_user_story_idx'),
+        ]
+        # One saved game per owner and story. session_key (the reader key) is
+        # unique among anonymous rows only: a reader who logs in mid-story keeps
+        # their reader key, and their account's row replaces the anonymous one.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['session_key', 'story_id'], condition=models.Q(user__isnull=True),
+                name='playsession_reader_story_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'story_id'], condition=models.Q(user__isnull=False),
+                name='playsession_user_story_uniq',
+            ),
+        ]
     
     def __str__(self):
         user_info = f"User {self.user.username}" if self.user else f"Session {self.session_key[:8]}"
@@ -73,9 +140,20 @@ class Rating(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored stars so a changed rating can adjust StoryStats by the difference
+        instance._loaded_stars = instance.stars if 'stars' in field_names else None
+        return instance
+    
     class Meta:
+        # The unique index on (story_id, user) also serves filter(story_id=...)
         unique_together = ['story_id', 'user']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='rating_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} rated Story {self.story_id}: {self.stars} stars"
@@ -116,6 +194,9 @@ class Report(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='report_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Report for Story {self.story_id} by {self.user.username} - {self.get_reason_display()}"
@@ -133,6 +214,63 @@ class PlayerPath(models.Model):
     
     class Meta:
         ordering = ['play', 'sequence']
+        indexes = [
+            models.Index(fields=['play', 'sequence'], name='playerpath_play_seq_idx'),
+        ]
     
     def __str__(self):
         return f"Path node {self.sequence} for Play {self.play.id}"
+
+
+# Denormalized per-story statistics, kept current by gameplay.stats
+class StoryStats(models.Model):
+    """Play and rating totals for one story, read in O(1) by the story views"""
+    story_id = models.IntegerField(unique=True)
+    play_count = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    last_played_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'story stats'
+        indexes = [
+            # Statistics page: order_by('-play_count')[:10]
+            models.Index(fields=['-play_count'], name='storystats_play_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Stats for Story {self.story_id}: {self.play_count} plays"
+    
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+
+class EndingStats(models.Model):
+    """How many plays of a story finished on one ending"""
+    story_id = models.IntegerField()
+    ending_page_id = models.IntegerField()
+    play_count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['story_id', 'ending_page_id']
+        verbose_name_plural = 'ending stats'
+    
+    def __str__(self):
+        return f"Ending {self.ending_page_id} of Story {self.story_id}: {self.play_count} plays"
+
+
+# Prebuilt /statistics/ page, see gameplay.stats.build_statistics_snapshot()
+class StatisticsSnapshot(models.Model):
+    """Everything the statistics page shows, computed in bulk at created_at"""
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    build_ms = models.FloatField(default=0)
+    data = models.JSONField()
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Statistics snapshot of {self.created_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,155 @@
+"""
+On-demand profiling of single requests, for both services.
+
+ProfilingMiddleware is inert (MiddlewareNotUsed) unless
+GAMEPLAY_PROFILING['ENABLED'] is on and a SECRET is set. A request carrying
+`X-Profile: cpu` (or `memory`) and `X-Profile-Key: <SECRET>` then runs under
+cProfile (or tracemalloc), and the result is dumped to DIR as
+django-<time>-<mode>-<method>-<path>.pstats (or .tracemalloc), keeping the
+newest KEEP dumps. The response names its dump in X-Profile-File. The Flask
+API has the same hook (app.profiling) writing flask-... dumps; point both at
+one directory and `python manage.py summarize_profiles` reports the top
+functions and allocation sites across every captured run.
+
+One request per process is profiled at a time; a profiling request that
+arrives while another is being captured is served normally.
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+SERVICE = 'django'
+MODES = {'cpu': 'pstats', 'memory': 'tracemalloc'}
+DUMP_NAME = re.compile(
+    r'(?P<service>[a-z]+)-(?P<stamp>\d{8}-\d{6}-\d{6})-(?P<mode>cpu|memory)-(?P<method>[A-Z]+)-(?P<slug>.*)'
+    r'\.(?:pstats|tracemalloc)$'
+)
+
+
+def dump_name(mode, method, path):
+    """A file name DUMP_NAME parses; app.profiling names the Flask dumps the same way"""
+    slug = re.sub(r'\W+', '_', path).strip('_')[:60] or 'root'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return f'{SERVICE}-{stamp}-{mode}-{method}-{slug}.{MODES[mode]}'
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        options = settings.GAMEPLAY_PROFILING
+        if not (options['ENABLED'] and options['SECRET']):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.secret = options['SECRET']
+        self.directory = options['DIR']
+        self.keep = options['KEEP']
+        self.frames = options['FRAMES']
+        self._lock = threading.Lock()
+
+    def requested_mode(self, request):
+        mode = request.headers.get('X-Profile', '').lower()
+        key = request.headers.get('X-Profile-Key', '')
+        if mode in MODES and hmac.compare_digest(key.encode(), self.secret.encode()):
+            return mode
+        return None
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None or not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(mode, request)
+        finally:
+            self._lock.release()
+
+    def profile(self, mode, request):
+        filename = dump_name(mode, request.method, request.path)
+        path = os.path.join(self.directory, filename)
+        if mode == 'cpu':
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(path)
+        else:
+            already_tracing = tracemalloc.is_tracing()
+            if not already_tracing:
+                tracemalloc.start(self.frames)
+            tracemalloc.reset_peak()
+            try:
+                response = self.get_response(request)
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if not already_tracing:
+                    tracemalloc.stop()
+            os.makedirs(self.directory, exist_ok=True)
+            snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).dump(path)
+            response['X-Profile-Peak-KB'] = str(round(peak / 1024))
+        self.rotate()
+        response['X-Profile-File'] = filename
+        return response
+
+    def rotate(self):
+        """Delete Django's oldest dumps beyond the newest KEEP"""
+        dumps = find_dumps(self.directory, service=SERVICE)
+        # Not dumps[:-keep]: with KEEP 0 that slice is empty and nothing would go
+        for path, _ in dumps[:max(0, len(dumps) - self.keep)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another worker rotated it first
+
+
+# ========== SUMMARIES ==========
+
+def find_dumps(directory, service=None, mode=None, match=None):
+    """(path, parsed name) of every dump in directory, oldest first, optionally filtered"""
+    dumps = []
+    for name in sorted(os.listdir(directory)):
+        parsed = DUMP_NAME.fullmatch(name)
+        if parsed is None:
+            continue
+        if service and parsed['service'] != service:
+            continue
+        if mode and parsed['mode'] != mode:
+            continue
+        if match and match not in parsed['slug']:
+            continue
+        dumps.append((os.path.join(directory, name), parsed.groupdict()))
+    return dumps
+
+
+def summarize_cpu(paths, sort='cumulative', limit=25):
+    """The merged pstats of every run, as printed by pstats, sorted by sort"""
+    stream = io.StringIO()
+    stats = pstats.Stats(*paths, stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def summarize_memory(paths, limit=25):
+    """Allocation sites still holding memory at the end of each run, largest total first
+
+    Returns [{'site', 'size', 'count', 'runs'}], sizes summed over all runs.
+    """
+    sites = defaultdict(lambda: {'size': 0, 'count': 0, 'runs': 0})
+    for path in paths:
+        snapshot = tracemalloc.Snapshot.load(path)
+        for stat in snapshot.statistics('lineno'):
+            frame = stat.traceback[0]
+            site = sites[f'{frame.filename}:{frame.lineno}']
+            site['size'] += stat.size
+            site['count'] += stat.count
+            site['runs'] += 1
+    ranked = sorted(sites.items(), key=lambda item: item[1]['size'], reverse=True)[:limit]
+    return [dict(totals, site=site) for site, totals in ranked]
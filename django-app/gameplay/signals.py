@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import Play, Rating, UserProfile
+from . import stats
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -13,4 +14,28 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     else:
         # User already exists, just save the profile if it exists
         if hasattr(instance, 'profile'):
-            instance.profile.save()
\ No newline at end of file
+            instance.profile.save()
+
+
+# Keep StoryStats/EndingStats current (bulk-created plays are counted by the telemetry queue)
+
+@receiver(post_save, sender=Play)
+def count_play(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.record_plays([instance])
+
+
+@receiver(post_delete, sender=Play)
+def uncount_play(sender, instance, **kwargs):
+    stats.remove_play(instance)
+
+
+@receiver(post_save, sender=Rating)
+def count_rating(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.rating_saved(instance, created)
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_rating(sender, instance, **kwargs):
+    stats.rating_deleted(instance)
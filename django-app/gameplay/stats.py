@@ -0,0 +1,217 @@
+"""
+Incremental per-story statistics.
+
+StoryStats and EndingStats hold running totals so the story pages never
+aggregate the Play or Rating tables on a request. Every change is a single
+UPDATE ... SET x = x + n, so concurrent writers cannot lose increments.
+Signal receivers in gameplay.signals call into this module for ordinary
+saves and deletes; bulk_create does not send signals, so the telemetry queue
+calls record_plays() itself. rebuild_story_stats() recomputes everything
+from the source tables for repairs (see the rebuild_story_stats command).
+
+The public statistics page is served from a StatisticsSnapshot built here in
+bulk (one Flask list request plus one batch lookup), never per request.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, DateTimeField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .flask_client import flask_api
+from .models import EndingStats, Play, Rating, StatisticsSnapshot, StoryStats
+
+SNAPSHOT_REFRESH_LOCK = 'gameplay:statistics:refreshing'
+
+
+def _increment(model, lookup, **changes):
+    """Apply F() updates to the row matching lookup, creating the row first if needed"""
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup)
+    except IntegrityError:
+        pass  # another writer created it first
+    model.objects.filter(**lookup).update(**changes)
+
+
+def record_plays(plays):
+    """Count newly created plays, one UPDATE per story and per ending touched"""
+    per_story = Counter(play.story_id for play in plays)
+    per_ending = Counter((play.story_id, play.ending_page_id) for play in plays)
+    latest = {}
+    for play in plays:
+        if play.story_id not in latest or play.created_at > latest[play.story_id]:
+            latest[play.story_id] = play.created_at
+
+    for story_id, count in per_story.items():
+        played_at = Value(latest[story_id], output_field=DateTimeField())
+        _increment(
+            StoryStats, {'story_id': story_id},
+            play_count=F('play_count') + count,
+            last_played_at=Greatest(Coalesce('last_played_at', played_at), played_at),
+        )
+    for (story_id, ending_page_id), count in per_ending.items():
+        _increment(
+            EndingStats, {'story_id': story_id, 'ending_page_id': ending_page_id},
+            play_count=F('play_count') + count,
+        )
+
+
+def remove_play(play):
+    """Uncount a deleted play; last_played_at is left alone until the next rebuild"""
+    StoryStats.objects.filter(story_id=play.story_id).update(play_count=F('play_count') - 1)
+    EndingStats.objects.filter(
+        story_id=play.story_id, ending_page_id=play.ending_page_id
+    ).update(play_count=F('play_count') - 1)
+
+
+def rating_saved(rating, created):
+    """Add a new rating, or shift the star total by how much an existing one changed"""
+    if created:
+        _increment(
+            StoryStats, {'story_id': rating.story_id},
+            rating_count=F('rating_count') + 1,
+            rating_sum=F('rating_sum') + rating.stars,
+        )
+    elif getattr(rating, '_loaded_stars', None) is None:
+        # The previous stars are unknown, so recount this story instead of guessing
+        rebuild_story_stats([rating.story_id])
+    elif rating.stars != rating._loaded_stars:
+        StoryStats.objects.filter(story_id=rating.story_id).update(
+            rating_sum=F('rating_sum') + (rating.stars - rating._loaded_stars)
+        )
+    rating._loaded_stars = rating.stars
+
+
+def rating_deleted(rating):
+    StoryStats.objects.filter(story_id=rating.story_id).update(
+        rating_count=F('rating_count') - 1,
+        rating_sum=F('rating_sum') - rating.stars,
+    )
+
+
+def rebuild_story_stats(story_ids=None):
+    """Recompute StoryStats and EndingStats from Play and Rating; returns the number of stories"""
+    plays = Play.objects.all()
+    ratings = Rating.objects.all()
+    if story_ids is not None:
+        story_ids = list(story_ids)
+        plays = plays.filter(story_id__in=story_ids)
+        ratings = ratings.filter(story_id__in=story_ids)
+
+    stories = {}
+    for row in plays.values('story_id').annotate(count=Count('id'), latest=Max('created_at')):
+        stories[row['story_id']] = StoryStats(
+            story_id=row['story_id'], play_count=row['count'], last_played_at=row['latest']
+        )
+    for row in ratings.values('story_id').annotate(count=Count('id'), total=Sum('stars')):
+        stats = stories.setdefault(row['story_id'], StoryStats(story_id=row['story_id']))
+        stats.rating_count = row['count']
+        stats.rating_sum = row['total']
+    endings = [
+        EndingStats(story_id=row['story_id'], ending_page_id=row['ending_page_id'], play_count=row['count'])
+        for row in plays.values('story_id', 'ending_page_id').annotate(count=Count('id'))
+    ]
+
+    with transaction.atomic():
+        stale_stories = StoryStats.objects.all()
+        stale_endings = EndingStats.objects.all()
+        if story_ids is not None:
+            stale_stories = stale_stories.filter(story_id__in=story_ids)
+            stale_endings = stale_endings.filter(story_id__in=story_ids)
+        stale_stories.delete()
+        stale_endings.delete()
+        StoryStats.objects.bulk_create(stories.values())
+        EndingStats.objects.bulk_create(endings)
+    return len(stories)
+
+
+# ========== STATISTICS SNAPSHOT ==========
+
+def build_statistics_snapshot():
+    """Compute the statistics page in bulk and store it as a new StatisticsSnapshot"""
+    started = time.perf_counter()
+    top = list(
+        StoryStats.objects.filter(play_count__gt=0).order_by('-play_count').values('story_id', 'play_count')[:10]
+    )
+    recent_ratings = list(Rating.objects.select_related('user').order_by('-created_at')[:10])
+    stories = flask_api.get_stories_by_ids(
+        [item['story_id'] for item in top] + [rating.story_id for rating in recent_ratings]
+    )
+
+    def story_ref(story_id):
+        story = stories.get(story_id)
+        return {'id': story['id'], 'title': story['title']} if story else None
+
+    data = {
+        'total_plays': StoryStats.objects.aggregate(total=Sum('play_count'))['total'] or 0,
+        'total_stories': flask_api.count_stories(status='published') or 0,
+        'total_users': User.objects.count(),
+        'top_stories': [
+            {'story': story_ref(item['story_id']), 'play_count': item['play_count']}
+            for item in top if item['story_id'] in stories
+        ],
+        'rating_data': [
+            {
+                'story': story_ref(rating.story_id),
+                'rating': {
+                    'username': rating.user.username,
+                    'stars': rating.stars,
+                    'created_at': rating.created_at.isoformat(),
+                },
+            }
+            for rating in recent_ratings if rating.story_id in stories
+        ],
+    }
+
+    snapshot = StatisticsSnapshot.objects.create(
+        data=data, build_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
+    keep = settings.GAMEPLAY_STATISTICS['KEEP']
+    stale_ids = StatisticsSnapshot.objects.order_by('-created_at').values_list('id', flat=True)[keep:]
+    StatisticsSnapshot.objects.filter(id__in=list(stale_ids)).delete()
+    return snapshot
+
+
+def latest_statistics_snapshot():
+    """The newest snapshot (built now if there is none), refreshing it when past MAX_AGE"""
+    snapshot = StatisticsSnapshot.objects.order_by('-created_at').first()
+    if snapshot is None:
+        return build_statistics_snapshot()
+    age = (timezone.now() - snapshot.created_at).total_seconds()
+    if age > settings.GAMEPLAY_STATISTICS['MAX_AGE']:
+        refresh_statistics_snapshot()
+    return snapshot
+
+
+def refresh_statistics_snapshot():
+    """Rebuild the snapshot once, in a background thread unless disabled"""
+    if not cache.add(SNAPSHOT_REFRESH_LOCK, True, 300):
+        return  # another worker is already rebuilding it
+
+    def refresh():
+        try:
+            build_statistics_snapshot()
+        except Exception as e:
+            print(f"Error rebuilding statistics snapshot: {e}")
+        finally:
+            cache.delete(SNAPSHOT_REFRESH_LOCK)
+
+    if settings.GAMEPLAY_STATISTICS['BACKGROUND']:
+        def run():
+            try:
+                refresh()
+            finally:
+                close_old_connections()
+        threading.Thread(target=run, daemon=True).start()
+    else:
+        refresh()
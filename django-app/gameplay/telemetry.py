@@ -0,0 +1,496 @@
+"""
+Write-behind queue for gameplay telemetry.
+
+Saved progress (PlaySession) and completed plays (Play + PlayerPath) are not
+needed to render the next page, so the play views append them to a durable
+SQLite queue file and return without touching the main database. A worker
+thread drains the queue in batches, each applied in one transaction.
+
+Events stay on disk until their batch commits, so nothing is lost on a
+restart: the next worker, or `manage.py flush_telemetry`, picks them up.
+Every play carries an event key, so replaying a batch that was applied but
+not yet removed from the queue does not create duplicates.
+
+A batch that fails is retried one event at a time, so one bad event cannot
+hold back the rest. A failing event is retried after a growing delay, and
+after MAX_ATTEMPTS it is moved to the dead_events table of the queue file
+(`manage.py flush_telemetry --retry-dead` puts it back).
+
+The reader's own progress is also kept in their Django session, so the play
+views never wait for the queue to catch up.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Play, PlayerPath, PlaySession, pack_path
+from . import stats as story_stats
+
+logger = logging.getLogger('gameplay.telemetry')
+
+# Session keys holding the reader's own, not yet flushed, state
+PROGRESS_SESSION_KEY = 'progress_{story_id}'
+PATH_SESSION_KEY = 'path_{story_id}'
+PATH_DROPPED_SESSION_KEY = 'path_dropped_{story_id}'
+LAST_PLAY_SESSION_KEY = 'last_play'
+# Stable per-reader ID for PlaySession.session_key; unlike the session key
+# it exists in every session mode (signed cookies have no server-side key)
+READER_SESSION_KEY = 'reader_key'
+# Engines whose session key is a short server-side ID that sessions from
+# before reader keys saved their PlaySession under. A signed cookie's
+# session_key is the whole signed payload and must never be stored.
+SERVER_SIDE_SESSION_ENGINES = {
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+}
+
+
+class TelemetryQueue:
+    """Durable FIFO of telemetry events, drained in batches by a background thread
+
+    Several processes may share one queue file: a batch is claimed with a
+    lease before it is applied, and a crashed worker's claim simply expires.
+    """
+
+    def __init__(self, options=None):
+        options = options or settings.GAMEPLAY_TELEMETRY
+        self.enabled = options['ENABLED']
+        self.path = str(options['QUEUE_PATH'])
+        self.batch_size = options['BATCH_SIZE']
+        self.flush_interval = options['FLUSH_INTERVAL']
+        self.lease = options['LEASE_SECONDS']
+        self.max_attempts = options['MAX_ATTEMPTS']
+        self.retry_delay = options['RETRY_DELAY']
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'dead_lettered': 0,
+            'last_flush_ms': None, 'max_flush_ms': None, 'total_flush_ms': 0.0, 'last_error': None,
+        }
+        self._stats_lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """The calling thread's connection to the queue file (reopened after a fork)"""
+        cached = getattr(self._local, 'connection', None)
+        if cached is not None and cached[0] == os.getpid():
+            return cached[1]
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' kind TEXT NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' claimed_until REAL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' last_error TEXT)'
+        )
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(events)')}
+        if 'attempts' not in columns:
+            # Queue files from before retries were counted
+            connection.execute('ALTER TABLE events ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+            connection.execute('ALTER TABLE events ADD COLUMN last_error TEXT')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS dead_events ('
+            ' id INTEGER PRIMARY KEY,'
+            ' kind TEXT NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' attempts INTEGER NOT NULL,'
+            ' last_error TEXT,'
+            ' failed_at REAL NOT NULL)'
+        )
+        self._local.connection = (os.getpid(), connection)
+        return connection
+
+    def _update_stats(self, **changes):
+        with self._stats_lock:
+            for name, value in changes.items():
+                self._stats[name] = value
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    # ========== PRODUCER ==========
+
+    def enqueue(self, kind, payload):
+        """Append an event; applied immediately instead when the queue is disabled"""
+        if not self.enabled:
+            apply_events([(kind, payload)])
+            return
+        self.connection.execute(
+            'INSERT INTO events (kind, payload, created_at) VALUES (?, ?, ?)',
+            (kind, json.dumps(payload), time.time())
+        )
+        self._count('enqueued')
+        self.start()
+
+    # ========== CONSUMER ==========
+
+    def _claim(self):
+        """Lease the oldest unclaimed batch to this worker"""
+        now = time.time()
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT id, kind, payload, attempts FROM events'
+                ' WHERE claimed_until IS NULL OR claimed_until < ?'
+                ' ORDER BY id LIMIT ?',
+                (now, self.batch_size)
+            ).fetchall()
+            connection.executemany(
+                'UPDATE events SET claimed_until = ? WHERE id = ?',
+                [(now + self.lease, row[0]) for row in rows]
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return rows
+
+    def flush_batch(self):
+        """Apply one batch; returns the number of events applied, or None if none were waiting
+
+        The batch is applied in a single transaction. If that fails, its events
+        are applied one at a time and only the ones that fail again are held back.
+        """
+        rows = self._claim()
+        if not rows:
+            return None
+        started = time.perf_counter()
+        try:
+            apply_events([(kind, json.loads(payload)) for _, kind, payload, _ in rows])
+            applied = [row[0] for row in rows]
+        except Exception as e:
+            logger.warning('Telemetry batch of %d events failed, applying them one at a time: %s', len(rows), e)
+            applied = []
+            for row in rows:
+                try:
+                    apply_events([(row[1], json.loads(row[2]))])
+                except Exception as e:
+                    self._fail(row, e)
+                else:
+                    applied.append(row[0])
+        if applied:
+            placeholders = ','.join('?' * len(applied))
+            self.connection.execute(f'DELETE FROM events WHERE id IN ({placeholders})', applied)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._stats['flushed'] += len(applied)
+            self._stats['batches'] += 1
+            self._stats['total_flush_ms'] += elapsed
+            self._stats['last_flush_ms'] = round(elapsed, 2)
+            self._stats['max_flush_ms'] = round(max(elapsed, self._stats['max_flush_ms'] or 0), 2)
+        return len(applied)
+
+    def _fail(self, row, error):
+        """Count a failed attempt at one event: retry it later, or dead-letter it after MAX_ATTEMPTS"""
+        event_id, kind, _, attempts = row
+        attempts += 1
+        self._count('failures')
+        self._update_stats(last_error=str(error))
+        connection = self.connection
+        if attempts < self.max_attempts:
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            logger.warning('Telemetry event %s (%s) failed, attempt %d of %d, retrying in %ss: %s',
+                           event_id, kind, attempts, self.max_attempts, delay, error)
+            connection.execute(
+                'UPDATE events SET attempts = ?, last_error = ?, claimed_until = ? WHERE id = ?',
+                (attempts, str(error), time.time() + delay, event_id)
+            )
+            return
+        logger.error('Telemetry event %s (%s) failed %d times, moved to dead_events: %s',
+                     event_id, kind, attempts, error)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT INTO dead_events (id, kind, payload, created_at, attempts, last_error, failed_at)'
+                ' SELECT id, kind, payload, created_at, ?, ?, ? FROM events WHERE id = ?',
+                (attempts, str(error), time.time(), event_id)
+            )
+            connection.execute('DELETE FROM events WHERE id = ?', (event_id,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        self._count('dead_lettered')
+
+    def flush(self):
+        """Drain everything currently queued; returns the number of events applied
+
+        Events that failed and are waiting for their retry are left queued.
+        """
+        total = 0
+        while True:
+            applied = self.flush_batch()
+            if applied is None:
+                return total
+            total += applied
+
+    def retry_dead(self):
+        """Move every dead-lettered event back onto the queue with a fresh attempt count"""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            moved = connection.execute(
+                'INSERT INTO events (kind, payload, created_at)'
+                ' SELECT kind, payload, created_at FROM dead_events ORDER BY id'
+            ).rowcount
+            connection.execute('DELETE FROM dead_events')
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return moved
+
+    def start(self):
+        """Start this process's worker thread if it is not running"""
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Telemetry flush failed, will retry')
+            finally:
+                close_old_connections()
+
+    # ========== MONITORING ==========
+
+    def depth(self):
+        """Events waiting in the queue file, across all processes"""
+        return self.connection.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+
+    def dead_depth(self):
+        """Events moved to dead_events after failing MAX_ATTEMPTS times"""
+        return self.connection.execute('SELECT COUNT(*) FROM dead_events').fetchone()[0]
+
+    def stats(self):
+        """Queue depth, age of the oldest event and this process's flush counters"""
+        depth, oldest = self.connection.execute('SELECT COUNT(*), MIN(created_at) FROM events').fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_flush_ms = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = round(total_flush_ms / stats['batches'], 2) if stats['batches'] else None
+        stats['depth'] = depth
+        stats['dead'] = self.dead_depth()
+        stats['oldest_age'] = round(time.time() - oldest, 1) if oldest else None
+        stats['enabled'] = self.enabled
+        stats['worker_running'] = self._worker_pid == os.getpid() and self._worker.is_alive()
+        return stats
+
+
+def record_plays(finished):
+    """Create Play rows (and their PlayerPath rows) for 'finish' events, skipping replays"""
+    if not finished:
+        return
+    by_key = {payload['key']: payload for payload in finished}
+    existing = set(Play.objects.filter(event_key__in=list(by_key)).values_list('event_key', flat=True))
+    new = [payload for key, payload in by_key.items() if key not in existing]
+
+    plays = Play.objects.bulk_create([
+        Play(
+            story_id=payload['story_id'],
+            ending_page_id=payload['ending_page_id'],
+            user_id=payload['user_id'],
+            event_key=payload['key'],
+            created_at=parse_datetime(payload['created_at']),
+            packed_path=pack_path(payload['path']) if payload['packed'] else None,
+            path_steps_dropped=payload.get('dropped_steps', 0),
+        )
+        for payload in new
+    ])
+    PlayerPath.objects.bulk_create([
+        PlayerPath(
+            play=play,
+            page_id=step['page_id'],
+            choice_id=step.get('choice_id'),
+            sequence=idx + 1,
+            dice_roll=step.get('dice_roll'),
+        )
+        for play, payload in zip(plays, new) if not payload['packed']
+        for idx, step in enumerate(payload['path'])
+    ])
+    # bulk_create sends no post_save, so count the new plays here
+    story_stats.record_plays(plays)
+
+
+def apply_events(events):
+    """Apply a batch of (kind, payload) events to the database in one transaction
+
+    Progress events for the same reader and story collapse to the latest
+    one; a finished play clears the reader's saved progress. A reader who
+    logs in keeps their reader key, so an event from their account also
+    replaces the progress they saved under that key while anonymous.
+    """
+    with transaction.atomic():
+        record_plays([payload for kind, payload in events if kind == 'finish'])
+
+        latest = {}
+        for kind, payload in events:
+            latest[(payload['user_id'], payload['session_key'], payload['story_id'])] = (kind, payload)
+
+        for (user_id, session_key, story_id), (kind, payload) in latest.items():
+            if user_id:
+                PlaySession.objects.filter(story_id=story_id, session_key=session_key, user__isnull=True).delete()
+                owner = {'user_id': user_id}
+            else:
+                owner = {'session_key': session_key, 'user__isnull': True}
+            if kind == 'finish':
+                PlaySession.objects.filter(story_id=story_id, **owner).delete()
+            else:
+                PlaySession.objects.update_or_create(
+                    story_id=story_id,
+                    **owner,
+                    defaults={'current_page_id': payload['page_id']},
+                    create_defaults={'current_page_id': payload['page_id'], 'session_key': session_key or ''}
+                )
+
+
+telemetry_queue = TelemetryQueue()
+
+
+# ========== REQUEST-SIDE HELPERS ==========
+
+def legacy_reader_key(request):
+    """The session key a session from before reader keys saved its PlaySession under, if any"""
+    if settings.SESSION_ENGINE in SERVER_SIDE_SESSION_ENGINES:
+        return request.session.session_key
+    return None
+
+
+def reader(request):
+    """(user_id, reader_key) of whoever is playing, creating the reader key on first use"""
+    reader_key = request.session.get(READER_SESSION_KEY)
+    if reader_key is None:
+        # Keep an older session's key so its reader can still resume
+        reader_key = legacy_reader_key(request) or uuid.uuid4().hex
+        request.session[READER_SESSION_KEY] = reader_key
+    user_id = request.user.id if request.user.is_authenticated else None
+    return user_id, reader_key
+
+
+def record_progress(request, story_id, page_id):
+    """Remember the reader's current page: in their session now, in PlaySession later"""
+    progress_key = PROGRESS_SESSION_KEY.format(story_id=story_id)
+    if progress_key in request.session and request.session[progress_key] == page_id:
+        return
+    request.session[progress_key] = page_id
+    user_id, session_key = reader(request)
+    telemetry_queue.enqueue('progress', {
+        'user_id': user_id,
+        'session_key': session_key,
+        'story_id': story_id,
+        'page_id': page_id,
+    })
+
+
+def record_finish(request, story_id, ending_page_id, path, packed=False):
+    """Queue a completed play with its path and clear the reader's saved progress"""
+    key = uuid.uuid4().hex
+    # None (rather than no entry) means "no saved game", even before the flush
+    request.session[PROGRESS_SESSION_KEY.format(story_id=story_id)] = None
+    request.session[LAST_PLAY_SESSION_KEY] = {'key': key, 'story_id': story_id, 'ending_page_id': ending_page_id}
+    dropped_steps = request.session.pop(PATH_DROPPED_SESSION_KEY.format(story_id=story_id), 0)
+    user_id, session_key = reader(request)
+    telemetry_queue.enqueue('finish', {
+        'key': key,
+        'user_id': user_id,
+        'session_key': session_key,
+        'story_id': story_id,
+        'ending_page_id': ending_page_id,
+        'path': path,
+        'dropped_steps': dropped_steps,
+        'packed': packed,
+        'created_at': timezone.now().isoformat(),
+    })
+    return key
+
+
+def saved_page_id(request, story_id):
+    """The page the reader left a story on, or None: their session first, then PlaySession"""
+    progress_key = PROGRESS_SESSION_KEY.format(story_id=story_id)
+    if progress_key in request.session:
+        return request.session[progress_key]
+    if request.user.is_authenticated:
+        owner = {'user': request.user}
+    else:
+        # An older session has no reader key yet; its rows are under the session key
+        reader_key = request.session.get(READER_SESSION_KEY) or legacy_reader_key(request)
+        if not reader_key:
+            return None
+        owner = {'session_key': reader_key, 'user__isnull': True}
+    return PlaySession.objects.filter(story_id=story_id, **owner).values_list('current_page_id', flat=True).first()
+
+
+def last_play(request, story_id, ending_page_id):
+    """The reader's just-finished play of this ending as {'key', ...}, if this session recorded one"""
+    play = request.session.get(LAST_PLAY_SESSION_KEY)
+    if play and play['story_id'] == story_id and play['ending_page_id'] == ending_page_id:
+        return play
+    return None
+
+
+def start_path(request, story_id, page_id):
+    """Begin tracking a new play's path at its first page"""
+    request.session[PATH_SESSION_KEY.format(story_id=story_id)] = [[page_id, None, None]]
+    request.session.pop(PATH_DROPPED_SESSION_KEY.format(story_id=story_id), None)
+
+
+def extend_path(request, story_id, page_id, choice_id, dice_roll):
+    """Add a step to the tracked path
+
+    Steps are stored as compact [page_id, choice_id, dice_roll] lists. With a
+    GAMEPLAY_SESSION_PATH_LIMIT (cookie sessions only, by default) the first
+    step and the latest ones are kept, and the number of steps dropped in
+    between is counted so the finished Play records that its path is partial.
+    """
+    path_key = PATH_SESSION_KEY.format(story_id=story_id)
+    path = request.session.get(path_key, [])
+    path.append([page_id, choice_id, dice_roll])
+    limit = settings.GAMEPLAY_SESSION_PATH_LIMIT
+    if limit and len(path) > limit:
+        dropped = len(path) - limit
+        path = path[:1] + path[1 + dropped:]
+        dropped_key = PATH_DROPPED_SESSION_KEY.format(story_id=story_id)
+        request.session[dropped_key] = request.session.get(dropped_key, 0) + dropped
+    request.session[path_key] = path
+
+
+def take_path(request, story_id):
+    """Remove the tracked path from the session and return it as step dicts"""
+    path = request.session.pop(PATH_SESSION_KEY.format(story_id=story_id), [])
+    return [
+        step if isinstance(step, dict) else {'page_id': step[0], 'choice_id': step[1], 'dice_roll': step[2]}
+        for step in path
+    ]
@@ -0,0 +1,122 @@
+"""
+Cross-service request traces.
+
+RequestBudgetMiddleware gives every request a new ID, returns it in the
+response and sends it on every FlaskAPIClient call. The Flask API tags its
+own work with the same ID. When GAMEPLAY_TRACE_FILE (env NAHB_TRACE_FILE) is
+set, both services append one JSON line per request to that file:
+
+    {"trace_id": ..., "service": "django" | "flask", "name": ..., "start": <unix time>,
+     "ms": ..., "spans": [{"name": "db" | "flask_api" | "sql", "start": ..., "ms": ..., "detail": ...}]}
+
+collect() groups the lines by ID into one timeline per request and splits
+its time between Django itself, Django's queries, the HTTP hop and Flask's
+SQL; `python manage.py show_traces` prints the slowest ones. Start times are
+wall-clock, so both services must share a clock (the same host or containers
+on it).
+"""
+
+import json
+import os
+import uuid
+from collections import defaultdict
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+MAX_SPANS = 500
+DETAIL_PREVIEW = 120
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def preview(text):
+    return ' '.join(text.split())[:DETAIL_PREVIEW]
+
+
+def write_record(path, record):
+    """Append one request's line to the trace file
+
+    The file is opened per line: Django writes one line per page request,
+    and a single O_APPEND write keeps lines from different workers whole.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (json.dumps(record, separators=(',', ':')) + '\n').encode())
+    finally:
+        os.close(fd)
+
+
+# ========== COLLECTOR ==========
+
+def read_records(path):
+    """Every well-formed line of a trace file; a half-written last line is skipped"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get('trace_id'):
+                records.append(record)
+    return records
+
+
+def timeline(trace_id, records):
+    """Merge one request's records from both services into a single timeline"""
+    django = [record for record in records if record['service'] == 'django']
+    flask = [record for record in records if record['service'] == 'flask']
+    root = django[0] if django else min(flask, key=lambda record: record['start'])
+    start = min(record['start'] for record in records)
+    end = max(record['start'] + record['ms'] / 1000 for record in records)
+
+    spans = []
+    for record in records:
+        spans.append({
+            'service': record['service'], 'name': 'request', 'start': record['start'],
+            'ms': record['ms'], 'detail': f"{record['name']} -> {record.get('status')}",
+        })
+        for span in record.get('spans', []):
+            spans.append(dict(span, service=record['service']))
+    spans.sort(key=lambda span: (span['start'], span['service'] != 'django'))
+    for span in spans:
+        span['offset_ms'] = round((span['start'] - start) * 1000, 3)
+
+    flask_ms = sum(record['ms'] for record in flask)
+    flask_sql_ms = sum(record.get('sql_ms', 0) for record in flask)
+    if django:
+        total_ms = sum(record['ms'] for record in django)
+        django_db_ms = sum(record.get('query_ms', 0) for record in django)
+        upstream_ms = sum(record.get('upstream_ms', 0) for record in django)
+        breakdown = {
+            'django': max(0.0, total_ms - django_db_ms - upstream_ms),
+            'django_db': django_db_ms,
+            'http_hop': max(0.0, upstream_ms - flask_ms),
+            'flask_app': max(0.0, flask_ms - flask_sql_ms),
+            'flask_sql': flask_sql_ms,
+        }
+    else:
+        total_ms = round((end - start) * 1000, 3)
+        breakdown = {'flask_app': max(0.0, flask_ms - flask_sql_ms), 'flask_sql': flask_sql_ms}
+
+    return {
+        'trace_id': trace_id,
+        'name': root['name'],
+        'view': root.get('view') or root.get('endpoint'),
+        'status': root.get('status'),
+        'start': start,
+        'ms': round(total_ms, 3),
+        'flask_requests': len(flask),
+        'breakdown': {name: round(ms, 3) for name, ms in breakdown.items()},
+        'spans': spans,
+    }
+
+
+def collect(path):
+    """One timeline per request ID in the trace file, in order of first appearance"""
+    grouped = defaultdict(list)
+    for record in read_records(path):
+        grouped[record['trace_id']].append(record)
+    return [timeline(trace_id, records) for trace_id, records in grouped.items()]
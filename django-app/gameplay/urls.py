@@ -9,6 +9,7 @@ urlpatterns = [
     path('story/<int:story_id>/choice/<int:choice_id>/', views.make_choice, name='make_choice'),
     path('story/<int:story_id>/ending/<int:ending_page_id>/', views.story_ending, name='story_ending'),
     path('statistics/', views_auth.statistics, name='statistics'),
+    path('statistics/refresh/', views_auth.refresh_statistics, name='refresh_statistics'),
     
     # ========== Authentication (Level 16) ==========
     path('register/', views_auth.register, name='register'),
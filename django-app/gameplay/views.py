@@ -4,48 +4,53 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.utils import timezone
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.conf import settings
 
-from .models import Play, PlaySession, UserProfile, Rating, Report, PlayerPath
+from .models import EndingStats, Play, UserProfile, Rating, Report, StoryStats
 from .flask_client import flask_api
+from . import telemetry
 
 
 # ========== LEVEL 10/13: Story Browsing ==========
 
+SEARCH_PER_PAGE = 20
+
+
 def home(request):
     """Homepage with list of published stories"""
     # Level 13: Search and filter
-    search_query = request.GET.get('search', '')
-    
-    # Get published stories from Flask API
-    stories = flask_api.get_stories(status='published')
-    
-    # Level 13: Filter by search query
-    if search_query and stories:
-        stories = [
-            s for s in stories 
-            if search_query.lower() in s.get('title', '').lower() or 
-               search_query.lower() in s.get('description', '').lower()
-        ]
+    search_query = request.GET.get('search', '').strip()
+    search_pages = request.GET.get('pages') == '1'
+    page = request.GET.get('page', '1')
+    page = int(page) if page.isdigit() and int(page) > 0 else 1
+    search = None
+    
+    if search_query:
+        # Ranked full-text search runs in the Flask API, one results page at a time
+        search = flask_api.search_stories(search_query, include_pages=search_pages, page=page,
+                                          per_page=SEARCH_PER_PAGE)
+        stories = search['results'] if search else []
+    else:
+        # Get published stories from Flask API
+        stories = flask_api.get_stories(status='published')
     
-    # Level 18: Add rating information
+    # Level 18: Add rating information (one StoryStats query for the whole list)
     if stories:
+        story_stats = StoryStats.objects.in_bulk([story['id'] for story in stories], field_name='story_id')
         for story in stories:
-            story_ratings = Rating.objects.filter(story_id=story['id'])
-            if story_ratings.exists():
-                avg_rating = sum(r.stars for r in story_ratings) / len(story_ratings)
-                story['avg_rating'] = round(avg_rating, 1)
-                story['rating_count'] = len(story_ratings)
-            else:
-                story['avg_rating'] = None
-                story['rating_count'] = 0
+            stats = story_stats.get(story['id'])
+            story['avg_rating'] = stats.avg_rating if stats else None
+            story['rating_count'] = stats.rating_count if stats else 0
     
     context = {
         'stories': stories,
         'search_query': search_query,
+        'search_pages': search_pages,
+        'search': search,
     }
     return render(request, 'gameplay/home.html', context)
 
@@ -58,31 +63,44 @@ def story_detail(request, story_id):
         messages.error(request, 'Story not found.')
         return redirect('home')
     
-    # Level 13: Calculate ending statistics
-    plays = Play.objects.filter(story_id=story_id)
-    total_plays = plays.count()
+    # Level 13: Ending statistics from the running totals in StoryStats/EndingStats
+    stats = StoryStats.objects.filter(story_id=story_id).first()
+    total_plays = stats.play_count if stats else 0
     
     ending_stats = {}
     if total_plays > 0:
-        ending_counts = plays.values('ending_page_id').annotate(count=Count('id'))
+        ending_counts = list(EndingStats.objects.filter(story_id=story_id, play_count__gt=0))
+        endings = flask_api.get_story_endings(story_id, story.get('version'))
         for item in ending_counts:
-            page = flask_api.get_page(item['ending_page_id'])
+            page = endings.get(item.ending_page_id)
             if page:
-                ending_label = page.get('ending_label') or f"Ending {item['ending_page_id']}"
+                ending_label = page.get('ending_label') or f"Ending {item.ending_page_id}"
                 ending_stats[ending_label] = {
-                    'count': item['count'],
-                    'percentage': round((item['count'] / total_plays) * 100, 1)
+                    'count': item.play_count,
+                    'percentage': round((item.play_count / total_plays) * 100, 1)
                 }
     
+    # Predicted ending odds from the story graph, shown next to the real ones
+    predicted_endings = []
+    predicted_steps = None
+    odds = flask_api.get_story_odds(story_id)
+    if odds:
+        predicted_steps = odds.get('expected_steps')
+        for ending in odds.get('endings', []):
+            predicted_endings.append({
+                'label': ending.get('ending_label') or f"Ending {ending['page_id']}",
+                'percentage': round(ending['probability'] * 100, 1),
+                'expected_steps': ending.get('expected_steps'),
+            })
+    
     # Level 18: Get ratings and comments
     ratings = Rating.objects.filter(story_id=story_id).select_related('user').order_by('-created_at')
     user_rating = None
     if request.user.is_authenticated:
         user_rating = ratings.filter(user=request.user).first()
     
-    avg_rating = None
-    if ratings.exists():
-        avg_rating = round(sum(r.stars for r in ratings) / len(ratings), 1)
+    avg_rating = stats.avg_rating if stats else None
+    rating_count = stats.rating_count if stats else 0
     
     # Check if user can edit (Level 16)
     can_edit = False
@@ -94,27 +112,18 @@ def story_detail(request, story_id):
                 can_edit = True
     
     # Level 13: Check for saved session
-    has_saved_session = False
-    if not request.user.is_authenticated:
-        session_key = request.session.session_key
-        if session_key:
-            has_saved_session = PlaySession.objects.filter(
-                session_key=session_key,
-                story_id=story_id
-            ).exists()
-    else:
-        has_saved_session = PlaySession.objects.filter(
-            user=request.user,
-            story_id=story_id
-        ).exists()
+    has_saved_session = telemetry.saved_page_id(request, story_id) is not None
     
     context = {
         'story': story,
         'total_plays': total_plays,
         'ending_stats': ending_stats,
+        'predicted_endings': predicted_endings,
+        'predicted_steps': predicted_steps,
         'can_edit': can_edit,
         'ratings': ratings,
         'avg_rating': avg_rating,
+        'rating_count': rating_count,
         'user_rating': user_rating,
         'has_saved_session': has_saved_session,
     }
@@ -125,60 +134,34 @@ def story_detail(request, story_id):
 
 def play_story(request, story_id):
     """Start or resume playing a story"""
-    story = flask_api.get_story(story_id)
+    # Level 13: Check for saved session
+    saved_page_id = telemetry.saved_page_id(request, story_id)
     
-    if not story:
+    # Resume or start new: one call loads the story and the current page
+    result = flask_api.step(story_id, page_id=saved_page_id)
+    
+    if not result:
         messages.error(request, 'Story not found.')
         return redirect('home')
     
     # Level 16: Check if story is suspended
-    if story.get('status') == 'suspended':
+    if result.get('code') == 'suspended':
         messages.error(request, 'This story has been suspended by moderators.')
         return redirect('home')
     
-    # Level 13: Check for saved session
-    saved_session = None
-    if not request.user.is_authenticated:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        saved_session = PlaySession.objects.filter(
-            session_key=session_key,
-            story_id=story_id
-        ).first()
-    else:
-        saved_session = PlaySession.objects.filter(
-            user=request.user,
-            story_id=story_id
-        ).first()
-    
-    # Resume or start new
-    if saved_session:
-        page = flask_api.get_page(saved_session.current_page_id)
-    else:
-        page = flask_api.get_story_start(story_id)
-    
-    if not page:
+    if 'error' in result:
         messages.error(request, 'Could not load story page.')
         return redirect('home')
     
+    story = result['story']
+    page = result['page']
+    
+    # Fetch the pages this one leads to while the reader is reading
+    flask_api.prefetch_next(page)
+    
     # Level 13: Save initial session
-    if not saved_session:
-        if not request.user.is_authenticated:
-            if not request.session.session_key:
-                request.session.create()
-            PlaySession.objects.create(
-                session_key=request.session.session_key,
-                story_id=story_id,
-                current_page_id=page['id']
-            )
-        else:
-            PlaySession.objects.create(
-                user=request.user,
-                session_key=request.session.session_key or '',
-                story_id=story_id,
-                current_page_id=page['id']
-            )
+    if saved_page_id is None:
+        telemetry.record_progress(request, story_id, page['id'])
     
     # Level 18: Filter choices by dice requirements
     available_choices = page.get('choices', [])
@@ -187,15 +170,9 @@ def play_story(request, story_id):
         request.session['last_dice_roll'] = dice_roll
         messages.info(request, f'You rolled a {dice_roll}!')
     
-    if not saved_session:
+    if saved_page_id is None:
         # This is a new game, track the starting page
-        path_key = f'path_{story_id}'
-        request.session[path_key] = [{
-            'page_id': page['id'],
-            'choice_id': None,  # No choice led here, it's the start
-            'dice_roll': None
-        }]
-        request.session.modified = True
+        telemetry.start_path(request, story_id, page['id'])
     
     dice_roll = request.session.get('last_dice_roll')
     
@@ -208,86 +185,65 @@ def play_story(request, story_id):
     return render(request, 'gameplay/play.html', context)
 
 
+def uses_packed_path(story_id):
+    """Whether plays of this story keep their path packed on Play instead of in PlayerPath rows"""
+    return (
+        settings.GAMEPLAY_PATH_STORAGE == 'packed'
+        or story_id in settings.GAMEPLAY_PACKED_PATH_STORIES
+    )
+
+
 def make_choice(request, story_id, choice_id):
     """Process a choice and navigate to next page"""
     if request.method != 'POST':
         return redirect('play_story', story_id=story_id)
     
-    story = flask_api.get_story(story_id)
-    if not story:
-        messages.error(request, 'Story not found.')
-        return redirect('home')
-    
-    # Get the choice to find next page
+    # Flask validates the page, the choice and the dice roll in one call
     current_page_id = request.POST.get('current_page_id')
-    current_page = flask_api.get_page(current_page_id)
-    
-    if not current_page:
+    if not current_page_id:
         messages.error(request, 'Invalid page.')
         return redirect('play_story', story_id=story_id)
     
-    # Find the choice
-    choice = None
-    for c in current_page.get('choices', []):
-        if c['id'] == int(choice_id):
-            choice = c
-            break
+    result = flask_api.step(
+        story_id,
+        page_id=current_page_id,
+        choice_id=choice_id,
+        dice_roll=request.session.get('last_dice_roll', 0)
+    )
     
-    if not choice:
-        messages.error(request, 'Invalid choice.')
+    if not result:
+        messages.error(request, 'Could not load next page.')
         return redirect('play_story', story_id=story_id)
     
+    if result.get('code') == 'suspended':
+        messages.error(request, 'This story has been suspended by moderators.')
+        return redirect('home')
+    
     # Level 18: Check dice requirement
+    if result.get('code') == 'dice_required':
+        messages.warning(request, result['error'])
+        return redirect('play_story', story_id=story_id)
+    
+    if 'error' in result:
+        messages.error(request, 'Invalid choice.')
+        return redirect('play_story', story_id=story_id)
+    
+    choice = result['choice']
+    next_page = result['page']
     dice_roll = None
     if choice.get('dice_requirement'):
         dice_roll = request.session.get('last_dice_roll', 0)
-        if dice_roll < choice['dice_requirement']:
-            messages.warning(
-                request, 
-                f'You need to roll at least {choice["dice_requirement"]} to choose this option!'
-            )
-            return redirect('play_story', story_id=story_id)
     
     # Clear dice roll after use
     if 'last_dice_roll' in request.session:
         del request.session['last_dice_roll']
     
-    # Get next page
-    next_page = flask_api.get_page(choice['next_page_id'])
-    
-    if not next_page:
-        messages.error(request, 'Could not load next page.')
-        return redirect('play_story', story_id=story_id)
-    
-    # Level 13: Update saved session
-    if not request.user.is_authenticated:
-        if not request.session.session_key:
-            request.session.create()
-        session_key = request.session.session_key
-        PlaySession.objects.update_or_create(
-            session_key=session_key,
-            story_id=story_id,
-            defaults={'current_page_id': next_page['id']}
-        )
-    else:
-        PlaySession.objects.update_or_create(
-            user=request.user,
-            story_id=story_id,
-            defaults={'current_page_id': next_page['id']}
-        )
-    
     # Check if ending
     if next_page.get('is_ending'):
         # Record the play
-        play = Play.objects.create(
-            story_id=story_id,
-            ending_page_id=next_page['id'],
-            user=request.user if request.user.is_authenticated else None
-        )
-        
         # *** LEVEL 18: Record the player path ***
-        # Get the path from session
-        path_sequence = request.session.get(f'path_{story_id}', [])
+        # Get the path from session (this also clears it)
+        path_sequence = telemetry.take_path(request, story_id)
         # Add the final page
         path_sequence.append({
             'page_id': next_page['id'],
@@ -295,45 +251,18 @@ def make_choice(request, story_id, choice_id):
             'dice_roll': dice_roll
         })
         
-        # Save path to database
-        for idx, step in enumerate(path_sequence):
-            PlayerPath.objects.create(
-                play=play,
-                page_id=step['page_id'],
-                choice_id=step.get('choice_id'),
-                sequence=idx + 1,
-                dice_roll=step.get('dice_roll')
-            )
-        
-        # Clear the path from session
-        if f'path_{story_id}' in request.session:
-            del request.session[f'path_{story_id}']
-        
-        # Clear the play session
-        if not request.user.is_authenticated:
-            PlaySession.objects.filter(
-                session_key=request.session.session_key,
-                story_id=story_id
-            ).delete()
-        else:
-            PlaySession.objects.filter(
-                user=request.user,
-                story_id=story_id
-            ).delete()
+        # Queued with the end of the saved session; nothing is written here
+        telemetry.record_finish(
+            request, story_id, next_page['id'], path_sequence, packed=uses_packed_path(story_id)
+        )
         
         return redirect('story_ending', story_id=story_id, ending_page_id=next_page['id'])
     
-    # *** LEVEL 18: Track the path in session ***
-    path_key = f'path_{story_id}'
-    if path_key not in request.session:
-        request.session[path_key] = []
+    # Level 13: Update saved session
+    telemetry.record_progress(request, story_id, next_page['id'])
     
-    request.session[path_key].append({
-        'page_id': current_page['id'],
-        'choice_id': choice_id,
-        'dice_roll': dice_roll
-    })
-    request.session.modified = True
+    # *** LEVEL 18: Track the path in session ***
+    telemetry.extend_path(request, story_id, choice['page_id'], choice_id, dice_roll)
     
     # Navigate to the page (reload play view)
     return redirect('play_story', story_id=story_id)
@@ -349,12 +278,19 @@ def story_ending(request, story_id, ending_page_id):
         return redirect('home')
     
     # Level 13: Get ending statistics
-    plays_with_ending = Play.objects.filter(
-        story_id=story_id,
-        ending_page_id=ending_page_id
-    ).count()
+    ending_stats = EndingStats.objects.filter(story_id=story_id, ending_page_id=ending_page_id).first()
+    plays_with_ending = ending_stats.play_count if ending_stats else 0
+    
+    stats = StoryStats.objects.filter(story_id=story_id).first()
+    total_plays = stats.play_count if stats else 0
     
-    total_plays = Play.objects.filter(story_id=story_id).count()
+    # The reader's own play may still be waiting in the telemetry queue
+    last_play = telemetry.last_play(request, story_id, ending_page_id)
+    recorded_play = Play.objects.filter(event_key=last_play['key']).first() if last_play else None
+    play_pending = last_play is not None and recorded_play is None
+    if play_pending:
+        plays_with_ending += 1
+        total_plays += 1
     
     percentage = 0
     if total_plays > 0:
@@ -362,7 +298,9 @@ def story_ending(request, story_id, ending_page_id):
     
     # *** LEVEL 18: Get the current play (most recent for this user/story) ***
     play_id = None
-    if request.user.is_authenticated:
+    if recorded_play and request.user.is_authenticated:
+        play_id = recorded_play.id
+    elif not last_play and request.user.is_authenticated:
         latest_play = Play.objects.filter(
             user=request.user,
             story_id=story_id,
@@ -379,5 +317,6 @@ def story_ending(request, story_id, ending_page_id):
         'total_plays': total_plays,
         'percentage': percentage,
         'play_id': play_id,  # ← NEW: Pass play_id to template
+        'play_pending': play_pending,
     }
     return render(request, 'gameplay/ending.html', context)
@@ -5,11 +5,14 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.db.models import Count, Avg
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
 from .models import Play, UserProfile, Rating, Report
 from .flask_client import flask_api
+from .telemetry import telemetry_queue
+from .stats import build_statistics_snapshot, latest_statistics_snapshot
 
 def is_admin(user):
     """Check if user is admin"""
@@ -98,13 +101,15 @@ def user_logout(request):
 def profile(request):
     """User profile page"""
     # Get user's play history
-    plays = Play.objects.filter(user=request.user).order_by('-created_at')[:10]
+    plays = list(Play.objects.filter(user=request.user).order_by('-created_at')[:10])
     
-    # Enrich with story information
+    # Enrich with story information (one batch request per resource)
+    stories = flask_api.get_stories_by_ids(play.story_id for play in plays)
+    ending_pages = flask_api.get_pages(play.ending_page_id for play in plays)
     play_data = []
     for play in plays:
-        story = flask_api.get_story(play.story_id)
-        ending_page = flask_api.get_page(play.ending_page_id)
+        story = stories.get(play.story_id)
+        ending_page = ending_pages.get(play.ending_page_id)
         if story:
             play_data.append({
                 'play': play,
@@ -215,7 +220,7 @@ def admin_dashboard(request):
     reviewed_reports = Report.objects.filter(status='reviewed').select_related('user')
     
     # Get statistics
-    total_stories = len(flask_api.get_stories())
+    total_stories = flask_api.count_stories() or 0
     total_plays = Play.objects.count()
     total_users = User.objects.count()
     
@@ -225,6 +230,8 @@ def admin_dashboard(request):
         'total_stories': total_stories,
         'total_plays': total_plays,
         'total_users': total_users,
+        'cache_stats': flask_api.cache_stats(),
+        'telemetry_stats': telemetry_queue.stats(),
     }
     return render(request, 'gameplay/admin_dashboard.html', context)
 
@@ -323,10 +330,12 @@ def story_tree_view(request, story_id):
     
     # Get tree data from Flask API
     tree_data = flask_api.get_story_tree(story_id)
+    analysis = flask_api.get_story_analysis(story_id)
     
     context = {
         'story': story,
         'tree_data': tree_data,
+        'analysis': analysis,
     }
     return render(request, 'gameplay/story_tree.html', context)
 
@@ -343,13 +352,14 @@ def player_path_view(request, play_id):
     
     story = flask_api.get_story(play.story_id)
     
-    # Get path nodes
-    path_nodes = play.path_nodes.all().order_by('sequence')
+    # Get path nodes (rows, or decoded from the packed column)
+    path_nodes = play.path_steps()
     
     # Enrich with page data
+    pages = flask_api.get_pages(node.page_id for node in path_nodes)
     path_data = []
     for node in path_nodes:
-        page = flask_api.get_page(node.page_id)
+        page = pages.get(node.page_id)
         path_data.append({
             'node': node,
             'page': page,
@@ -366,42 +376,31 @@ def player_path_view(request, play_id):
 # ========== Statistics Page ==========
 
 def statistics(request):
-    """Global statistics page"""
-    # Overall stats
-    total_plays = Play.objects.count()
-    total_stories = len(flask_api.get_stories(status='published'))
-    total_users = User.objects.count()
-    
-    # Top stories by plays
-    story_play_counts = Play.objects.values('story_id').annotate(
-        play_count=Count('id')
-    ).order_by('-play_count')[:10]
-    
-    top_stories = []
-    for item in story_play_counts:
-        story = flask_api.get_story(item['story_id'])
-        if story:
-            top_stories.append({
-                'story': story,
-                'play_count': item['play_count']
-            })
-    
-    # Recent ratings (Level 18)
-    recent_ratings = Rating.objects.select_related('user').order_by('-created_at')[:10]
-    rating_data = []
-    for rating in recent_ratings:
-        story = flask_api.get_story(rating.story_id)
-        if story:
-            rating_data.append({
-                'rating': rating,
-                'story': story,
-            })
+    """Global statistics page, served from the latest prebuilt snapshot"""
+    snapshot = latest_statistics_snapshot()
+    data = snapshot.data
+    rating_data = [
+        {'story': item['story'], 'rating': dict(item['rating'], created_at=parse_datetime(item['rating']['created_at']))}
+        for item in data['rating_data']
+    ]
     
     context = {
-        'total_plays': total_plays,
-        'total_stories': total_stories,
-        'total_users': total_users,
-        'top_stories': top_stories,
+        'total_plays': data['total_plays'],
+        'total_stories': data['total_stories'],
+        'total_users': data['total_users'],
+        'top_stories': data['top_stories'],
         'rating_data': rating_data,
+        'snapshot': snapshot,
+        'can_refresh': request.user.is_authenticated and is_admin(request.user),
     }
     return render(request, 'gameplay/statistics.html', context)
+
+
+@login_required
+@user_passes_test(is_admin)
+@require_POST
+def refresh_statistics(request):
+    """Rebuild the statistics snapshot right away"""
+    snapshot = build_statistics_snapshot()
+    messages.success(request, f'Statistics refreshed in {snapshot.build_ms:.0f} ms.')
+    return redirect('statistics')
@@ -19,14 +19,11 @@ def author_dashboard(request):
             messages.error(request, 'You need author privileges to access this page.')
             return redirect('home')
     
-    # Get all stories (at Level 10/13, show all; at Level 16+, filter by author)
-    all_stories = flask_api.get_stories()
-    
-    # Level 16: Filter by author
-    if request.user.is_authenticated and not request.user.is_staff:
-        my_stories = [s for s in all_stories if s.get('author_id') == request.user.id]
-    else:
-        my_stories = all_stories
+    # Level 16: Authors see their own stories (filtered by Flask), staff see all
+    author_id = None if request.user.is_staff else request.user.id
+    my_stories = list(flask_api.iter_stories(
+        author_id=author_id, fields=['title', 'description', 'status']
+    ))
     
     # Separate by status
     drafts = [s for s in my_stories if s.get('status') == 'draft']
@@ -141,7 +138,8 @@ def delete_story(request, story_id):
             messages.error(request, 'You can only delete your own stories.')
             return redirect('author_dashboard')
     
-    if flask_api.delete_story(story_id):
+    # Soft delete: the story disappears at once, Flask purges its pages in the background
+    if flask_api.delete_story(story_id, soft=True):
         messages.success(request, 'Story deleted successfully!')
     else:
         messages.error(request, 'Failed to delete story.')
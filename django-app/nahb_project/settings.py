@@ -24,7 +24,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so a captured profile covers the rest; inert unless GAMEPLAY_PROFILING is enabled
+    'gameplay.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Counts Flask calls and ORM queries per request (Server-Timing, log line, budgets)
+    'gameplay.middleware.RequestBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,6 +65,23 @@ DATABASES = {
     }
 }
 
+# Cache (used by the Flask API client cache)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nahb-default',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Session store for GAMEPLAY_SESSION_MODE='cache'. Kept apart from
+    # 'default' so story cache churn never evicts sessions; use a shared
+    # backend (memcached/Redis) when running several processes.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nahb-sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -98,11 +119,167 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FLASK_API_URL = os.getenv('FLASK_API_URL', 'http://localhost:5000')
 FLASK_API_KEY = os.getenv('FLASK_API_KEY', 'your-secret-api-key-2024')
 
+# Flask API client transport: keep-alive pool shared by all worker threads
+FLASK_API_POOL_SIZE = int(os.getenv('FLASK_API_POOL_SIZE', '10'))
+# Per-endpoint timeouts in seconds ('default' is used for unlisted endpoints)
+FLASK_API_TIMEOUTS = {
+    'default': 5,
+    'list': 5,
+    'story': 10,
+    'batch': 10,
+    'write': 10,
+    'import': 60,
+}
+# GET requests are retried with exponential backoff and full jitter
+FLASK_API_MAX_RETRIES = int(os.getenv('FLASK_API_MAX_RETRIES', '2'))
+FLASK_API_RETRY_BACKOFF = 0.1  # seconds, doubled per attempt
+FLASK_API_RETRY_BACKOFF_MAX = 1.0
+
+# Read-through cache for story content fetched from Flask. Entries are fresh
+# for TTL seconds, then served stale for up to STALE_TTL more while being
+# refreshed (or while Flask is unreachable).
+FLASK_API_CACHE = {
+    'ALIAS': 'default',
+    'TTL': {
+        'story': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'start': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'page': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'tree': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'analysis': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'odds': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'summary': int(os.getenv('FLASK_API_CACHE_TTL', '300')),
+        'endings': 86400,  # keyed by story version, so never outdated by an edit
+        'stories': 0,  # story lists are revalidated with If-None-Match on every call
+    },
+    'STALE_TTL': int(os.getenv('FLASK_API_CACHE_STALE_TTL', '3600')),
+    'BACKGROUND_REFRESH': True,
+}
+
+# Speculative prefetch on the play page: while the reader is reading, fetch
+# every page the current choices lead to (DEPTH 2 also fetches the pages
+# after those) so the next click is served from the cache.
+FLASK_API_PREFETCH = {
+    'ENABLED': os.getenv('FLASK_API_PREFETCH', 'true').lower() in ('1', 'true', 'yes'),
+    'DEPTH': int(os.getenv('FLASK_API_PREFETCH_DEPTH', '1')),
+    'BACKGROUND': True,
+}
+
+# How a completed play's path is stored: 'rows' writes one PlayerPath row
+# per step (one bulk INSERT), 'packed' keeps the whole path in a single
+# binary column on Play. GAMEPLAY_PACKED_PATH_STORIES opts single stories
+# (comma-separated IDs) into 'packed'.
+GAMEPLAY_PATH_STORAGE = os.getenv('GAMEPLAY_PATH_STORAGE', 'rows')
+GAMEPLAY_PACKED_PATH_STORIES = {
+    int(story_id) for story_id in os.getenv('GAMEPLAY_PACKED_PATH_STORIES', '').split(',') if story_id.strip()
+}
+
+# Write-behind queue for gameplay telemetry (saved progress, completed plays
+# and their paths). Events go to a durable SQLite file and a worker thread
+# writes them to the database in batches; ENABLED=False writes them inline.
+# `manage.py flush_telemetry` drains the queue by hand.
+GAMEPLAY_TELEMETRY = {
+    'ENABLED': os.getenv('GAMEPLAY_TELEMETRY_QUEUE', 'true').lower() in ('1', 'true', 'yes'),
+    'QUEUE_PATH': os.getenv('GAMEPLAY_TELEMETRY_QUEUE_PATH', str(BASE_DIR / 'telemetry_queue.sqlite3')),
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 0.5,  # seconds between flushes
+    'LEASE_SECONDS': 60,  # a crashed worker's claimed batch is retried after this
+    'MAX_ATTEMPTS': 5,  # a failing event is then moved to the queue file's dead_events table
+    'RETRY_DELAY': 5,  # seconds before a failed event's first retry, doubling after each
+}
+
 # Login URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Session configuration for anonymous play sessions (Level 13)
+# GAMEPLAY_SESSION_MODE picks the store: 'db' (django_session table),
+# 'cache' (the 'sessions' cache) or 'cookie' (signed cookie, nothing stored
+# server-side). Sessions are saved only when a view changes them.
+GAMEPLAY_SESSION_MODE = os.getenv('GAMEPLAY_SESSION_MODE', 'db')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cookie': 'django.contrib.sessions.backends.signed_cookies',
+}[GAMEPLAY_SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
 SESSION_COOKIE_AGE = 86400 * 30  # 30 days
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+
+# Steps of an unfinished play kept in the session per story: the first page
+# plus the most recent ones, the rest only counted (Play.path_steps_dropped).
+# Keeps cookie sessions under the 4 KB limit; 0 keeps every step, the
+# default for the server-side session stores.
+GAMEPLAY_SESSION_PATH_LIMIT = int(os.getenv(
+    'GAMEPLAY_SESSION_PATH_LIMIT', '100' if GAMEPLAY_SESSION_MODE == 'cookie' else '0'
+))
+
+# The /statistics/ page is served from a prebuilt snapshot. One older than
+# MAX_AGE seconds is still shown but rebuilt (in a background thread unless
+# BACKGROUND is off); `manage.py build_statistics` rebuilds it from cron.
+GAMEPLAY_STATISTICS = {
+    'MAX_AGE': int(os.getenv('GAMEPLAY_STATISTICS_MAX_AGE', '600')),
+    'BACKGROUND': True,
+    'KEEP': 10,  # snapshots retained for history
+}
+
+# Upper bounds on upstream Flask calls and ORM queries per request, by URL
+# name (None = unlimited). Cold-cache counts; a warm cache makes far fewer
+# calls. Going over is logged at INFO, or raises BudgetExceeded with 'raise'.
+GAMEPLAY_REQUEST_BUDGETS = {
+    'ACTION': os.getenv('GAMEPLAY_REQUEST_BUDGET_ACTION', 'log'),
+    'DEFAULT': {'upstream_calls': 10, 'queries': 30},
+    'VIEWS': {
+        'home': {'upstream_calls': 1, 'queries': 6},
+        'story_detail': {'upstream_calls': 3, 'queries': 10},
+        'play_story': {'upstream_calls': 2, 'queries': 10},
+        'make_choice': {'upstream_calls': 2, 'queries': 12},
+        'story_ending': {'upstream_calls': 2, 'queries': 8},
+        'rate_story': {'upstream_calls': 0, 'queries': 10},
+        # One story batch plus one ending-page batch
+        'profile': {'upstream_calls': 2, 'queries': 8},
+        'statistics': {'upstream_calls': 2, 'queries': 14},
+        'story_tree': {'upstream_calls': 2, 'queries': 5},
+        'player_path': {'upstream_calls': 2, 'queries': 8},
+        'author_dashboard': {'upstream_calls': 2, 'queries': 5},
+        'admin_dashboard': {'upstream_calls': 1, 'queries': 10},
+    },
+}
+
+# Append per-request spans here (Flask reads the same NAHB_TRACE_FILE) and
+# merge them with `python manage.py show_traces`; unset disables tracing
+GAMEPLAY_TRACE_FILE = os.getenv('NAHB_TRACE_FILE') or None
+
+# Opt-in cProfile/tracemalloc capture of single requests that send
+# X-Profile: cpu|memory and X-Profile-Key: SECRET (see gameplay.profiling);
+# `python manage.py summarize_profiles` reads the dumps
+GAMEPLAY_PROFILING = {
+    'ENABLED': os.getenv('NAHB_PROFILING', 'false').lower() == 'true',
+    'SECRET': os.getenv('NAHB_PROFILE_SECRET', ''),
+    'DIR': os.getenv('NAHB_PROFILE_DIR', str(BASE_DIR / 'profiles')),
+    'KEEP': int(os.getenv('NAHB_PROFILE_KEEP', '50')),
+    'FRAMES': 10,  # traceback depth kept by tracemalloc
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request from gameplay.middleware: DEBUG normally,
+        # INFO when over budget (set DEBUG here to see every request)
+        'gameplay.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('GAMEPLAY_REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # Failed telemetry events: a warning per retry, an error when dead-lettered
+        'gameplay.telemetry': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
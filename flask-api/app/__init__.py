@@ -2,6 +2,7 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
@@ -16,6 +17,21 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['API_KEY'] = os.getenv('API_KEY', 'your-secret-api-key-2024')
+    # Shared-cache lifetime for published content; drafts are always revalidated
+    app.config['PUBLISHED_MAX_AGE'] = int(os.getenv('PUBLISHED_MAX_AGE', '60'))
+    app.config['MAX_IMPORT_PAGES'] = int(os.getenv('MAX_IMPORT_PAGES', '20000'))
+    # Soft-deleted stories are purged this many pages per transaction
+    app.config['PURGE_BATCH_SIZE'] = int(os.getenv('PURGE_BATCH_SIZE', '500'))
+    app.config['PURGE_IN_BACKGROUND'] = os.getenv('PURGE_IN_BACKGROUND', 'true').lower() == 'true'
+    # Per-endpoint latency/SQL/size metrics at GET /metrics plus Server-Timing headers
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    # Append per-request spans here for cross-service traces (shared with Django)
+    app.config['TRACE_FILE'] = os.getenv('NAHB_TRACE_FILE') or None
+    # Opt-in cProfile/tracemalloc capture of requests sending X-Profile + X-Profile-Key
+    app.config['PROFILING_ENABLED'] = os.getenv('NAHB_PROFILING', 'false').lower() == 'true'
+    app.config['PROFILE_SECRET'] = os.getenv('NAHB_PROFILE_SECRET', '')
+    app.config['PROFILE_DIR'] = os.getenv('NAHB_PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILE_KEEP'] = int(os.getenv('NAHB_PROFILE_KEEP', '50'))
     
     # Initialize extensions
     db.init_app(app)
@@ -25,8 +41,46 @@ def create_app():
     from app.routes import api_bp
     app.register_blueprint(api_bp)
     
+    from app import metrics
+    metrics.init_app(app, api_bp)
+    
+    from app import deletion
+    deletion.init_app(app)
+    
     # Create tables
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+    
+    from app import search
+    search.init_app(app)
+    
+    from app import generator
+    generator.init_app(app)
+    
+    from app import profiling
+    profiling.init_app(app)
     
     return app
+
+
+def upgrade_schema():
+    """Add columns and indexes that were introduced after the database was created.
+
+    db.create_all() never alters existing tables, so columns added to the
+    models later are appended here with ALTER TABLE ... ADD COLUMN, and
+    missing indexes are created.
+    """
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.tables.values():
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
@@ -0,0 +1,108 @@
+"""
+Story and page deletion.
+
+Hard deletes run a constant number of set-based statements, relying on the
+indexes on pages.story_id, choices.page_id and choices.next_page_id. Soft
+deletes only stamp Story.deleted_at; the rows are then purged in small
+batches by a background thread (or `flask purge-stories`) so a huge story
+never holds the database write lock for long.
+"""
+
+import threading
+from datetime import datetime
+
+import click
+from sqlalchemy import or_
+
+from app import db
+from app.models import Story, Page, Choice
+
+_purge_lock = threading.Lock()
+
+
+def delete_story_rows(story_id):
+    """Delete a story with all its pages and choices using four statements"""
+    story_pages = db.session.query(Page.id).filter(Page.story_id == story_id).scalar_subquery()
+
+    Choice.query.filter(
+        or_(Choice.page_id.in_(story_pages), Choice.next_page_id.in_(story_pages))
+    ).delete(synchronize_session=False)
+    Story.query.filter_by(id=story_id).update({Story.start_page_id: None}, synchronize_session=False)
+    Page.query.filter_by(story_id=story_id).delete(synchronize_session=False)
+    Story.query.filter_by(id=story_id).delete(synchronize_session=False)
+
+
+def delete_page_rows(page_id):
+    """Delete a page, its choices and every choice leading to it"""
+    Choice.query.filter(
+        or_(Choice.page_id == page_id, Choice.next_page_id == page_id)
+    ).delete(synchronize_session=False)
+    Story.query.filter_by(start_page_id=page_id).update({Story.start_page_id: None}, synchronize_session=False)
+    Page.query.filter_by(id=page_id).delete(synchronize_session=False)
+
+
+def soft_delete_story(story):
+    """Hide a story immediately and schedule its rows for purging"""
+    story.deleted_at = datetime.utcnow()
+    db.session.commit()
+    schedule_purge()
+
+
+def purge_story(story_id, batch_size):
+    """Delete a soft-deleted story batch by batch, committing after each batch"""
+    while True:
+        batch = [
+            row.id for row in
+            db.session.query(Page.id).filter_by(story_id=story_id).limit(batch_size)
+        ]
+        if not batch:
+            break
+        Choice.query.filter(
+            or_(Choice.page_id.in_(batch), Choice.next_page_id.in_(batch))
+        ).delete(synchronize_session=False)
+        Story.query.filter_by(id=story_id).update({Story.start_page_id: None}, synchronize_session=False)
+        Page.query.filter(Page.id.in_(batch)).delete(synchronize_session=False)
+        db.session.commit()
+
+    Story.query.filter_by(id=story_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def purge_deleted_stories(batch_size):
+    """Purge every soft-deleted story, returning how many were purged"""
+    with _purge_lock:
+        story_ids = [row.id for row in db.session.query(Story.id).filter(Story.deleted_at.isnot(None))]
+        for story_id in story_ids:
+            purge_story(story_id, batch_size)
+        return len(story_ids)
+
+
+def schedule_purge():
+    """Purge soft-deleted stories after the current request, in a background thread if enabled"""
+    from flask import current_app
+
+    app = current_app._get_current_object()
+    batch_size = app.config['PURGE_BATCH_SIZE']
+
+    def run():
+        with app.app_context():
+            try:
+                purge_deleted_stories(batch_size)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Purging soft-deleted stories failed')
+
+    if app.config['PURGE_IN_BACKGROUND']:
+        threading.Thread(target=run, daemon=True).start()
+    else:
+        run()
+
+
+def init_app(app):
+    """Register the purge-stories CLI command"""
+
+    @app.cli.command('purge-stories')
+    def purge_stories_command():
+        """Purge soft-deleted stories left over from a restart."""
+        count = purge_deleted_stories(app.config['PURGE_BATCH_SIZE'])
+        click.echo(f'Purged {count} soft-deleted stories')
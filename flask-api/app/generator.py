@@ -0,0 +1,132 @@
+"""
+Synthetic story graphs for load and benchmark data.
+
+generate_story() writes a story of any size straight into the database with
+one executemany INSERT for the pages and one for the choices (the same
+helpers as POST /stories/import, without the HTTP round trip). The last
+ending_ratio of the pages are endings. Choice 0 of each other page leads
+to the next page, so the longest path is a chain from the start to the
+first ending.
+The remaining choices jump forward at random, or back to an earlier page
+with probability cycle_ratio; a dice_fraction of all choices need a dice
+roll. Every page is reachable from the start: an ending no random jump
+leads to gets one extra choice on a random earlier page.
+
+    flask generate-stories --pages 10000 --branching 4 --cycle-ratio 0.1 --dice-fraction 0.2
+
+Generation is deterministic for a given seed.
+"""
+
+import random
+import time
+
+import click
+
+from app import db
+from app.models import Story, insert_choices, insert_story_pages
+
+WORDS = (
+    'the hero door forest shadow lantern river castle whisper dragon map key bridge storm '
+    'village stranger sword echo mountain cave coin riddle tower night fire path ancient '
+    'silver broken hidden wind oath market ruin song wolf star gate mist crown'
+).split()
+
+
+def filler_text(rng, length):
+    """About length characters of word salad"""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length].capitalize() + '.'
+
+
+def generate_story(pages=1000, branching=2, cycle_ratio=0.1, dice_fraction=0.1, text_length=400,
+                   ending_ratio=0.05, seed=None, title=None, status='published', author_id=None):
+    """Insert one synthetic story and return its id"""
+    if pages < 2:
+        raise ValueError('A generated story needs at least 2 pages')
+    rng = random.Random(seed)
+    endings = max(1, min(pages - 1, round(pages * ending_ratio)))
+    first_ending = pages - endings
+
+    story = Story(
+        title=title or f'Synthetic story ({pages} pages, branching {branching})',
+        description=filler_text(rng, min(text_length, 300)),
+        status=status,
+        author_id=author_id,
+    )
+    db.session.add(story)
+    db.session.flush()
+
+    page_ids = insert_story_pages(story.id, [
+        {
+            'text': filler_text(rng, text_length),
+            'is_ending': index >= first_ending,
+            'ending_label': f'Ending {index - first_ending + 1}' if index >= first_ending else None,
+        }
+        for index in range(pages)
+    ])
+
+    targets = []
+    for index in range(first_ending):
+        page_targets = [index + 1]
+        for _ in range(branching - 1):
+            if rng.random() < cycle_ratio:
+                page_targets.append(rng.randint(0, index))
+            else:
+                page_targets.append(rng.randint(index + 1, pages - 1))
+        targets.append(page_targets)
+    # The chain only reaches the first ending; give every other ending a way in
+    # from a random earlier page unless a random jump already leads there
+    reached = {target for page_targets in targets for target in page_targets}
+    for ending in range(first_ending + 1, pages):
+        if ending not in reached:
+            targets[rng.randrange(first_ending)].append(ending)
+
+    choice_rows = []
+    for index, page_targets in enumerate(targets):
+        for number, target in enumerate(page_targets, start=1):
+            choice_rows.append({
+                'page_id': page_ids[index],
+                'text': f'Option {number}: {filler_text(rng, 40)}',
+                'next_page_id': page_ids[target],
+                'dice_requirement': rng.randint(2, 6) if rng.random() < dice_fraction else None,
+            })
+    insert_choices(choice_rows)
+
+    story.start_page_id = page_ids[0]
+    db.session.commit()
+    return story.id
+
+
+def init_app(app):
+    """Register the generate-stories CLI command"""
+
+    @app.cli.command('generate-stories')
+    @click.option('--stories', default=1, show_default=True, help='How many stories to generate')
+    @click.option('--pages', default=1000, show_default=True, help='Pages per story')
+    @click.option('--branching', default=2, show_default=True, help='Choices on every non-ending page')
+    @click.option('--cycle-ratio', default=0.1, show_default=True, help='Share of extra choices leading back')
+    @click.option('--dice-fraction', default=0.1, show_default=True, help='Share of choices needing a dice roll')
+    @click.option('--text-length', default=400, show_default=True, help='Characters of text per page')
+    @click.option('--ending-ratio', default=0.05, show_default=True, help='Share of pages that are endings')
+    @click.option('--status', default='published', show_default=True,
+                  type=click.Choice(['draft', 'published', 'suspended']))
+    @click.option('--author-id', type=int, default=None, help='Author user id on the Django side')
+    @click.option('--seed', type=int, default=None, help='Random seed, for repeatable stories')
+    def generate_stories_command(stories, pages, branching, cycle_ratio, dice_fraction, text_length,
+                                 ending_ratio, status, author_id, seed):
+        """Write synthetic story graphs directly into the database."""
+        if branching < 1:
+            raise click.BadParameter('must be at least 1', param_hint='--branching')
+        for number in range(stories):
+            started = time.perf_counter()
+            story_id = generate_story(
+                pages=pages, branching=branching, cycle_ratio=cycle_ratio, dice_fraction=dice_fraction,
+                text_length=text_length, ending_ratio=ending_ratio,
+                seed=None if seed is None else seed + number, status=status, author_id=author_id,
+            )
+            click.echo(f'Story {story_id}: {pages} pages, {(time.perf_counter() - started):.2f}s')
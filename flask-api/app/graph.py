@@ -0,0 +1,249 @@
+"""
+Story graph analysis.
+
+A story is a directed graph: pages are nodes and choices are edges. Every
+analysis here is a single linear-time pass (BFS or Tarjan's SCC) over an
+adjacency list built from two column-only queries, so it stays fast on
+stories with thousands of pages. Ending pages are terminal: a play stops
+there, so any choices on an ending are ignored.
+"""
+
+import threading
+from collections import OrderedDict, deque
+
+from app import db
+from app.models import Page, Choice
+
+# Results are cached per (story_id, version), so any edit invalidates them
+ANALYSIS_CACHE_SIZE = 256
+
+
+class StoryGraph:
+    """Adjacency-list view of one story"""
+
+    def __init__(self, story_id, start_page_id, pages, choices):
+        self.story_id = story_id
+        self.start_page_id = start_page_id
+        # page_id -> (is_ending, ending_label), in page ID order
+        self.pages = {page_id: (bool(is_ending), label) for page_id, is_ending, label in pages}
+        # page_id -> [(choice_id, next_page_id, dice_requirement), ...]
+        self.choices = {page_id: [] for page_id in self.pages}
+        self.dangling_choices = []
+        for choice_id, page_id, next_page_id, dice_requirement in choices:
+            if next_page_id not in self.pages:
+                self.dangling_choices.append(choice_id)
+                continue
+            self.choices[page_id].append((choice_id, next_page_id, dice_requirement))
+
+    @classmethod
+    def load(cls, story):
+        """Build the graph for a story with two queries"""
+        pages = (
+            db.session.query(Page.id, Page.is_ending, Page.ending_label)
+            .filter(Page.story_id == story.id)
+            .order_by(Page.id)
+            .all()
+        )
+        choices = (
+            db.session.query(Choice.id, Choice.page_id, Choice.next_page_id, Choice.dice_requirement)
+            .join(Page, Choice.page_id == Page.id)
+            .filter(Page.story_id == story.id)
+            .order_by(Choice.id)
+            .all()
+        )
+        return cls(story.id, story.start_page_id, pages, choices)
+
+    def is_ending(self, page_id):
+        return self.pages[page_id][0]
+
+    def successors(self, page_id):
+        """Distinct next pages of a page; endings have none"""
+        if self.is_ending(page_id):
+            return []
+        return list(dict.fromkeys(next_page_id for _, next_page_id, _ in self.choices[page_id]))
+
+
+def shortest_distances(graph):
+    """BFS from the start page: page_id -> number of choices on the shortest path"""
+    start = graph.start_page_id
+    if start not in graph.pages:
+        return {}
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        page_id = queue.popleft()
+        for next_page_id in graph.successors(page_id):
+            if next_page_id not in distances:
+                distances[next_page_id] = distances[page_id] + 1
+                queue.append(next_page_id)
+    return distances
+
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm, iterative; components come out in reverse topological order"""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+
+    for root in graph.pages:
+        if root in index:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph.successors(root)))]
+
+        while work:
+            node, successors = work[-1]
+            for next_page_id in successors:
+                if next_page_id not in index:
+                    index[next_page_id] = low[next_page_id] = counter
+                    counter += 1
+                    stack.append(next_page_id)
+                    on_stack.add(next_page_id)
+                    work.append((next_page_id, iter(graph.successors(next_page_id))))
+                    break
+                if next_page_id in on_stack:
+                    low[node] = min(low[node], index[next_page_id])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def is_cyclic(graph, component):
+    """A component is a cycle if it has several pages or a page choosing itself"""
+    if len(component) > 1:
+        return True
+    page_id = component[0]
+    return page_id in graph.successors(page_id)
+
+
+def longest_distances(graph, components, reachable):
+    """Longest path (in choices) from the start to each reachable page.
+
+    Computed over the condensation DAG in topological order. Pages that can
+    be reached through a cycle have no bound and map to None.
+    """
+    component_of = {}
+    for number, component in enumerate(components):
+        for page_id in component:
+            component_of[page_id] = number
+
+    longest = {graph.start_page_id: 0} if graph.start_page_id in reachable else {}
+    unbounded = set()
+    for number in reversed(range(len(components))):
+        component = components[number]
+        if not any(page_id in reachable for page_id in component):
+            continue
+        if is_cyclic(graph, component):
+            unbounded.add(number)
+        for page_id in component:
+            for next_page_id in graph.successors(page_id):
+                next_number = component_of[next_page_id]
+                if next_number == number:
+                    continue
+                if number in unbounded:
+                    unbounded.add(next_number)
+                candidate = longest.get(page_id, 0) + 1
+                if candidate > longest.get(next_page_id, -1):
+                    longest[next_page_id] = candidate
+
+    return {
+        page_id: None if component_of[page_id] in unbounded else longest.get(page_id)
+        for page_id in reachable
+    }
+
+
+def analyze_graph(graph):
+    """Structural report for a story graph"""
+    shortest = shortest_distances(graph)
+    components = strongly_connected_components(graph)
+    longest = longest_distances(graph, components, shortest)
+
+    cycles = [sorted(component) for component in components if is_cyclic(graph, component)]
+    cycles.sort()
+
+    branching = [len(graph.choices[page_id]) for page_id in graph.pages if not graph.is_ending(page_id)]
+
+    endings = []
+    for page_id, (is_ending, label) in graph.pages.items():
+        if not is_ending:
+            continue
+        endings.append({
+            'page_id': page_id,
+            'ending_label': label,
+            'reachable': page_id in shortest,
+            'shortest_path': shortest.get(page_id),
+            'longest_path': longest.get(page_id),
+            'unbounded': page_id in shortest and longest.get(page_id) is None,
+        })
+
+    return {
+        'story_id': graph.story_id,
+        'start_page_id': graph.start_page_id,
+        'page_count': len(graph.pages),
+        'choice_count': sum(len(choices) for choices in graph.choices.values()),
+        'unreachable_pages': [page_id for page_id in graph.pages if page_id not in shortest],
+        'dead_ends': [
+            page_id for page_id, choices in graph.choices.items()
+            if not choices and not graph.is_ending(page_id)
+        ],
+        'dangling_choices': graph.dangling_choices,
+        'cycles': cycles,
+        'endings': endings,
+        'branching_factor': {
+            'average': round(sum(branching) / len(branching), 3) if branching else 0,
+            'max': max(branching, default=0),
+        },
+    }
+
+
+class VersionedCache:
+    """Small thread-safe LRU of per-story results keyed by (story_id, version)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, story, compute):
+        key = (story.id, story.version)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+
+_analysis_cache = VersionedCache(ANALYSIS_CACHE_SIZE)
+
+
+def analyze_story(story):
+    """Analyze a story, reusing the cached report for its current version"""
+    def compute():
+        report = analyze_graph(StoryGraph.load(story))
+        report['version'] = story.version
+        return report
+    return _analysis_cache.get_or_compute(story, compute)
@@ -0,0 +1,177 @@
+"""
+Predicted ending odds for a story.
+
+A play is modelled as an absorbing Markov chain over pages. On each
+non-ending page the reader rolls one die (1..DICE_SIDES) and picks uniformly
+among the choices the roll unlocks (no dice_requirement, or requirement <=
+roll). Rolls that unlock nothing are re-rolled, so each page's transition
+row is normalised over the rolls that leave at least one choice.
+
+Probability mass is pushed forward from the start page one strongly
+connected component at a time, in topological order. Acyclic pages cost a
+single pass over their choices; each cycle is a sparse linear system
+(I - P^T) x = m solved with restarted GMRES to SOLVER_TOLERANCE, falling
+back to a sparse LU factorisation if GMRES stalls (a loop that is very
+hard to leave). Generated cyclic stories often collapse into one
+component of thousands of pages, which a dense matrix would make cubic in
+time and quadratic in memory.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+from scipy.sparse import csr_matrix, identity
+from scipy.sparse.linalg import gmres, spsolve
+
+from app.graph import StoryGraph, VersionedCache, strongly_connected_components
+
+DICE_SIDES = 6
+ODDS_CACHE_SIZE = 256
+SOLVER_TOLERANCE = 1e-13  # relative residual; results are rounded to 12 places
+GMRES_RESTART = 50
+GMRES_MAX_RESTARTS = 20
+
+
+def transition_row(choices):
+    """Probability of moving to each next page from one page's choices"""
+    requirements = [requirement or 0 for _, _, requirement in choices]
+    rolls = []
+    for roll in range(1, DICE_SIDES + 1):
+        available = [index for index, requirement in enumerate(requirements) if requirement <= roll]
+        if available:
+            rolls.append(available)
+
+    row = defaultdict(float)
+    for available in rolls:
+        share = 1.0 / (len(rolls) * len(available))
+        for index in available:
+            row[choices[index][1]] += share
+    return dict(row)
+
+
+def solve_sparse(system, rhs):
+    """x with system @ x = rhs: GMRES, or a sparse LU solve when it does not converge"""
+    x, info = gmres(system, rhs, rtol=SOLVER_TOLERANCE, atol=0.0,
+                    restart=GMRES_RESTART, maxiter=GMRES_MAX_RESTARTS)
+    if info != 0:
+        x = spsolve(system.tocsc(), rhs, permc_spec='MMD_AT_PLUS_A')
+    return x
+
+
+def solve_component(component, rows, mass, weighted):
+    """Expected visits and step-weighted visits for the pages of one cycle
+
+    Solves x = m + P^T x and y = w + P^T (x + y) restricted to the component,
+    where m/w is the mass (and mass * steps taken) entering from outside.
+    """
+    position = {page_id: index for index, page_id in enumerate(component)}
+    sources, targets, probabilities = [], [], []
+    for page_id in component:
+        for next_page_id, probability in rows[page_id].items():
+            if next_page_id in position:
+                sources.append(position[page_id])
+                targets.append(position[next_page_id])
+                probabilities.append(probability)
+
+    size = len(component)
+    # Duplicate (target, source) entries are summed
+    transposed = csr_matrix((probabilities, (targets, sources)), shape=(size, size))
+    system = identity(size, format='csr') - transposed
+
+    visits = solve_sparse(system, np.array([mass.get(page_id, 0.0) for page_id in component]))
+    step_rhs = np.array([weighted.get(page_id, 0.0) for page_id in component]) + transposed @ visits
+    steps = solve_sparse(system, step_rhs)
+
+    return (
+        dict(zip(component, visits.tolist())),
+        dict(zip(component, steps.tolist())),
+    )
+
+
+def ending_odds(graph):
+    """Exact distribution over endings and expected path lengths"""
+    rows = {
+        page_id: {} if graph.is_ending(page_id) else transition_row(choices)
+        for page_id, choices in graph.choices.items()
+    }
+    # mass[p]: probability of entering p; weighted[p]: sum of prob * choices taken so far
+    mass = defaultdict(float)
+    weighted = defaultdict(float)
+    if graph.start_page_id in graph.pages:
+        mass[graph.start_page_id] = 1.0
+
+    reached = {}
+    dead_end = blocked = trapped = 0.0
+    expected_steps = 0.0
+
+    for component in reversed(strongly_connected_components(graph)):
+        if not any(mass.get(page_id) for page_id in component):
+            continue
+        members = set(component)
+        page_id = component[0]
+        if len(component) == 1 and page_id not in rows[page_id]:
+            visits = {page_id: mass[page_id]}
+            steps = {page_id: weighted[page_id]}
+        else:
+            leaves = any(
+                next_page_id not in members
+                for member in component
+                for next_page_id in rows[member]
+            )
+            if not leaves:
+                # a closed loop: whatever enters never reaches an ending
+                trapped += sum(mass.get(member, 0.0) for member in component)
+                continue
+            visits, steps = solve_component(component, rows, mass, weighted)
+
+        for page_id in component:
+            x = visits[page_id]
+            y = steps[page_id]
+            if graph.is_ending(page_id):
+                reached[page_id] = (x, y)
+                continue
+            if not rows[page_id]:
+                if graph.choices[page_id]:
+                    blocked += x
+                else:
+                    dead_end += x
+                continue
+            expected_steps += x
+            for next_page_id, probability in rows[page_id].items():
+                if next_page_id not in members:
+                    mass[next_page_id] += x * probability
+                    weighted[next_page_id] += (x + y) * probability
+
+    endings = []
+    for page_id, (is_ending, label) in graph.pages.items():
+        if not is_ending:
+            continue
+        probability, step_mass = reached.get(page_id, (0.0, 0.0))
+        endings.append({
+            'page_id': page_id,
+            'ending_label': label,
+            'probability': round(probability, 12),
+            'expected_steps': round(step_mass / probability, 6) if probability > 0 else None,
+        })
+
+    return {
+        'story_id': graph.story_id,
+        'model': {'choice': 'uniform', 'dice_sides': DICE_SIDES},
+        'endings': endings,
+        'dead_end_probability': round(dead_end, 12),
+        'blocked_probability': round(blocked, 12),
+        'trapped_probability': round(trapped, 12),
+        'expected_steps': round(expected_steps, 6) if trapped == 0 else None,
+    }
+
+
+_odds_cache = VersionedCache(ODDS_CACHE_SIZE)
+
+
+def story_ending_odds(story):
+    """Ending odds for a story, reusing the cached result for its current version"""
+    def compute():
+        result = ending_odds(StoryGraph.load(story))
+        result['version'] = story.version
+        return result
+    return _odds_cache.get_or_compute(story, compute)
@@ -0,0 +1,235 @@
+"""
+Request metrics for the API blueprint.
+
+Every api_bp request records its latency, the number and total time of the
+SQL statements it ran (counted with SQLAlchemy engine events) and the size
+of its response body, labelled by endpoint and method. The totals are kept
+in-process (one set per worker) and served in the Prometheus text format at
+GET /metrics. Each response also carries a Server-Timing header so the
+split between SQL and the rest is visible from a browser or curl.
+
+The same hooks tag every request with its X-Request-ID and, when TRACE_FILE
+is set, write its spans for cross-service traces (see app.tracing).
+
+The hooks cost a few microseconds per request and per statement; measure
+them with `python -m benchmarks.bench_metrics`. METRICS_ENABLED=false turns
+them off entirely.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import Response, current_app, request
+from sqlalchemy import event
+
+from app import db
+from app.tracing import MAX_SPANS, REQUEST_ID_HEADER, SpanFile, request_id_from, statement_preview
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}'
+        yield f'{name}_sum{format_labels(labels)} {self.sum:g}'
+        yield f'{name}_count{format_labels(labels)} {self.count}'
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+class Metrics:
+    """Per-endpoint request, SQL and response-size metrics for one process"""
+
+    HISTOGRAMS = {
+        'nahb_request_duration_seconds': ('Time spent handling the request', LATENCY_BUCKETS),
+        'nahb_request_sql_statements': ('SQL statements executed per request', STATEMENT_BUCKETS),
+        'nahb_request_sql_duration_seconds': ('Time spent in SQL per request', LATENCY_BUCKETS),
+        'nahb_response_size_bytes': ('Response body size', SIZE_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def record(self, endpoint, method, status, duration, statements, sql_seconds, size):
+        labels = (('endpoint', endpoint), ('method', method))
+        values = {
+            'nahb_request_duration_seconds': duration,
+            'nahb_request_sql_statements': statements,
+            'nahb_request_sql_duration_seconds': sql_seconds,
+            'nahb_response_size_bytes': size,
+        }
+        with self._lock:
+            for name, value in values.items():
+                histogram = self._histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self._histograms[(name, labels)] = Histogram(self.HISTOGRAMS[name][1])
+                histogram.observe(value)
+            key = labels + (('status', status),)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP nahb_requests_total Requests handled, by endpoint, method and status',
+                '# TYPE nahb_requests_total counter',
+            ]
+            lines += [f'nahb_requests_total{format_labels(labels)} {count}'
+                      for labels, count in sorted(self._requests.items())]
+            for name, (help_text, _) in self.HISTOGRAMS.items():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric == name:
+                        lines.extend(histogram.samples(name, labels))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+
+metrics = Metrics()
+
+
+# ============ HOOKS ============
+#
+# Per-request counters live in a ContextVar rather than flask.g: the cursor
+# events fire for every statement, and a ContextVar lookup is far cheaper
+# than going through the request-context proxies.
+
+class RequestStats:
+    __slots__ = ('started', 'wall_started', 'request_id', 'statements', 'sql_seconds',
+                 'statement_started', 'spans')
+
+    def __init__(self, request_id, traced=False):
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.request_id = request_id
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.statement_started = None
+        self.spans = [] if traced else None
+
+    def wall_time(self, perf_time):
+        return self.wall_started + (perf_time - self.started)
+
+
+_current = ContextVar('nahb_request_stats', default=None)
+span_file = None  # a tracing.SpanFile when TRACE_FILE is set
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.statement_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and stats.statement_started is not None:
+        elapsed = time.perf_counter() - stats.statement_started
+        stats.sql_seconds += elapsed
+        stats.statements += 1
+        if stats.spans is not None and len(stats.spans) < MAX_SPANS:
+            stats.spans.append({
+                'name': 'sql',
+                'start': stats.wall_time(stats.statement_started),
+                'ms': round(elapsed * 1000, 3),
+                'detail': statement_preview(statement),
+            })
+        stats.statement_started = None
+
+
+def start_request(blueprint_name):
+    if request.blueprint == blueprint_name:
+        _current.set(RequestStats(request_id_from(request.headers), traced=span_file is not None))
+
+
+def finish_request(response):
+    stats = _current.get()
+    if stats is None:
+        return response
+    duration = time.perf_counter() - stats.started
+    metrics.record(
+        request.endpoint or 'unknown', request.method, response.status_code,
+        duration, stats.statements, stats.sql_seconds, response.calculate_content_length() or 0
+    )
+    response.headers.add(
+        'Server-Timing',
+        f'sql;dur={stats.sql_seconds * 1000:.2f};desc="{stats.statements} statements", '
+        f'app;dur={duration * 1000:.2f}'
+    )
+    response.headers[REQUEST_ID_HEADER] = stats.request_id
+    if stats.spans is not None:
+        write_trace(stats, duration, response.status_code)
+    return response
+
+
+def end_request(exc):
+    """Drop the request's stats; teardown runs even when an error skipped after_request"""
+    _current.set(None)
+
+
+def write_trace(stats, duration, status):
+    try:
+        span_file.write({
+            'trace_id': stats.request_id,
+            'service': 'flask',
+            'name': f'{request.method} {request.path}',
+            'endpoint': request.endpoint,
+            'status': status,
+            'start': stats.wall_started,
+            'ms': round(duration * 1000, 3),
+            'sql_statements': stats.statements,
+            'sql_ms': round(stats.sql_seconds * 1000, 3),
+            'spans': stats.spans,
+            'dropped_spans': max(0, stats.statements - len(stats.spans)),
+        })
+    except OSError:
+        current_app.logger.exception('Writing trace failed')
+
+
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app, blueprint):
+    """Instrument blueprint's requests and add GET /metrics, unless METRICS_ENABLED is off"""
+    global span_file
+    if not app.config['METRICS_ENABLED']:
+        return
+    if app.config['TRACE_FILE']:
+        span_file = SpanFile(app.config['TRACE_FILE'])
+    app.before_request(lambda: start_request(blueprint.name))
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
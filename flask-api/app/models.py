@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.orm.attributes import set_committed_value
 
 class Story(db.Model):
     __tablename__ = 'stories'
@@ -7,16 +9,26 @@ class Story(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    status = db.Column(db.String(20), default='draft')  # draft, published, suspended
-    start_page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=True)
+    status = db.Column(db.String(20), default='draft', index=True)  # draft, published, suspended
+    start_page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=True, index=True)
     illustration_url = db.Column(db.String(500), nullable=True)  # Level 18
-    author_id = db.Column(db.Integer, nullable=True)  # Level 16+
+    author_id = db.Column(db.Integer, nullable=True, index=True)  # Level 16+
+    # Content version, bumped by touch_story() on any change to the story, its pages or choices
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Set by a soft delete; the story is hidden at once and purged in the background
+    deleted_at = db.Column(db.DateTime, nullable=True)
     
     # Relationships
     pages = db.relationship('Page', backref='story', lazy=True, foreign_keys='Page.story_id')
     
+    __table_args__ = (
+        # Keyset pagination of GET /stories?limit=..., newest first, with and without ?status=
+        db.Index('ix_stories_created_at_id', 'created_at', 'id'),
+        db.Index('ix_stories_status_created_at_id', 'status', 'created_at', 'id'),
+    )
+    
     def to_dict(self, include_pages=False):
         data = {
             'id': self.id,
@@ -26,11 +38,12 @@ class Story(db.Model):
             'start_page_id': self.start_page_id,
             'illustration_url': self.illustration_url,
             'author_id': self.author_id,
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         if include_pages:
-            data['pages'] = [page.to_dict(include_choices=True) for page in self.pages]
+            data['pages'] = [page.to_dict(include_choices=True) for page in load_story_pages(self.id)]
         return data
 
 
@@ -38,12 +51,13 @@ class Page(db.Model):
     __tablename__ = 'pages'
     
     id = db.Column(db.Integer, primary_key=True)
-    story_id = db.Column(db.Integer, db.ForeignKey('stories.id'), nullable=False)
+    story_id = db.Column(db.Integer, db.ForeignKey('stories.id'), nullable=False, index=True)
     text = db.Column(db.Text, nullable=False)
     is_ending = db.Column(db.Boolean, default=False)
     ending_label = db.Column(db.String(100), nullable=True)  # Level 13
     illustration_url = db.Column(db.String(500), nullable=True)  # Level 18
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     choices = db.relationship('Choice', backref='page', lazy=True, foreign_keys='Choice.page_id')
@@ -56,7 +70,8 @@ class Page(db.Model):
             'is_ending': self.is_ending,
             'ending_label': self.ending_label,
             'illustration_url': self.illustration_url,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         if include_choices:
             data['choices'] = [choice.to_dict() for choice in self.choices]
@@ -67,11 +82,12 @@ class Choice(db.Model):
     __tablename__ = 'choices'
     
     id = db.Column(db.Integer, primary_key=True)
-    page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=False)
+    page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=False, index=True)
     text = db.Column(db.String(500), nullable=False)
-    next_page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=False)
+    next_page_id = db.Column(db.Integer, db.ForeignKey('pages.id'), nullable=False, index=True)
     dice_requirement = db.Column(db.Integer, nullable=True)  # Level 18: random events
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship to next page
     next_page = db.relationship('Page', foreign_keys=[next_page_id])
@@ -83,5 +99,66 @@ class Choice(db.Model):
             'text': self.text,
             'next_page_id': self.next_page_id,
             'dice_requirement': self.dice_requirement,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+def touch_story(story_id):
+    """Bump a story's content version; call before committing any content change"""
+    Story.query.filter_by(id=story_id).update(
+        {Story.version: Story.version + 1, Story.updated_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+
+
+def load_story_pages(story_id):
+    """Load every page of a story with its choices already populated.
+
+    Runs exactly two queries regardless of story size: one for the pages and
+    one for all choices of those pages. The choices are attached to
+    ``Page.choices`` as committed state, so serializing the result never
+    triggers a lazy load.
+    """
+    pages = Page.query.filter_by(story_id=story_id).order_by(Page.id).all()
+    choices = (
+        Choice.query
+        .join(Page, Choice.page_id == Page.id)
+        .filter(Page.story_id == story_id)
+        .order_by(Choice.id)
+        .all()
+    )
+
+    choices_by_page = {}
+    for choice in choices:
+        choices_by_page.setdefault(choice.page_id, []).append(choice)
+
+    for page in pages:
+        set_committed_value(page, 'choices', choices_by_page.get(page.id, []))
+
+    return pages
+
+
+def insert_story_pages(story_id, rows):
+    """Bulk-insert the pages of a story that has none yet; returns their IDs in row order.
+
+    One executemany INSERT plus one SELECT for the IDs. An INSERT ... RETURNING
+    with sort_by_parameter_order runs once per row on SQLite, and a
+    new story's pages get ascending IDs in the order they were inserted.
+    """
+    db.session.execute(
+        insert(Page), [dict(row, story_id=story_id) for row in rows],
+        execution_options={'render_nulls': True},
+    )
+    return db.session.scalars(select(Page.id).where(Page.story_id == story_id).order_by(Page.id)).all()
+
+
+def insert_choices(rows):
+    """Bulk-insert choices with a single executemany INSERT.
+
+    render_nulls keeps rows with and without a dice_requirement in one batch;
+    by default the ORM leaves None values out and splits the rows into a
+    separate INSERT for every change of column set.
+    """
+    if rows:
+        db.session.execute(insert(Choice), rows, execution_options={'render_nulls': True})
@@ -0,0 +1,130 @@
+"""
+On-demand profiling of single API requests.
+
+Off unless PROFILING_ENABLED is true and PROFILE_SECRET is set. A request
+carrying `X-Profile: cpu` (or `memory`) and `X-Profile-Key: <PROFILE_SECRET>`
+is run under cProfile (or tracemalloc), and the result is dumped to
+PROFILE_DIR as flask-<time>-<mode>-<method>-<path>.pstats (or .tracemalloc).
+Only the newest PROFILE_KEEP dumps are kept. The response names its dump in
+X-Profile-File, and `python manage.py summarize_profiles` in django-app
+reads both services' dumps.
+
+One request per process is profiled at a time; a profiling request that
+arrives while another is being captured is served normally.
+"""
+
+import cProfile
+import hmac
+import os
+import re
+import threading
+import tracemalloc
+from datetime import datetime
+
+SERVICE = 'flask'
+MODES = {'cpu': 'pstats', 'memory': 'tracemalloc'}
+
+
+class ProfilingMiddleware:
+    """WSGI wrapper that captures a profile of requests asking for one"""
+
+    def __init__(self, wsgi_app, secret, directory, keep=50, frames=10):
+        self.wsgi_app = wsgi_app
+        self.secret = secret
+        self.directory = directory
+        self.keep = keep
+        self.frames = frames
+        self._lock = threading.Lock()
+
+    def requested_mode(self, environ):
+        mode = environ.get('HTTP_X_PROFILE', '').lower()
+        key = environ.get('HTTP_X_PROFILE_KEY', '')
+        if mode in MODES and hmac.compare_digest(key.encode(), self.secret.encode()):
+            return mode
+        return None
+
+    def __call__(self, environ, start_response):
+        mode = self.requested_mode(environ)
+        if mode is None or not self._lock.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self.profile(mode, environ, start_response)
+        finally:
+            self._lock.release()
+
+    def profile(self, mode, environ, start_response):
+        filename = dump_name(mode, environ['REQUEST_METHOD'], environ.get('PATH_INFO', '/'))
+        path = os.path.join(self.directory, filename)
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['args'] = (status, headers, exc_info)
+
+        def run():
+            # The body is drained inside the profiler so streamed responses count too
+            app_iter = self.wsgi_app(environ, capture_start_response)
+            try:
+                return [b''.join(app_iter)]
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+
+        extra_headers = [('X-Profile-File', filename)]
+        if mode == 'cpu':
+            profiler = cProfile.Profile()
+            body = profiler.runcall(run)
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(path)
+        else:
+            already_tracing = tracemalloc.is_tracing()
+            if not already_tracing:
+                tracemalloc.start(self.frames)
+            tracemalloc.reset_peak()
+            try:
+                body = run()
+            finally:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if not already_tracing:
+                    tracemalloc.stop()
+            os.makedirs(self.directory, exist_ok=True)
+            snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).dump(path)
+            extra_headers.append(('X-Profile-Peak-KB', str(round(peak / 1024))))
+        rotate(self.directory, self.keep)
+
+        status, headers, exc_info = captured['args']
+        start_response(status, list(headers) + extra_headers, exc_info)
+        return body
+
+
+def dump_name(mode, method, path):
+    """A file name in the format summarize_profiles parses (gameplay.profiling.DUMP_NAME)"""
+    slug = re.sub(r'\W+', '_', path).strip('_')[:60] or 'root'
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return f'{SERVICE}-{stamp}-{mode}-{method}-{slug}.{MODES[mode]}'
+
+
+def rotate(directory, keep):
+    """Delete this service's oldest dumps beyond the newest keep"""
+    dumps = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith(f'{SERVICE}-') and name.rsplit('.', 1)[-1] in MODES.values()
+    )
+    # Not dumps[:-keep]: with keep 0 that slice is empty and nothing would go
+    for name in dumps[:max(0, len(dumps) - keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass  # another worker rotated it first
+
+
+def init_app(app):
+    """Wrap the WSGI app in ProfilingMiddleware when profiling is enabled and has a secret"""
+    if not (app.config['PROFILING_ENABLED'] and app.config['PROFILE_SECRET']):
+        return
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        secret=app.config['PROFILE_SECRET'],
+        directory=app.config['PROFILE_DIR'],
+        keep=app.config['PROFILE_KEEP'],
+    )
@@ -1,10 +1,37 @@
+import base64
+import hashlib
+from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from app import db
-from app.models import Story, Page, Choice
+from app.models import Story, Page, Choice, insert_choices, insert_story_pages, load_story_pages, touch_story
+from app.deletion import delete_story_rows, delete_page_rows, soft_delete_story
+from app.graph import analyze_story
+from app.markov import story_ending_odds
+from app import search
 from functools import wraps
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import selectinload
 
 api_bp = Blueprint('api', __name__)
 
+# Upper bound on ?ids= batch lookups, keeps each IN (...) list reasonable
+MAX_BATCH_IDS = 500
+
+# Deepest level GET /pages/<id>?expand=next will follow
+MAX_EXPAND_DEPTH = 2
+
+# Largest page size GET /stories/search will return
+MAX_SEARCH_PER_PAGE = 100
+
+# Largest page GET /stories?limit= will return
+MAX_LIST_LIMIT = 500
+
+# Story keys that ?fields= may select
+STORY_FIELDS = {
+    'id', 'title', 'description', 'status', 'start_page_id', 'illustration_url',
+    'author_id', 'version', 'created_at', 'updated_at',
+}
+
 
 # Level 16: API Key authentication decorator
 def require_api_key(f):
@@ -17,32 +44,197 @@ def require_api_key(f):
     return decorated_function
 
 
+def parse_id_list(raw):
+    """Parse a comma-separated ?ids= value into a list of unique ints.
+
+    Returns None when the value is malformed or exceeds MAX_BATCH_IDS.
+    """
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not (part.isascii() and part.isdigit()):
+            return None  # isdigit() alone accepts digits int() rejects, like '²'
+        value = int(part)
+        if value not in ids:
+            ids.append(value)
+    if len(ids) > MAX_BATCH_IDS:
+        return None
+    return ids
+
+
+def get_story_or_404(story_id):
+    """Load a story that has not been soft-deleted, or abort with 404"""
+    return Story.query.filter_by(id=story_id, deleted_at=None).first_or_404()
+
+
+def conditional_response(etag, build, published):
+    """Return 304 if the client's If-None-Match holds etag, otherwise build() the response.
+
+    build is only called on a miss, so revalidating an unchanged resource
+    skips loading and serializing it. Published content may be cached by
+    shared caches for PUBLISHED_MAX_AGE seconds; anything else must be
+    revalidated on every use.
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if published:
+        max_age = current_app.config['PUBLISHED_MAX_AGE']
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, stale-while-revalidate={max_age * 10}'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # ============ READING ENDPOINTS (Public) ============
 
+def encode_cursor(story):
+    """Opaque keyset cursor pointing just past story in (created_at, id) DESC order"""
+    raw = f'{story.created_at.isoformat()}|{story.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from encode_cursor(), or None if the cursor is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, story_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(story_id)
+    except ValueError:
+        return None
+
+
+def parse_fields(raw):
+    """Set of story fields requested with ?fields=, always including id; None if unknown"""
+    fields = {name.strip() for name in raw.split(',') if name.strip()} | {'id'}
+    return fields if fields <= STORY_FIELDS else None
+
+
 @api_bp.route('/stories', methods=['GET'])
 def get_stories():
-    """Get all stories, optionally filtered by status"""
+    """Get stories, optionally filtered by status, author_id or a batch of ?ids=
+
+    ?count=1 returns only {'count': n}. With ?limit=N the stories come a page
+    at a time, newest first: {'stories': [...], 'next_cursor': ...}, where
+    next_cursor is passed back as ?cursor= for the following page.
+    """
     status = request.args.get('status')
-    
-    query = Story.query
+    author_id = request.args.get('author_id', type=int)
+    
+    query = Story.query.filter(Story.deleted_at.is_(None))
+    if 'ids' in request.args:
+        ids = parse_id_list(request.args['ids'])
+        if ids is None:
+            return jsonify({'error': f'ids must be a comma-separated list of at most {MAX_BATCH_IDS} integers'}), 400
+        query = query.filter(Story.id.in_(ids))
     if status:
         query = query.filter_by(status=status)
+    if 'author_id' in request.args:
+        if author_id is None:
+            return jsonify({'error': 'author_id must be an integer'}), 400
+        query = query.filter_by(author_id=author_id)
+    
+    if request.args.get('count', '').lower() in ('1', 'true', 'yes'):
+        return jsonify({'count': query.with_entities(func.count(Story.id)).scalar()})
+    
+    fields = None
+    if 'fields' in request.args:
+        fields = parse_fields(request.args['fields'])
+        if fields is None:
+            return jsonify({'error': f'fields must be a comma-separated subset of {sorted(STORY_FIELDS)}'}), 400
+    
+    def serialize(stories):
+        if fields is None:
+            return [story.to_dict() for story in stories]
+        return [{key: value for key, value in story.to_dict().items() if key in fields} for story in stories]
+    
+    if 'limit' in request.args:
+        limit = request.args.get('limit', type=int)
+        if limit is None or not 1 <= limit <= MAX_LIST_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MAX_LIST_LIMIT}'}), 400
+        if 'cursor' in request.args:
+            position = decode_cursor(request.args['cursor'])
+            if position is None:
+                return jsonify({'error': 'invalid cursor'}), 400
+            created_at, story_id = position
+            query = query.filter(tuple_(Story.created_at, Story.id) < (created_at, story_id))
+        rows = query.order_by(Story.created_at.desc(), Story.id.desc()).limit(limit + 1).all()
+        stories, more = rows[:limit], len(rows) > limit
+        digest = hashlib.sha1(repr(
+            (request.query_string, [(story.id, story.version) for story in rows])
+        ).encode()).hexdigest()
+        return conditional_response(
+            f'stories-{digest}',
+            lambda: jsonify({
+                'stories': serialize(stories),
+                'next_cursor': encode_cursor(stories[-1]) if more else None,
+            }),
+            published=status == 'published'
+        )
+    
+    # The list changes whenever a story is added, removed or gets a new version
+    versions = query.with_entities(Story.id, Story.version).order_by(Story.id).all()
+    digest = hashlib.sha1(repr((request.query_string, versions)).encode()).hexdigest()
+    
+    return conditional_response(
+        f'stories-{digest}',
+        lambda: jsonify(serialize(query.all())),
+        published=status == 'published'
+    )
+
+
+@api_bp.route('/stories/search', methods=['GET'])
+def search_stories():
+    """Full-text search over story titles and descriptions (and page text with ?pages=1)"""
+    query = request.args.get('q', '').strip()
+    status = request.args.get('status', 'published')
+    include_pages = request.args.get('pages', '').lower() in ('1', 'true', 'yes')
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    if page < 1 or not 1 <= per_page <= MAX_SEARCH_PER_PAGE:
+        return jsonify({'error': f'page must be >= 1 and per_page between 1 and {MAX_SEARCH_PER_PAGE}'}), 400
+    
+    stories, scores, total = search.search_stories(
+        query, status=status, include_pages=include_pages,
+        limit=per_page, offset=(page - 1) * per_page
+    )
+    results = []
+    for story in stories:
+        data = story.to_dict()
+        data['score'] = scores[story.id]
+        results.append(data)
     
-    stories = query.all()
-    return jsonify([story.to_dict() for story in stories])
+    return jsonify({
+        'query': query,
+        'results': results,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'has_more': page * per_page < total,
+    })
 
 
 @api_bp.route('/stories/<int:story_id>', methods=['GET'])
 def get_story(story_id):
-    """Get a single story by ID"""
-    story = Story.query.get_or_404(story_id)
-    return jsonify(story.to_dict(include_pages=True))
+    """Get a single story by ID, with all pages and choices in a fixed number of queries"""
+    story = get_story_or_404(story_id)
+    return conditional_response(
+        f'story-{story.id}-v{story.version}',
+        lambda: jsonify(story.to_dict(include_pages=True)),
+        published=story.status == 'published'
+    )
 
 
 @api_bp.route('/stories/<int:story_id>/start', methods=['GET'])
 def get_story_start(story_id):
     """Get the starting page of a story"""
-    story = Story.query.get_or_404(story_id)
+    story = get_story_or_404(story_id)
     
     if not story.start_page_id:
         return jsonify({'error': 'Story has no start page'}), 400
@@ -51,23 +243,108 @@ def get_story_start(story_id):
     if not start_page:
         return jsonify({'error': 'Start page not found'}), 404
     
-    return jsonify(start_page.to_dict())
+    return conditional_response(
+        f'start-{story.id}-v{story.version}',
+        lambda: jsonify(start_page.to_dict()),
+        published=story.status == 'published'
+    )
+
+
+@api_bp.route('/pages', methods=['GET'])
+def get_pages():
+    """Get a batch of pages with their choices, e.g. /pages?ids=1,2,3"""
+    ids = parse_id_list(request.args.get('ids', ''))
+    if ids is None:
+        return jsonify({'error': f'ids must be a comma-separated list of at most {MAX_BATCH_IDS} integers'}), 400
+    if not ids:
+        return jsonify([])
+    
+    pages = (
+        Page.query
+        .join(Story, Page.story_id == Story.id)
+        .filter(Page.id.in_(ids), Story.deleted_at.is_(None))
+        .options(selectinload(Page.choices))
+        .all()
+    )
+    return jsonify([page.to_dict() for page in pages])
+
+
+def load_next_pages(page, depth):
+    """Pages reachable from a page within `depth` choices, two queries per level"""
+    found = {page.id: page}
+    frontier = {choice.next_page_id for choice in page.choices}
+    for _ in range(depth):
+        frontier -= found.keys()
+        if not frontier:
+            break
+        level = (
+            Page.query.options(selectinload(Page.choices))
+            .filter(Page.id.in_(frontier), Page.story_id == page.story_id)
+            .order_by(Page.id)
+            .all()
+        )
+        found.update((next_page.id, next_page) for next_page in level)
+        frontier = {choice.next_page_id for next_page in level for choice in next_page.choices}
+    del found[page.id]
+    return list(found.values())
 
 
 @api_bp.route('/pages/<int:page_id>', methods=['GET'])
 def get_page(page_id):
-    """Get a page with its choices"""
-    page = Page.query.get_or_404(page_id)
-    return jsonify(page.to_dict())
+    """Get a page with its choices
+
+    ?expand=next adds the pages its choices lead to as `next_pages`, and
+    &depth=2 (at most MAX_EXPAND_DEPTH) also the pages those lead to.
+    """
+    expand = request.args.get('expand')
+    if expand not in (None, 'next'):
+        return jsonify({'error': "expand only supports 'next'"}), 400
+    depth = request.args.get('depth', 1, type=int)
+    if expand and not 1 <= depth <= MAX_EXPAND_DEPTH:
+        return jsonify({'error': f'depth must be between 1 and {MAX_EXPAND_DEPTH}'}), 400
+
+    page, version, status = (
+        db.session.query(Page, Story.version, Story.status)
+        .join(Story, Page.story_id == Story.id)
+        .options(selectinload(Page.choices))
+        .filter(Page.id == page_id, Story.deleted_at.is_(None))
+        .first_or_404()
+    )
+
+    if not expand:
+        return conditional_response(
+            f'page-{page.id}-v{version}',
+            lambda: jsonify(page.to_dict()),
+            published=status == 'published'
+        )
+
+    def build():
+        data = page.to_dict()
+        data['next_pages'] = [next_page.to_dict() for next_page in load_next_pages(page, depth)]
+        return jsonify(data)
+
+    return conditional_response(
+        f'page-{page.id}-v{version}-next{depth}',
+        build,
+        published=status == 'published'
+    )
 
 
 # Level 18: Get story tree for visualization
 @api_bp.route('/stories/<int:story_id>/tree', methods=['GET'])
 def get_story_tree(story_id):
     """Get the full story tree structure for visualization"""
-    story = Story.query.get_or_404(story_id)
-    
-    pages = Page.query.filter_by(story_id=story_id).all()
+    story = get_story_or_404(story_id)
+    return conditional_response(
+        f'tree-{story.id}-v{story.version}',
+        lambda: jsonify(build_story_tree(story)),
+        published=story.status == 'published'
+    )
+
+
+def build_story_tree(story):
+    """Build the nodes and edges payload for a story tree"""
+    pages = load_story_pages(story.id)
     
     # Build nodes and edges for graph visualization
     nodes = []
@@ -89,11 +366,118 @@ def get_story_tree(story_id):
                 'label': choice.text[:30] + '...' if len(choice.text) > 30 else choice.text
             })
     
-    return jsonify({
-        'story_id': story_id,
+    return {
+        'story_id': story.id,
         'title': story.title,
         'nodes': nodes,
         'edges': edges
+    }
+
+
+@api_bp.route('/stories/<int:story_id>/analysis', methods=['GET'])
+def get_story_analysis(story_id):
+    """Report unreachable pages, dead ends, cycles, ending depths and branching"""
+    story = get_story_or_404(story_id)
+    return conditional_response(
+        f'analysis-{story.id}-v{story.version}',
+        lambda: jsonify(analyze_story(story)),
+        published=story.status == 'published'
+    )
+
+
+@api_bp.route('/stories/<int:story_id>/odds', methods=['GET'])
+def get_story_odds(story_id):
+    """Predicted probability of each ending and expected path length"""
+    story = get_story_or_404(story_id)
+    return conditional_response(
+        f'odds-{story.id}-v{story.version}',
+        lambda: jsonify(story_ending_odds(story)),
+        published=story.status == 'published'
+    )
+
+
+@api_bp.route('/stories/<int:story_id>/endings', methods=['GET'])
+def get_story_endings(story_id):
+    """Every ending page of a story (ID, label, illustration) in one response"""
+    story = get_story_or_404(story_id)
+
+    def build():
+        rows = db.session.query(Page.id, Page.ending_label, Page.illustration_url).filter(
+            Page.story_id == story.id, Page.is_ending.is_(True)
+        ).order_by(Page.id).all()
+        return jsonify({
+            'story_id': story.id,
+            'version': story.version,
+            'endings': [
+                {'id': page_id, 'ending_label': label, 'illustration_url': illustration_url}
+                for page_id, label, illustration_url in rows
+            ],
+        })
+
+    return conditional_response(
+        f'endings-{story.id}-v{story.version}',
+        build,
+        published=story.status == 'published'
+    )
+
+
+# ============ PLAY ENDPOINT (Public) ============
+
+def step_error(message, code, status, **extra):
+    """Error body for /step; `code` lets the caller tell the failures apart"""
+    return jsonify({'error': message, 'code': code, **extra}), status
+
+
+@api_bp.route('/stories/<int:story_id>/step', methods=['POST'])
+def story_step(story_id):
+    """Validate one move through a story and return where it lands
+
+    Body: {"page_id": current page, "choice_id": chosen choice, "dice_roll": 1-6}.
+    Without a choice_id this just loads page_id (or the start page when that
+    is omitted too), which is how a play starts or resumes.
+    """
+    data = request.get_json(silent=True) or {}
+    story = get_story_or_404(story_id)
+    if story.status == 'suspended':
+        return step_error('Story is suspended', 'suspended', 403)
+
+    try:
+        page_id = int(data.get('page_id') or story.start_page_id or 0)
+        choice_id = int(data['choice_id']) if data.get('choice_id') is not None else None
+        dice_roll = int(data.get('dice_roll') or 0)
+    except (TypeError, ValueError):
+        return step_error('page_id, choice_id and dice_roll must be integers', 'bad_request', 400)
+    if not page_id:
+        return step_error('Story has no start page', 'no_start_page', 400)
+
+    choice = None
+    if choice_id is not None:
+        choice = (
+            Choice.query.join(Page, Choice.page_id == Page.id)
+            .filter(Choice.id == choice_id, Choice.page_id == page_id, Page.story_id == story.id)
+            .first()
+        )
+        if not choice:
+            return step_error('Choice is not available on this page', 'invalid_choice', 422)
+        if choice.dice_requirement and dice_roll < choice.dice_requirement:
+            return step_error(
+                f'You need to roll at least {choice.dice_requirement} to choose this option!',
+                'dice_required', 422, dice_requirement=choice.dice_requirement
+            )
+        page_id = choice.next_page_id
+
+    page = (
+        Page.query.options(selectinload(Page.choices))
+        .filter(Page.id == page_id, Page.story_id == story.id)
+        .first()
+    )
+    if not page:
+        return step_error('Page not found in this story', 'invalid_page', 404)
+
+    return jsonify({
+        'story': story.to_dict(),
+        'page': page.to_dict(),
+        'choice': choice.to_dict() if choice else None,
     })
 
 
@@ -122,11 +506,118 @@ def create_story():
     return jsonify(story.to_dict()), 201
 
 
+def valid_dice_requirement(value):
+    """None (no roll needed) or an integer 1-6; bools are ints in Python and are refused"""
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and 1 <= value <= 6)
+
+
+def validate_story_document(data):
+    """Check an import document, returning an error message or None"""
+    if not isinstance(data, dict) or not data.get('title'):
+        return 'Title is required'
+    
+    pages = data.get('pages')
+    if not isinstance(pages, list) or not pages:
+        return 'pages must be a non-empty list'
+    if len(pages) > current_app.config['MAX_IMPORT_PAGES']:
+        return f"A story can import at most {current_app.config['MAX_IMPORT_PAGES']} pages"
+    
+    keys = set()
+    for index, page in enumerate(pages):
+        if not isinstance(page, dict) or not page.get('text'):
+            return f'pages[{index}]: text is required'
+        key = page.get('key')
+        if not isinstance(key, str) or not key:
+            return f'pages[{index}]: key must be a non-empty string'
+        if key in keys:
+            return f'pages[{index}]: duplicate key {key!r}'
+        keys.add(key)
+    
+    for page in pages:
+        for index, choice in enumerate(page.get('choices') or []):
+            where = f"pages[{page['key']!r}].choices[{index}]"
+            if not isinstance(choice, dict) or not choice.get('text'):
+                return f'{where}: text is required'
+            if choice.get('next_page') not in keys:
+                return f"{where}: unknown next_page {choice.get('next_page')!r}"
+            if not valid_dice_requirement(choice.get('dice_requirement')):
+                return f'{where}: dice_requirement must be between 1 and 6'
+    
+    start = data.get('start_page')
+    if start is not None and start not in keys:
+        return f'unknown start_page {start!r}'
+    return None
+
+
+@api_bp.route('/stories/import', methods=['POST'])
+@require_api_key
+def import_story():
+    """Create a story with all its pages and choices in one transaction.
+    
+    Pages are identified by client-side ``key`` strings, which choices use
+    in ``next_page``. Pages and choices are inserted with one executemany
+    INSERT each, and the new page IDs are read back with one SELECT; the
+    response maps every key to its new page ID.
+    """
+    data = request.get_json(silent=True)
+    error = validate_story_document(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    pages = data['pages']
+    story = Story(
+        title=data['title'],
+        description=data.get('description', ''),
+        status=data.get('status', 'draft'),
+        author_id=data.get('author_id'),
+        illustration_url=data.get('illustration_url')
+    )
+    
+    try:
+        db.session.add(story)
+        db.session.flush()
+        
+        new_ids = insert_story_pages(story.id, [
+            {
+                'text': page['text'],
+                'is_ending': bool(page.get('is_ending', False)),
+                'ending_label': page.get('ending_label'),
+                'illustration_url': page.get('illustration_url'),
+            }
+            for page in pages
+        ])
+        page_ids = {page['key']: page_id for page, page_id in zip(pages, new_ids)}
+        
+        choice_rows = [
+            {
+                'page_id': page_ids[page['key']],
+                'text': choice['text'],
+                'next_page_id': page_ids[choice['next_page']],
+                'dice_requirement': choice.get('dice_requirement'),
+            }
+            for page in pages
+            for choice in page.get('choices') or []
+        ]
+        insert_choices(choice_rows)
+        
+        story.start_page_id = page_ids[data.get('start_page') or pages[0]['key']]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return jsonify({
+        'story': story.to_dict(),
+        'page_ids': page_ids,
+        'choice_count': len(choice_rows)
+    }), 201
+
+
 @api_bp.route('/stories/<int:story_id>', methods=['PUT'])
 @require_api_key
 def update_story(story_id):
     """Update an existing story"""
-    story = Story.query.get_or_404(story_id)
+    story = get_story_or_404(story_id)
     data = request.get_json()
     
     if 'title' in data:
@@ -140,6 +631,7 @@ def update_story(story_id):
     if 'illustration_url' in data:
         story.illustration_url = data['illustration_url']
     
+    touch_story(story_id)
     db.session.commit()
     
     return jsonify(story.to_dict())
@@ -148,28 +640,37 @@ def update_story(story_id):
 @api_bp.route('/stories/<int:story_id>', methods=['DELETE'])
 @require_api_key
 def delete_story(story_id):
-    """Delete a story and all its pages and choices"""
-    story = Story.query.get_or_404(story_id)
-    
-    # Delete all choices first
-    for page in story.pages:
-        Choice.query.filter_by(page_id=page.id).delete()
-    
-    # Delete all pages
-    Page.query.filter_by(story_id=story_id).delete()
-    
-    # Delete the story
-    db.session.delete(story)
+    """Delete a story and all its pages and choices
+    
+    With ?mode=soft the story disappears immediately and its rows are
+    purged in the background, so deleting a huge story returns at once.
+    """
+    story = get_story_or_404(story_id)
+    page_ids = [row.id for row in db.session.query(Page.id).filter_by(story_id=story_id)]
+    
+    if request.args.get('mode') == 'soft':
+        soft_delete_story(story)
+        return jsonify({
+            'message': 'Story scheduled for deletion',
+            'story_id': story_id,
+            'page_ids': page_ids
+        }), 202
+    
+    delete_story_rows(story_id)
     db.session.commit()
     
-    return jsonify({'message': 'Story deleted successfully'}), 200
+    return jsonify({
+        'message': 'Story deleted successfully',
+        'story_id': story_id,
+        'page_ids': page_ids
+    }), 200
 
 
 @api_bp.route('/stories/<int:story_id>/pages', methods=['POST'])
 @require_api_key
 def create_page(story_id):
     """Create a new page for a story"""
-    story = Story.query.get_or_404(story_id)
+    story = get_story_or_404(story_id)
     data = request.get_json()
     
     if not data or 'text' not in data:
@@ -184,12 +685,14 @@ def create_page(story_id):
     )
     
     db.session.add(page)
-    db.session.commit()
+    db.session.flush()
     
     # If this is the first page and no start page is set, set it as start
     if not story.start_page_id:
         story.start_page_id = page.id
-        db.session.commit()
+    
+    touch_story(story_id)
+    db.session.commit()
     
     return jsonify(page.to_dict()), 201
 
@@ -210,6 +713,7 @@ def update_page(page_id):
     if 'illustration_url' in data:
         page.illustration_url = data['illustration_url']
     
+    touch_story(page.story_id)
     db.session.commit()
     
     return jsonify(page.to_dict())
@@ -220,17 +724,25 @@ def update_page(page_id):
 def delete_page(page_id):
     """Delete a page and its choices"""
     page = Page.query.get_or_404(page_id)
+    story_id = page.story_id
     
-    # Delete all choices from this page
-    Choice.query.filter_by(page_id=page_id).delete()
-    
-    # Delete all choices pointing to this page
-    Choice.query.filter_by(next_page_id=page_id).delete()
+    # Pages whose choices point here lose those choices
+    affected_page_ids = [
+        row.page_id for row in
+        db.session.query(Choice.page_id).filter_by(next_page_id=page_id).distinct()
+    ]
     
-    db.session.delete(page)
+    # Delete the page with its own choices and all choices pointing to it
+    delete_page_rows(page_id)
+    touch_story(story_id)
     db.session.commit()
     
-    return jsonify({'message': 'Page deleted successfully'}), 200
+    return jsonify({
+        'message': 'Page deleted successfully',
+        'story_id': story_id,
+        'page_id': page_id,
+        'affected_page_ids': affected_page_ids
+    }), 200
 
 
 @api_bp.route('/pages/<int:page_id>/choices', methods=['POST'])
@@ -242,6 +754,8 @@ def create_choice(page_id):
     
     if not data or 'text' not in data or 'next_page_id' not in data:
         return jsonify({'error': 'Text and next_page_id are required'}), 400
+    if not valid_dice_requirement(data.get('dice_requirement')):
+        return jsonify({'error': 'dice_requirement must be between 1 and 6'}), 400
     
     # Verify next page exists and belongs to same story
     next_page = Page.query.get(data['next_page_id'])
@@ -256,9 +770,12 @@ def create_choice(page_id):
     )
     
     db.session.add(choice)
+    touch_story(page.story_id)
     db.session.commit()
     
-    return jsonify(choice.to_dict()), 201
+    data = choice.to_dict()
+    data['story_id'] = page.story_id
+    return jsonify(data), 201
 
 
 @api_bp.route('/choices/<int:choice_id>', methods=['PUT'])
@@ -268,6 +785,8 @@ def update_choice(choice_id):
     choice = Choice.query.get_or_404(choice_id)
     data = request.get_json()
     
+    if 'dice_requirement' in data and not valid_dice_requirement(data['dice_requirement']):
+        return jsonify({'error': 'dice_requirement must be between 1 and 6'}), 400
     if 'text' in data:
         choice.text = data['text']
     if 'next_page_id' in data:
@@ -275,9 +794,12 @@ def update_choice(choice_id):
     if 'dice_requirement' in data:
         choice.dice_requirement = data['dice_requirement']
     
+    touch_story(choice.page.story_id)
     db.session.commit()
     
-    return jsonify(choice.to_dict())
+    data = choice.to_dict()
+    data['story_id'] = choice.page.story_id
+    return jsonify(data)
 
 
 @api_bp.route('/choices/<int:choice_id>', methods=['DELETE'])
@@ -285,11 +807,18 @@ def update_choice(choice_id):
 def delete_choice(choice_id):
     """Delete a choice"""
     choice = Choice.query.get_or_404(choice_id)
+    page_id = choice.page_id
+    story_id = choice.page.story_id
     
     db.session.delete(choice)
+    touch_story(story_id)
     db.session.commit()
     
-    return jsonify({'message': 'Choice deleted successfully'}), 200
+    return jsonify({
+        'message': 'Choice deleted successfully',
+        'page_id': page_id,
+        'story_id': story_id
+    }), 200
 
 
 # Health check endpoint
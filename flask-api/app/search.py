@@ -0,0 +1,167 @@
+"""
+Full-text story search.
+
+Two SQLite FTS5 indexes mirror the searchable columns: story_search over
+stories(title, description) and page_search over pages(text, ending_label).
+Both are external-content tables kept in sync by triggers, so every write
+path (the ORM endpoints, bulk import inserts and the set-based deletes in
+app.deletion) updates the index in the same transaction, with no extra
+statements in the routes. Results are ranked with bm25(); title hits weigh
+more than description hits, and page text only counts when asked for.
+
+Non-SQLite databases have no FTS5; they fall back to a LIKE scan ranked by
+story id, which keeps the endpoint usable but not fast.
+"""
+
+import re
+
+import click
+from sqlalchemy import text
+
+from app import db
+from app.models import Story
+
+# bm25() column weights: (title, description) and (text, ending_label)
+STORY_WEIGHTS = (10.0, 1.0)
+PAGE_WEIGHTS = (1.0, 2.0)
+MAX_TERMS = 8
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS story_search USING fts5("
+    "title, description, content='stories', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS page_search USING fts5("
+    "text, ending_label, story_id UNINDEXED, content='pages', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER IF NOT EXISTS stories_search_insert AFTER INSERT ON stories BEGIN "
+    "INSERT INTO story_search(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS stories_search_delete AFTER DELETE ON stories BEGIN "
+    "INSERT INTO story_search(story_search, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS stories_search_update AFTER UPDATE OF title, description ON stories BEGIN "
+    "INSERT INTO story_search(story_search, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO story_search(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+
+    "CREATE TRIGGER IF NOT EXISTS pages_search_insert AFTER INSERT ON pages BEGIN "
+    "INSERT INTO page_search(rowid, text, ending_label, story_id) "
+    "VALUES (new.id, new.text, new.ending_label, new.story_id); END",
+    "CREATE TRIGGER IF NOT EXISTS pages_search_delete AFTER DELETE ON pages BEGIN "
+    "INSERT INTO page_search(page_search, rowid, text, ending_label, story_id) "
+    "VALUES ('delete', old.id, old.text, old.ending_label, old.story_id); END",
+    "CREATE TRIGGER IF NOT EXISTS pages_search_update AFTER UPDATE OF text, ending_label ON pages BEGIN "
+    "INSERT INTO page_search(page_search, rowid, text, ending_label, story_id) "
+    "VALUES ('delete', old.id, old.text, old.ending_label, old.story_id); "
+    "INSERT INTO page_search(rowid, text, ending_label, story_id) "
+    "VALUES (new.id, new.text, new.ending_label, new.story_id); END",
+]
+
+
+def fts_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def create_index():
+    """Create the FTS tables and triggers, filling the index if it was just created"""
+    if not fts_available():
+        return
+    with db.engine.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'story_search'")
+        ).first() is not None
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        if not existed:
+            rebuild_index(conn)
+
+
+def rebuild_index(conn):
+    """Re-read every story and page into the indexes"""
+    conn.execute(text("INSERT INTO story_search(story_search) VALUES ('rebuild')"))
+    conn.execute(text("INSERT INTO page_search(page_search) VALUES ('rebuild')"))
+
+
+def match_query(raw):
+    """Turn free text into an FTS5 query where every word must match as a prefix
+
+    Only word characters survive, so user input can never inject FTS5 syntax.
+    """
+    terms = re.findall(r'\w+', raw.lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_stories(raw_query, status='published', include_pages=False, limit=20, offset=0):
+    """Stories matching raw_query, best first, as (stories, scores, total)"""
+    if not fts_available():
+        return search_stories_like(raw_query, status, limit, offset)
+    match = match_query(raw_query)
+    if match is None:
+        return [], {}, 0
+
+    hits = (
+        "SELECT rowid AS story_id, bm25(story_search, :title_weight, :description_weight) AS score "
+        "FROM story_search WHERE story_search MATCH :match"
+    )
+    if include_pages:
+        hits += (
+            " UNION ALL SELECT story_id, bm25(page_search, :text_weight, :label_weight) "
+            "FROM page_search WHERE page_search MATCH :match"
+        )
+    ranked = (
+        f"WITH hits AS MATERIALIZED ({hits}) "
+        "SELECT hits.story_id AS story_id, MIN(hits.score) AS score FROM hits "
+        "JOIN stories ON stories.id = hits.story_id "
+        "WHERE stories.deleted_at IS NULL AND stories.status = :status "
+        "GROUP BY hits.story_id"
+    )
+    params = {
+        'match': match,
+        'status': status,
+        'title_weight': STORY_WEIGHTS[0],
+        'description_weight': STORY_WEIGHTS[1],
+        'text_weight': PAGE_WEIGHTS[0],
+        'label_weight': PAGE_WEIGHTS[1],
+    }
+
+    total = db.session.execute(text(f"SELECT COUNT(*) FROM ({ranked})"), params).scalar()
+    rows = db.session.execute(
+        text(f"{ranked} ORDER BY score, story_id LIMIT :limit OFFSET :offset"),
+        dict(params, limit=limit, offset=offset)
+    ).all()
+
+    scores = {row.story_id: row.score for row in rows}
+    stories = Story.query.filter(Story.id.in_(list(scores))).all()
+    stories.sort(key=lambda story: (scores[story.id], story.id))
+    return stories, scores, total
+
+
+def search_stories_like(raw_query, status, limit, offset):
+    """Unranked substring fallback for databases without FTS5"""
+    terms = re.findall(r'\w+', raw_query.lower())[:MAX_TERMS]
+    if not terms:
+        return [], {}, 0
+    query = Story.query.filter(Story.deleted_at.is_(None), Story.status == status)
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(db.or_(Story.title.ilike(pattern), Story.description.ilike(pattern)))
+    total = query.count()
+    stories = query.order_by(Story.id).limit(limit).offset(offset).all()
+    return stories, {story.id: None for story in stories}, total
+
+
+def init_app(app):
+    """Create the search index and register the rebuild-search-index CLI command"""
+    with app.app_context():
+        create_index()
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the story and page full-text indexes from their tables."""
+        if not fts_available():
+            click.echo('Full-text search needs SQLite FTS5; nothing to rebuild')
+            return
+        with db.engine.begin() as conn:
+            rebuild_index(conn)
+        click.echo('Rebuilt the story search index')
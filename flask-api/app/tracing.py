@@ -0,0 +1,56 @@
+"""
+Request IDs and span files for cross-service traces.
+
+Django sends an X-Request-ID header on every API call; requests without one
+get a fresh ID here. The ID is echoed back in the response, and when
+TRACE_FILE is set each api_bp request appends one JSON line to that file:
+the request span plus one span per SQL statement, all with wall-clock start
+times. Django appends its own lines (the page request, its queries and its
+API calls) to the same file, and `python manage.py show_traces` merges the
+lines sharing an ID into one timeline. Nothing leaves the machine.
+
+The spans are collected by the hooks in app.metrics, so tracing needs
+METRICS_ENABLED.
+"""
+
+import json
+import os
+import re
+import threading
+import uuid
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+MAX_SPANS = 500
+STATEMENT_PREVIEW = 120
+
+
+def request_id_from(headers):
+    """The caller's request ID when it is well-formed, else a new one"""
+    value = headers.get(REQUEST_ID_HEADER)
+    if value and REQUEST_ID_PATTERN.fullmatch(value):
+        return value
+    return uuid.uuid4().hex
+
+
+class SpanFile:
+    """Appends one JSON line per traced request; safe across threads and processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+
+    def write(self, record):
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+        with self._lock:
+            if self._fd is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # A single O_APPEND write keeps lines from different workers whole
+            os.write(self._fd, line)
+
+
+def statement_preview(statement):
+    return ' '.join(statement.split())[:STATEMENT_PREVIEW]